@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate, pre_migrate
+
+        from . import search, signals  # noqa: F401
+
+        pre_migrate.connect(search.suspend_triggers, sender=self)
+        post_migrate.connect(search.ensure_installed, sender=self)
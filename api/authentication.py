@@ -0,0 +1,114 @@
+"""
+Stateless JWT authentication.
+
+`StatelessJWTAuthentication` builds the request user from the token claims
+written by CustomTokenObtainPairSerializer instead of loading the User row.
+To still reject deactivated accounts, tokens whose is_staff/is_superuser
+claims no longer match the account (a demoted admin must not keep
+IsAdminUser for the token's lifetime) and, with SIMPLE_JWT
+CHECK_REVOKE_TOKEN, tokens issued before a password change, each user's
+(is_active, is_staff, is_superuser, password hash) is kept in a small
+in-process cache:
+
+- saving or deleting a User drops its entry in this process (api.signals)
+- other processes pick the change up once the entry is older than
+  STATELESS_AUTH_CACHE_TTL
+
+so a warm request does no auth queries and a cold one does a single
+indexed lookup.
+"""
+import threading
+import time
+from collections import namedtuple
+from functools import cached_property
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# Entries kept before the oldest are evicted
+MAX_ENTRIES = 10_000
+
+UserState = namedtuple("UserState", ["is_active", "is_staff", "is_superuser", "password_hash"])
+
+_lock = threading.Lock()
+_states = {}  # user id -> (expires_at, UserState or None)
+
+
+def _ttl():
+    return getattr(settings, "STATELESS_AUTH_CACHE_TTL", 60)
+
+
+def user_state(user_id):
+    """Return the UserState for `user_id`, or None if the user is gone."""
+    # Token claims carry the id as a string
+    user_id = str(user_id)
+    now = time.monotonic()
+    with _lock:
+        entry = _states.get(user_id)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    row = User.objects.filter(pk=user_id).values_list("is_active", "is_staff", "is_superuser", "password").first()
+    state = None if row is None else UserState(*row[:3], get_md5_hash_password(row[3]))
+    with _lock:
+        if len(_states) >= MAX_ENTRIES:
+            # Dicts keep insertion order, so this drops the oldest entries
+            for key in list(_states)[: MAX_ENTRIES // 10]:
+                del _states[key]
+        _states[user_id] = (now + _ttl(), state)
+    return state
+
+
+def forget(user_id):
+    with _lock:
+        _states.pop(str(user_id), None)
+
+
+def clear():
+    with _lock:
+        _states.clear()
+
+
+class ClaimsUser(TokenUser):
+    """TokenUser that also exposes the profile claims we put in the token."""
+
+    @cached_property
+    def email(self):
+        return self.token.get("email", "")
+
+    @cached_property
+    def first_name(self):
+        return self.token.get("first_name", "")
+
+    @cached_property
+    def last_name(self):
+        return self.token.get("last_name", "")
+
+    def get_full_name(self):
+        return f"{self.first_name} {self.last_name}".strip()
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    def get_user(self, validated_token):
+        # Let the parent check the user id claim exists
+        super().get_user(validated_token)
+        user = ClaimsUser(validated_token)
+
+        state = user_state(user.id)
+        if state is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not state.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        # The permission flags come from the claims, so they must still be
+        # the account's; a user whose role changed has to log in again
+        if (user.is_staff, user.is_superuser) != (state.is_staff, state.is_superuser):
+            raise AuthenticationFailed(_("The user's permissions have changed."), code="permissions_changed")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != state.password_hash:
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
@@ -0,0 +1,202 @@
+import logging
+import os
+import time
+from collections import Counter
+
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from . import response_cache
+from .models import FileDeletion, Payment, PaymentProof, ProofBlob
+from .sqlite import atomic_write
+from .storage import is_content_addressed
+from .thumbnails import DERIVATIVES
+
+logger = logging.getLogger(__name__)
+
+# Every file field that points into media/payment_proofs/
+FILE_FIELDS = ["proof", *[field for field, _ in DERIVATIVES]]
+
+# Give up on a queued deletion after this many failures
+MAX_DELETE_ATTEMPTS = 5
+
+# Longer than any upload takes from storing its file to committing the row
+# that references it
+REUSE_GRACE = 15 * 60  # seconds
+
+
+def retain(name, count=1):
+    if not name:
+        return
+    updated = ProofBlob.objects.filter(name=name).update(refcount=F("refcount") + count)
+    if not updated:
+        ProofBlob.objects.create(name=name, refcount=count)
+
+
+def release(name, count=1):
+    """Drop references to `name`; the file is queued for deletion once none remain."""
+    if name:
+        release_many(Counter({name: count}))
+
+
+def release_many(counts):
+    """Drop {name: count} references with a handful of set-based queries."""
+    counts = Counter({name: count for name, count in counts.items() if name})
+    if not counts:
+        return
+    by_count = {}
+    for name, count in counts.items():
+        by_count.setdefault(count, []).append(name)
+    for count, names in by_count.items():
+        # Clamped: refcount is unsigned (CHECK >= 0), and a drifted count
+        # should end in the cleanup below, not an IntegrityError
+        ProofBlob.objects.filter(name__in=names).update(refcount=Greatest(F("refcount") - count, Value(0)))
+
+    unreferenced = ProofBlob.objects.filter(name__in=list(counts), refcount__lte=0)
+    names = list(unreferenced.values_list("name", flat=True))
+    if names:
+        unreferenced.delete()
+        enqueue_deletion(names)
+
+
+def enqueue_deletion(names):
+    """
+    Queue files for deletion in the current transaction.
+
+    The rows only become visible when the transaction commits, so a rolled
+    back delete never loses a file; `drain_file_deletions` unlinks them.
+    """
+    names = [name for name in names if name]
+    if names:
+        FileDeletion.objects.bulk_create([FileDeletion(name=name) for name in names])
+
+
+def drain_deletions(limit=500):
+    """Unlink queued files; returns how many queue rows were processed."""
+    queued = list(FileDeletion.objects.filter(attempts__lt=MAX_DELETE_ATTEMPTS).order_by("pk")[:limit])
+    if not queued:
+        return 0
+
+    done = []
+    for job in queued:
+        try:
+            # Under the write lock, so no reference to the file can commit
+            # between the check and the unlink
+            with atomic_write():
+                # A blob re-created by a later upload of the same content must stay.
+                live = ProofBlob.objects.filter(name=job.name).exists()
+                if not live and _is_proof_blob(job.name):
+                    _unlink_unless_reused(job.name)
+                elif not live:
+                    default_storage.delete(job.name)
+        except OSError as exc:
+            logger.warning("Could not delete %s: %s", job.name, exc)
+            FileDeletion.objects.filter(pk=job.pk).update(attempts=F("attempts") + 1, last_error=str(exc))
+            continue
+        done.append(job.pk)
+    FileDeletion.objects.filter(pk__in=done).delete()
+    return len(queued)
+
+
+def _is_proof_blob(name):
+    # Report PDFs are named by a hash too, but are never reused this way
+    upload_to = PaymentProof._meta.get_field("proof").upload_to
+    return name.startswith(upload_to) and is_content_addressed(name)
+
+
+def _unlink_unless_reused(name):
+    """
+    Unlink a content-addressed proof file unless an upload handed it out
+    again within REUSE_GRACE.
+
+    ContentAddressedStorage reuses an existing file before the upload's
+    transaction starts, so its ProofBlob row may not exist yet; it touches
+    the file instead. Moving the file aside first closes the gap: a reuse
+    after the move finds no file and writes a fresh copy, and one before it
+    shows in the mtime. If that upload never commits, the kept file is an
+    orphan for reclaim_orphan_proofs.
+    """
+    path = default_storage.path(name)
+    aside = f"{path}.deleting"
+    try:
+        os.rename(path, aside)
+    except FileNotFoundError:
+        return
+    if time.time() - os.stat(aside).st_mtime < REUSE_GRACE:
+        logger.info("Keeping %s: stored again by a recent upload", name)
+        # Same name, same bytes, so replacing a fresh copy is harmless
+        os.replace(aside, path)
+    else:
+        os.remove(aside)
+
+
+def remove_payment_proofs(payment_ids, clear_payment_proof=True):
+    """
+    Delete every PaymentProof of the given payments (and optionally clear
+    Payment.proof) with one statement per table, releasing blob references
+    and queueing the files in the same transaction.
+    """
+    payment_ids = list(payment_ids)
+    with transaction.atomic():
+        rows = _delete_proof_rows(payment_ids)
+
+        if clear_payment_proof:
+            payments = Payment.objects.filter(pk__in=payment_ids).exclude(proof="").exclude(proof__isnull=True)
+            payment_rows = list(payments.values_list(*FILE_FIELDS))
+            if payment_rows:
+                transaction.on_commit(response_cache.invalidate)
+                payments.update(
+                    proof=None,
+                    derivatives_failed=False,
+                    updated_at=timezone.now(),
+                    version=F("version") + 1,
+                    **{field: None for field, _ in DERIVATIVES},
+                )
+            rows += payment_rows
+
+        release_many(Counter(row[0] for row in rows))
+        enqueue_deletion([name for row in rows for name in row[1:]])
+    return len(rows)
+
+
+def _delete_proof_rows(payment_ids):
+    """
+    Delete the PaymentProof rows of `payment_ids` in one raw statement and
+    return their FILE_FIELDS. No delete signals: callers release the
+    references in bulk, and RETURNING hands back exactly the rows removed.
+    """
+    if not payment_ids:
+        return []
+    qn = connection.ops.quote_name
+    columns = ", ".join(qn(PaymentProof._meta.get_field(field).column) for field in FILE_FIELDS)
+    placeholders = ", ".join(["%s"] * len(payment_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {qn(PaymentProof._meta.db_table)} "
+            f"WHERE {qn(PaymentProof._meta.get_field('payment').column)} IN ({placeholders}) "
+            f"RETURNING {columns}",
+            payment_ids,
+        )
+        return [tuple(row) for row in cursor.fetchall()]
+
+
+def count_references():
+    """Count live references to each proof file across all proof fields."""
+    counts = Counter()
+    for model in (Payment, PaymentProof):
+        names = model.objects.exclude(proof="").exclude(proof__isnull=True).values_list("proof", flat=True)
+        counts.update(names.iterator(chunk_size=2000))
+    return counts
+
+
+def referenced_names():
+    """Every file name the database still points at, including queued deletions."""
+    names = set(ProofBlob.objects.values_list("name", flat=True))
+    for model in (Payment, PaymentProof):
+        for row in model.objects.values_list(*FILE_FIELDS).iterator(chunk_size=2000):
+            names.update(name for name in row if name)
+    names.update(FileDeletion.objects.values_list("name", flat=True))
+    return names
@@ -0,0 +1,169 @@
+"""
+Negotiated gzip/brotli response compression.
+
+CompressionMiddleware picks an encoding from Accept-Encoding and compresses
+responses of at least RESPONSE_COMPRESSION_MIN_SIZE bytes.
+
+gzip goes through django.utils.text like GZipMiddleware does, including its
+BREACH mitigation: a random-length filename in the gzip header, so the
+compressed size no longer tells an attacker how well their guess matched a
+secret in the body. Brotli has no such header, so it is only offered with
+RESPONSE_COMPRESSION_BROTLI = True (and the `brotli` package installed).
+The token endpoints, whose bodies are JWTs, are never compressed.
+
+Streaming responses are held back until that many bytes have been
+produced: a stream that ends below the threshold is sent as is, a longer
+one is compressed chunk by chunk from the buffered head onwards, so small
+CSV exports do not pay for compression either. Content types that are
+already compressed (PDF, XLSX, images) are passed through.
+"""
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+INCOMPRESSIBLE_TYPES = (
+    "application/pdf",
+    "application/zip",
+    "application/gzip",
+    "application/vnd.openxmlformats-officedocument.",
+    "image/",
+    "video/",
+    "audio/",
+)
+# URL names whose responses carry credentials
+UNCOMPRESSED_URL_NAMES = ("token_obtain_pair", "token_refresh")
+MAX_RANDOM_BYTES = GZipMiddleware.max_random_bytes
+BROTLI_QUALITY = 5
+
+
+def min_size():
+    return getattr(settings, "RESPONSE_COMPRESSION_MIN_SIZE", 1024)
+
+
+def brotli_enabled():
+    return brotli is not None and getattr(settings, "RESPONSE_COMPRESSION_BROTLI", False)
+
+
+def negotiate(accept_encoding):
+    """Return "br", "gzip" or None for an Accept-Encoding header."""
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+
+    candidates = ["br", "gzip"] if brotli_enabled() else ["gzip"]
+    best, best_q = None, 0.0
+    for coding in candidates:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(encoding, data):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return compress_string(data, max_random_bytes=MAX_RANDOM_BYTES)
+
+
+def compress_stream(encoding, chunks):
+    if encoding != "br":
+        yield from compress_sequence(chunks, max_random_bytes=MAX_RANDOM_BYTES)
+        return
+    stream = brotli.Compressor(quality=BROTLI_QUALITY)
+    for chunk in chunks:
+        data = stream.process(chunk)
+        if data:
+            yield data
+    yield stream.finish()
+
+
+async def compress_async_stream(encoding, chunks):
+    if encoding != "br":
+        # One gzip member per chunk, as GZipMiddleware does
+        async for chunk in chunks:
+            yield compress_string(chunk, max_random_bytes=MAX_RANDOM_BYTES)
+        return
+    stream = brotli.Compressor(quality=BROTLI_QUALITY)
+    async for chunk in chunks:
+        data = stream.process(chunk)
+        if data:
+            yield data
+    yield stream.finish()
+
+
+def buffered_head(chunks, limit):
+    """Read `chunks` until `limit` bytes; return (head chunks, whether more may follow)."""
+    head, size = [], 0
+    for chunk in chunks:
+        head.append(chunk)
+        size += len(chunk)
+        if size >= limit:
+            return head, True
+    return head, False
+
+
+def _chain(head, rest):
+    yield from head
+    yield from rest
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    def process_response(self, request, response):
+        if response.has_header("Content-Encoding") or response.has_header("Content-Range"):
+            return response
+        if response.get("Content-Type", "").startswith(INCOMPRESSIBLE_TYPES):
+            return response
+        match = getattr(request, "resolver_match", None)
+        if match is not None and match.url_name in UNCOMPRESSED_URL_NAMES:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = negotiate(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                # Async iterators cannot be peeked at from here
+                response.streaming_content = compress_async_stream(encoding, response.streaming_content)
+            else:
+                chunks = iter(response.streaming_content)
+                head, more = buffered_head(chunks, min_size())
+                if not more:
+                    response.streaming_content = head
+                    return response
+                response.streaming_content = compress_stream(encoding, _chain(head, chunks))
+            del response.headers["Content-Length"]
+        else:
+            if len(response.content) < min_size():
+                return response
+            compressed = compress(encoding, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        # The body bytes differ from the identity representation
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+        return response
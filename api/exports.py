@@ -0,0 +1,112 @@
+import csv
+import tempfile
+
+from django.utils import timezone
+
+from .models import Payment
+from .reports import term_filter
+
+EXPORT_COLUMNS = [
+    ("id", "Payment ID"),
+    ("student_id", "Student ID"),
+    ("student__username", "Username"),
+    ("student__first_name", "First Name"),
+    ("student__last_name", "Last Name"),
+    ("comittee_name", "Committee"),
+    ("payment", "Payment"),
+    ("amount", "Amount"),
+    ("cf", "CF"),
+    ("lac", "LAC"),
+    ("pta", "PTA"),
+    ("qaa", "QAA"),
+    ("rhc", "RHC"),
+    ("semester", "Semester"),
+    ("school_year", "School Year"),
+    ("status", "Status"),
+    ("is_walk_in", "Walk-in"),
+    ("feedback", "Feedback"),
+    ("date_issued", "Date Issued"),
+]
+
+CHUNK_SIZE = 2000
+
+# Spreadsheet apps run cells starting with these as formulas
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def export_queryset(params):
+    """
+    Payments matching the print_payments_pdf and StudentPaymentsView filters.
+
+    semester and school_year match the way the PDF report does (reports.term_filter);
+    student_id and is_walk_in as in StudentPaymentsView. Unlike the report,
+    every status is included unless `status` is given.
+    """
+    payments = Payment.objects.all()
+
+    semester, school_year = params.get('semester', ''), params.get('school_year', '')
+    if semester or school_year:
+        payments = payments.filter(term_filter(semester, school_year))
+
+    student_id = params.get('student_id')
+    if student_id:
+        payments = payments.filter(student_id=student_id)
+
+    status = params.get('status')
+    if status:
+        payments = payments.filter(status=status)
+
+    is_walk_in = params.get('is_walk_in')
+    if is_walk_in in ["true", "false"]:
+        payments = payments.filter(is_walk_in=(is_walk_in == "true"))
+
+    return payments.order_by('-date_issued', '-id')
+
+
+def escape_formula(value):
+    """Quote text a spreadsheet would otherwise run as a formula (CSV injection)."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def export_rows(payments):
+    """Yield plain tuples in EXPORT_COLUMNS order without building model instances."""
+    fields = [field for field, _ in EXPORT_COLUMNS]
+    date_index = fields.index("date_issued")
+    for row in payments.values_list(*fields).iterator(chunk_size=CHUNK_SIZE):
+        # Usernames, names, payment and feedback are typed in by students
+        row = [escape_formula(value) for value in row]
+        # Local naive time: readable in CSV and accepted by XLSX cells
+        row[date_index] = timezone.localtime(row[date_index]).replace(tzinfo=None)
+        yield row
+
+
+class Echo:
+    """File-like object whose write() hands the line back to the csv writer."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(payments):
+    writer = csv.writer(Echo())
+    yield writer.writerow([label for _, label in EXPORT_COLUMNS])
+    for row in export_rows(payments):
+        yield writer.writerow(row)
+
+
+def spooled_xlsx(payments):
+    """Write the export with openpyxl's write-only workbook into a temp file."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Payments")
+    sheet.append([label for _, label in EXPORT_COLUMNS])
+    for row in export_rows(payments):
+        sheet.append(row)
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
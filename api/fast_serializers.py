@@ -0,0 +1,242 @@
+"""
+Read-only fast paths for PaymentSerializer and UserSerializer.
+
+`payment_rows()` produces the same JSON shape as
+`PaymentSerializer(many=True)`, nested student and profile included, from a
+single `.values()` query joined across api_payment, auth_user and
+api_profile. No model instances or per-field serializer calls are created.
+`user_rows()` does the same for UserSerializer.
+
+Both take a Fieldset parsed from `?fields=` and `?expand=`, and only the
+columns (and joins) it needs are selected:
+
+    ?fields=id,status,amount,date_issued          payment columns only
+    ?fields=id,status,student                     student as its id, no join
+    ?fields=id,status&expand=student              nested student (auth_user join)
+    ?fields=id,student.first_name,student.last_name
+    ?fields=id,status&expand=profile              student with nested profile
+
+Without `fields` the full legacy shape is returned. The field list and
+order are read from the serializers, so a new model field shows up here
+as well; `manage.py bench_payment_serializers` checks the two outputs
+match row by row before timing them.
+"""
+from decimal import Decimal
+from functools import cache
+
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from .models import Payment
+
+STUDENT_COLUMNS = {
+    "id": "student__id",
+    "username": "student__username",
+    "email": "student__email",
+    "first_name": "student__first_name",
+    "last_name": "student__last_name",
+}
+PROFILE_COLUMNS = {
+    "id": "profile__id",
+    "year_lvl": "profile__year_lvl",
+    "course": "profile__course",
+}
+USER_FIELDS = [*STUDENT_COLUMNS, "profile"]
+EXPANSIONS = {"student", "profile"}
+CENT = Decimal("0.01")
+
+
+@cache
+def _payment_fields():
+    from .serializers import PaymentSerializer
+
+    return list(PaymentSerializer().fields.items())
+
+
+def _split(value):
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+
+def _parse(request, allowed):
+    """Return (requested names, top-level names, student.<child> names, expansions)."""
+    requested = _split(request.query_params.get("fields"))
+    expand = set(_split(request.query_params.get("expand")))
+    errors = {}
+    if expand - EXPANSIONS:
+        errors["expand"] = [f"Unknown expansion: {name}" for name in sorted(expand - EXPANSIONS)]
+    top, nested = [], []
+    for name in requested:
+        parent, _, child = name.partition(".")
+        if child and parent == "student" and parent in allowed:
+            nested.append(child)
+        elif name in allowed:
+            top.append(name)
+        else:
+            errors.setdefault("fields", []).append(f"Unknown field: {name}")
+    if errors:
+        raise ValidationError(errors)
+    return requested, top, nested, expand
+
+
+class Fieldset:
+    """
+    Which fields to render: `fields` are top-level names in serializer
+    order, `student` is None (render the id) or the nested student fields,
+    and `profile` adds the nested profile.
+    """
+
+    def __init__(self, fields, student=None, profile=False):
+        self.fields = fields
+        self.student = student
+        self.profile = profile
+
+    @classmethod
+    def all_payment_fields(cls):
+        return cls([name for name, _ in _payment_fields()], list(STUDENT_COLUMNS), True)
+
+    @classmethod
+    def for_payments(cls, request):
+        names = [name for name, _ in _payment_fields()]
+        requested, top, nested, expand = _parse(request, names)
+        if not requested:
+            return cls.all_payment_fields()
+
+        unknown = set(nested) - set(STUDENT_COLUMNS) - {"profile"}
+        if unknown:
+            raise ValidationError({"fields": [f"Unknown field: student.{name}" for name in sorted(unknown)]})
+        if "profile" in nested:
+            expand.add("profile")
+        if nested or "profile" in expand:
+            expand.add("student")
+
+        student = None
+        if "student" in expand:
+            student = [name for name in STUDENT_COLUMNS if name in nested] or list(STUDENT_COLUMNS)
+            top.append("student")
+        return cls([name for name in names if name in top], student, "profile" in expand)
+
+    @classmethod
+    def for_users(cls, request):
+        requested, top, nested, expand = _parse(request, USER_FIELDS)
+        if "student" in expand:
+            raise ValidationError({"expand": ["Unknown expansion: student"]})
+        if not requested:
+            return cls(list(USER_FIELDS), profile=True)
+        profile = "profile" in top or "profile" in expand
+        return cls([name for name in USER_FIELDS if name in top or (name == "profile" and profile)], profile=profile)
+
+    def payment_columns(self, ordering=("date_issued", "id")):
+        columns = [name for name in self.fields if name != "student"]
+        if "student" in self.fields:
+            if self.student is None:
+                columns.append("student")
+            else:
+                columns += [STUDENT_COLUMNS[name] for name in self.student]
+                if self.profile:
+                    columns += [f"student__{column}" for column in PROFILE_COLUMNS.values()]
+        # The cursor paginator reads its position from the row
+        return columns + [name for name in ordering if name not in columns]
+
+    def user_columns(self):
+        columns = [name for name in self.fields if name != "profile"]
+        if self.profile:
+            columns += list(PROFILE_COLUMNS.values())
+        return columns
+
+
+def _file_converter(model_field, absolute):
+    storage = model_field.storage
+
+    def convert(name):
+        if not name:
+            return None
+        url = storage.url(name)
+        return absolute(url) if absolute else url
+
+    return convert
+
+
+def _converters(request, fields):
+    """Build [(field, fn(raw_value) or None)] for one response."""
+    tz = timezone.get_current_timezone()
+    absolute = request.build_absolute_uri if request is not None else None
+
+    def datetime_(value):
+        value = value.astimezone(tz).isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+    converters = []
+    for name, field in _payment_fields():
+        if name not in fields:
+            continue
+        if name == "student":
+            convert = None
+        elif isinstance(field, serializers.FileField):
+            convert = _file_converter(Payment._meta.get_field(name), absolute)
+        elif isinstance(field, serializers.DecimalField):
+            places = Decimal(1).scaleb(-field.decimal_places) if field.decimal_places is not None else CENT
+            convert = lambda value, places=places: f"{value.quantize(places):f}"  # noqa: E731
+        elif isinstance(field, serializers.DateTimeField):
+            convert = datetime_
+        elif isinstance(field, serializers.FloatField):
+            convert = float
+        elif isinstance(field, serializers.BooleanField):
+            convert = bool
+        elif isinstance(field, serializers.CharField):
+            convert = str
+        else:
+            convert = None
+        converters.append((name, convert))
+    return converters
+
+
+def payment_values(queryset, fieldset=None):
+    fieldset = fieldset or Fieldset.all_payment_fields()
+    return queryset.values(*fieldset.payment_columns())
+
+
+def payment_rows(rows, request=None, fieldset=None):
+    """Serialize rows from `payment_values()` like PaymentSerializer(many=True).data."""
+    fieldset = fieldset or Fieldset.all_payment_fields()
+    converters = _converters(request, fieldset.fields)
+    data = []
+    for row in rows:
+        item = {}
+        for name, convert in converters:
+            if name == "student":
+                item[name] = row["student"] if fieldset.student is None else _student(row, fieldset)
+                continue
+            value = row[name]
+            item[name] = convert(value) if value is not None and convert is not None else value
+        data.append(item)
+    return data
+
+
+def _student(row, fieldset):
+    student = {name: row[STUDENT_COLUMNS[name]] for name in fieldset.student}
+    if fieldset.profile:
+        student["profile"] = _profile(row, prefix="student__")
+    return student
+
+
+def _profile(row, prefix=""):
+    if row[prefix + PROFILE_COLUMNS["id"]] is None:
+        return None
+    return {name: row[prefix + column] for name, column in PROFILE_COLUMNS.items()}
+
+
+def user_values(queryset, fieldset):
+    return queryset.values(*fieldset.user_columns())
+
+
+def user_rows(rows, fieldset):
+    """Serialize rows from `user_values()` like UserSerializer(many=True).data."""
+    own = [name for name in fieldset.fields if name != "profile"]
+    data = []
+    for row in rows:
+        item = {name: row[name] for name in own}
+        if fieldset.profile:
+            item["profile"] = _profile(row)
+        data.append(item)
+    return data
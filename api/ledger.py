@@ -0,0 +1,131 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import COMMITTEE_FIELDS, CommitteeLedger
+
+LEDGER_FIELDS = ["comittee_name", "amount", "school_year", "semester", "status", *COMMITTEE_FIELDS]
+
+
+def _to_decimal(value):
+    if value is None:
+        return Decimal(0)
+    return Decimal(str(value)).quantize(Decimal("0.01"))
+
+
+def contributions(payment):
+    """
+    Return {ledger_key: (total, count)} for one payment.
+
+    `payment` may be a model instance or a dict of LEDGER_FIELDS, so the same
+    rules apply to live saves and rebuilds. Migration 0022 has its own copy.
+    """
+    get = payment.get if isinstance(payment, dict) else lambda f: getattr(payment, f)
+    scope = (get("school_year") or "", get("semester") or "", get("status") or "")
+    result = {}
+
+    for key in COMMITTEE_FIELDS:
+        value = get(key)
+        if value is not None:
+            result[(CommitteeLedger.BREAKDOWN, key, *scope)] = (_to_decimal(value), 1)
+
+    if get("comittee_name") is not None:
+        result[(CommitteeLedger.AMOUNT, get("comittee_name"), *scope)] = (_to_decimal(get("amount")), 1)
+
+    return result
+
+
+def diff(before, after):
+    """Subtract two contribution maps, dropping keys that did not change."""
+    deltas = {}
+    for key in set(before) | set(after):
+        old_total, old_count = before.get(key, (Decimal(0), 0))
+        new_total, new_count = after.get(key, (Decimal(0), 0))
+        if old_total != new_total or old_count != new_count:
+            deltas[key] = (new_total - old_total, new_count - old_count)
+    return deltas
+
+
+def merge(*maps):
+    merged = defaultdict(lambda: (Decimal(0), 0))
+    for deltas in maps:
+        for key, (total, count) in deltas.items():
+            old_total, old_count = merged[key]
+            merged[key] = (old_total + total, old_count + count)
+    return dict(merged)
+
+
+def apply(deltas):
+    """Apply {ledger_key: (total_delta, count_delta)} to the ledger table."""
+    if not deltas:
+        return
+    with transaction.atomic():
+        for (kind, committee, school_year, semester, status_), (total, count) in deltas.items():
+            rows = CommitteeLedger.objects.filter(
+                kind=kind,
+                committee=committee,
+                school_year=school_year,
+                semester=semester,
+                status=status_,
+            )
+            updated = rows.update(total=F("total") + total, count=F("count") + count)
+            if not updated and count > 0:
+                CommitteeLedger.objects.create(
+                    kind=kind,
+                    committee=committee,
+                    school_year=school_year,
+                    semester=semester,
+                    status=status_,
+                    total=total,
+                    count=count,
+                )
+            elif updated:
+                rows.filter(count=0).delete()
+
+
+def compute(payments):
+    """Aggregate ledger rows from an iterable of payments (instances or dicts)."""
+    return merge(*(contributions(p) for p in payments))
+
+
+def rebuild():
+    """Recompute the ledger from the raw payments and replace its contents."""
+    from .models import Payment
+
+    rows = compute(Payment.objects.values(*LEDGER_FIELDS).iterator(chunk_size=2000))
+    with transaction.atomic():
+        CommitteeLedger.objects.all().delete()
+        CommitteeLedger.objects.bulk_create(
+            [
+                CommitteeLedger(
+                    kind=kind,
+                    committee=committee,
+                    school_year=school_year,
+                    semester=semester,
+                    status=status_,
+                    total=total,
+                    count=count,
+                )
+                for (kind, committee, school_year, semester, status_), (total, count) in rows.items()
+            ],
+            batch_size=500,
+        )
+    return len(rows)
+
+
+def verify():
+    """Return a list of (key, ledger_value, expected_value) mismatches."""
+    from .models import Payment
+
+    expected = compute(Payment.objects.values(*LEDGER_FIELDS).iterator(chunk_size=2000))
+    actual = {
+        (row.kind, row.committee, row.school_year, row.semester, row.status): (row.total, row.count)
+        for row in CommitteeLedger.objects.all()
+    }
+    mismatches = []
+    for key in sorted(set(expected) | set(actual)):
+        if expected.get(key) != actual.get(key):
+            mismatches.append((key, actual.get(key), expected.get(key)))
+    return mismatches
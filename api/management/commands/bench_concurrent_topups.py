@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, models, transaction
+
+from api import topups
+from api.management.commands.load_test_payments import project_database, use_copy
+from api.models import Payment
+
+AMOUNT = Decimal("1.00")
+
+
+def legacy_top_up(payment_id, amount):
+    """The old UpdatePaymentView: read, add in Python, save the whole row."""
+    payment = Payment.objects.get(pk=payment_id)
+    payment.cf = (payment.cf or Decimal(0)) + amount
+    # The old Payment.save(): no version bump, a DEFERRED transaction
+    with transaction.atomic():
+        models.Model.save(payment)
+
+
+def atomic_top_up(payment_id, amount):
+    topups.top_up(payment_id, {"cf": amount})
+
+
+MODES = {"legacy": legacy_top_up, "atomic": atomic_top_up}
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer one payment with parallel cf top-ups and report lost updates and throughput. "
+        "It writes to the database, so it refuses the project database: pass --database "
+        "to run on a copy, or point DATABASES at a scratch file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            help="SQLite file to run against; created as a copy of the default database if it does not exist.",
+        )
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--ops", type=int, default=50, help="Top-ups per writer.")
+        parser.add_argument("--mode", choices=[*MODES, "both"], default="both")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Only SQLite databases are supported.")
+        if options["database"]:
+            if os.path.abspath(options["database"]) == project_database():
+                raise CommandError("--database must be a scratch file, not the project database.")
+            use_copy(options["database"])
+        elif os.path.abspath(str(connection.settings_dict["NAME"])) == project_database():
+            raise CommandError(
+                f"Refusing to write benchmark top-ups to {project_database()}; "
+                "pass --database <scratch file> to run on a copy."
+            )
+
+        student = User.objects.filter(is_superuser=False).first()
+        if student is None:
+            raise CommandError("Needs at least one student to attach the scratch payment to.")
+
+        modes = list(MODES) if options["mode"] == "both" else [options["mode"]]
+        for mode in modes:
+            self.run(mode, MODES[mode], student, options["writers"], options["ops"])
+
+    def run(self, mode, top_up, student, writers, ops):
+        payment = Payment.objects.create(student=student, comittee_name="bench", school_year="bench", cf=0)
+        counts = {"ok": 0, "conflict": 0, "error": 0}
+        lock = threading.Lock()
+        start_gate = threading.Barrier(writers)
+
+        def writer():
+            local = {"ok": 0, "conflict": 0, "error": 0}
+            try:
+                start_gate.wait()
+                for _ in range(ops):
+                    try:
+                        top_up(payment.pk, AMOUNT)
+                        local["ok"] += 1
+                    except topups.VersionConflict:
+                        local["conflict"] += 1
+                    except DatabaseError:
+                        # e.g. "database is locked" on SQLite
+                        local["error"] += 1
+            finally:
+                connection.close()
+                with lock:
+                    for key, value in local.items():
+                        counts[key] += value
+
+        threads = [threading.Thread(target=writer) for _ in range(writers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        payment.refresh_from_db()
+        lost = counts["ok"] * AMOUNT - payment.cf
+        self.stdout.write(
+            f"{mode:>6}: {writers} writers x {ops} ops in {elapsed:.2f}s "
+            f"({counts['ok'] / elapsed:.0f} ok/s) "
+            f"ok={counts['ok']} conflicts={counts['conflict']} errors={counts['error']} "
+            f"cf={payment.cf} lost_updates={lost / AMOUNT:.0f}"
+        )
+        payment.delete()
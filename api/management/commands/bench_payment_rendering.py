@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import CommandError
+from django.test import Client, RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from api import compression
+from api.fast_serializers import payment_rows, payment_values
+from api.management.commands import bench_payment_serializers
+from api.models import Payment
+from api.renderers import ORJSONRenderer
+
+URL = "/api/payments/?paginate=false"
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+class Command(bench_payment_serializers.Command):
+    help = (
+        "Time JSONRenderer against ORJSONRenderer on the PaymentListView payload, then "
+        "compare bytes sent and response time for identity/gzip/brotli."
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.set_defaults(rows=10000)
+
+    def run(self, options):
+        repeat = options["repeat"]
+        request = RequestFactory().get(URL)
+        queryset = Payment.objects.select_related("student", "student__profile").order_by("-date_issued", "-id")
+        data = payment_rows(list(payment_values(queryset)), request)
+
+        expected = JSONRenderer().render(data)
+        actual = ORJSONRenderer().render(data)
+        if expected != actual:
+            raise CommandError("ORJSONRenderer output differs from JSONRenderer.")
+        self.stdout.write(f"Renderer parity OK over {len(data)} payments ({len(expected):,} bytes).")
+        if options["check_only"]:
+            return
+
+        for name, renderer in (("JSONRenderer", JSONRenderer()), ("ORJSONRenderer", ORJSONRenderer())):
+            best, _ = best_of(repeat, lambda renderer=renderer: renderer.render(data))
+            self.stdout.write(f"{name:>15}: render best {best * 1000:.1f} ms over {repeat} runs")
+
+        client = Client()
+        encodings = ["identity", "gzip"] + (["br"] if compression.brotli_enabled() else [])
+        for encoding in encodings:
+            best, response = best_of(repeat, lambda: client.get(URL, HTTP_ACCEPT_ENCODING=encoding))
+            if response.status_code != 200:
+                raise CommandError(f"GET {URL} returned {response.status_code}")
+            self.stdout.write(
+                f"{encoding:>15}: {len(response.content):>10,} bytes, "
+                f"request best {best * 1000:.1f} ms over {repeat} runs "
+                f"(Content-Encoding: {response.get('Content-Encoding', '-')})"
+            )
+        if not compression.brotli_enabled():
+            self.stdout.write("brotli is not installed or RESPONSE_COMPRESSION_BROTLI is off; skipped br.")
@@ -0,0 +1,169 @@
+import json
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.fast_serializers import Fieldset, payment_rows, payment_values
+from api.models import Payment
+from api.serializers import PaymentSerializer
+
+
+SPARSE_QUERIES = [
+    {"fields": "id,status,amount,date_issued"},
+    {"fields": "id,student,cf,lac"},
+    {"fields": "id,status", "expand": "student"},
+    {"fields": "id,student.first_name,student.last_name"},
+    {"fields": "id,proof", "expand": "profile"},
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+def normalize(data):
+    return json.loads(JSONRenderer().render(data))
+
+
+def project(row, request):
+    """Cut a full PaymentSerializer row down to what ?fields=/?expand= asks for."""
+    fields = request.query_params["fields"].split(",")
+    expand = set(request.query_params.get("expand", "").split(","))
+    nested = [name.split(".", 1)[1] for name in fields if name.startswith("student.")]
+    result = {}
+    for key, value in row.items():
+        if key == "student":
+            if nested or expand & {"student", "profile"}:
+                keep = nested or [name for name in value if name != "profile" or "profile" in expand]
+                result[key] = {name: value[name] for name in value if name in keep}
+            elif key in fields:
+                result[key] = value["id"]
+        elif key in fields:
+            result[key] = value
+    return result
+
+
+def first_difference(expected, actual, path="$"):
+    """Return a description of the first difference (key order included), or None."""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        if list(expected) != list(actual):
+            return f"{path}: keys {list(expected)} != {list(actual)}"
+        for key in expected:
+            found = first_difference(expected[key], actual[key], f"{path}.{key}")
+            if found:
+                return found
+        return None
+    if isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            return f"{path}: {len(expected)} rows != {len(actual)} rows"
+        for index, (left, right) in enumerate(zip(expected, actual)):
+            found = first_difference(left, right, f"{path}[{index}]")
+            if found:
+                return found
+        return None
+    if expected != actual:
+        return f"{path}: {expected!r} != {actual!r}"
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that the fast payment serializer matches PaymentSerializer, then time both "
+        "over the PaymentListView queryset."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=0,
+            help="Add this many synthetic payments for the run (rolled back afterwards).",
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--check-only",
+            action="store_true",
+            help="Only run the parity check; exit non-zero on any difference.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options["rows"]:
+                    self.add_payments(options["rows"])
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def add_payments(self, count):
+        students = list(User.objects.filter(is_superuser=False)[:50])
+        if not students:
+            raise CommandError("--rows needs at least one student.")
+        Payment.objects.bulk_create(
+            [
+                Payment(
+                    student=students[i % len(students)],
+                    comittee_name="bench",
+                    amount=150.0,
+                    semester="First Semester",
+                    school_year="2025-2026",
+                    status="Pending" if i % 3 else "Accepted",
+                    feedback="" if i % 2 else None,
+                    proof=f"payment_proofs/bench/{i}.jpg" if i % 4 == 0 else None,
+                    cf=Decimal("50.00"),
+                    lac=Decimal("25.50") if i % 2 else None,
+                    is_walk_in=bool(i % 5 == 0),
+                )
+                for i in range(count)
+            ],
+            batch_size=1000,
+        )
+
+    def run(self, options):
+        request = RequestFactory().get("/api/payments/")
+        queryset = Payment.objects.select_related("student", "student__profile").order_by("-date_issued", "-id")
+
+        expected = normalize(PaymentSerializer(queryset, many=True, context={"request": request}).data)
+        actual = normalize(payment_rows(payment_values(queryset), request))
+        difference = first_difference(expected, actual)
+        if difference:
+            raise CommandError(f"Fast path differs from PaymentSerializer at {difference}")
+        self.stdout.write(f"Parity OK over {len(expected)} payments.")
+
+        # A sparse fieldset must be the same rows with keys left out
+        for query in SPARSE_QUERIES:
+            sparse_request = Request(RequestFactory().get("/api/payments/", query))
+            fieldset = Fieldset.for_payments(sparse_request)
+            actual = normalize(payment_rows(payment_values(queryset, fieldset), request, fieldset))
+            projected = [project(row, sparse_request) for row in expected]
+            difference = first_difference(projected, actual)
+            if difference:
+                raise CommandError(f"?{query} differs from PaymentSerializer at {difference}")
+        self.stdout.write(f"Sparse fieldsets OK ({len(SPARSE_QUERIES)} variants).")
+        if options["check_only"]:
+            return
+
+        def serializer():
+            return PaymentSerializer(list(queryset), many=True, context={"request": request}).data
+
+        def fast():
+            return payment_rows(list(payment_values(queryset)), request)
+
+        for name, func in (("PaymentSerializer", serializer), ("fast path", fast)):
+            timings = []
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - started)
+            best = min(timings)
+            self.stdout.write(
+                f"{name:>17}: best {best * 1000:.1f} ms over {options['repeat']} runs "
+                f"({len(expected) / best:,.0f} rows/s)"
+            )
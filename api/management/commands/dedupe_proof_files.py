@@ -0,0 +1,56 @@
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from api import blobs, response_cache
+from api.models import Payment, PaymentProof, ProofBlob
+from api.storage import is_content_addressed, proof_storage
+
+
+class Command(BaseCommand):
+    help = "Move legacy proof uploads into content-addressed storage, merging duplicates."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report which files would be moved.",
+        )
+
+    def handle(self, *args, **options):
+        legacy = [name for name in blobs.count_references() if not is_content_addressed(name)]
+        moved = missing = 0
+
+        for name in legacy:
+            if not proof_storage.exists(name):
+                missing += 1
+                self.stderr.write(f"Missing file: {name}")
+                continue
+            if options["dry_run"]:
+                self.stdout.write(f"Would move {name}")
+                continue
+
+            with proof_storage.open(name, "rb") as source:
+                new_name = proof_storage.save(name, File(source))
+
+            with transaction.atomic():
+                # Queryset updates bypass the save signals, so move the
+                # reference count over by hand. The file URL changes, so
+                # bump the ETag watermarks too.
+                now = timezone.now()
+                count = Payment.objects.filter(proof=name).update(
+                    proof=new_name, updated_at=now, version=F("version") + 1
+                )
+                if count:
+                    transaction.on_commit(response_cache.invalidate)
+                count += PaymentProof.objects.filter(proof=name).update(proof=new_name, updated_at=now)
+                ProofBlob.objects.filter(name=name).delete()
+                blobs.retain(new_name, count)
+                transaction.on_commit(lambda name=name: proof_storage.delete(name))
+
+            moved += 1
+            self.stdout.write(f"{name} -> {new_name}")
+
+        self.stdout.write(f"Moved {moved} files, {missing} missing.")
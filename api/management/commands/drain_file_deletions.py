@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.blobs import drain_deletions
+
+
+class Command(BaseCommand):
+    help = "Unlink files queued for deletion by committed proof/payment removals."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--watch",
+            action="store_true",
+            help="Keep running as a background worker.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to sleep between polls in --watch mode.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed = drain_deletions()
+            if processed:
+                self.stdout.write(f"Processed {processed} queued file deletions.")
+                continue
+            if not options["watch"]:
+                return
+            time.sleep(options["interval"])
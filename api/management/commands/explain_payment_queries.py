@@ -0,0 +1,101 @@
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+
+from api.models import COMMITTEE_FIELDS, Payment
+
+
+def endpoint_requests(payment):
+    """(name, url, params) for each payment endpoint, with representative filters."""
+    student = payment["student_id"]
+    yield "PaymentListView", "/api/payments/", {}
+    yield "PaymentListView (sparse)", "/api/payments/", {"fields": "id,student,status"}
+    yield "UserPaymentsList", f"/api/payments/user/{student}/", {}
+    yield "StudentPaymentsView", f"/api/payment_filter/{student}/", {}
+    yield "StudentPaymentsView (filtered)", f"/api/payment_filter/{student}/", {
+        "school_year": payment["school_year"] or "2025-2026",
+        "semester": payment["semester"] or "First Semester",
+        "is_walk_in": "true",
+    }
+    yield "PaymentByCommitteeNameView", f"/api/payment-type/{payment['comittee_name'] or 'SSG'}/", {}
+    for key in COMMITTEE_FIELDS:
+        yield f"PaymentByCommitteeView ({key})", f"/api/payments/{key}/", {}
+    yield "CommitteeTotalAmountView", f"/api/total-amount/{payment['comittee_name'] or 'SSG'}/", {}
+    yield "print_payments_pdf", "/api/payments/print/", {"semester": "First", "school_year": "2025"}
+    yield "PaymentProofByPaymentIdView", f"/api/payment/{payment['id']}/proofs/", {}
+
+
+def captured_selects(url, params):
+    """Run the request through the real view and return the (sql, params) SELECTs it executed."""
+    selects = []
+
+    def record(execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith("SELECT"):
+            selects.append((sql, params))
+        return execute(sql, params, many, context)
+
+    # A wrapper, unlike CaptureQueriesContext, does not open a connection
+    # to aliases the views never use
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(record))
+        response = Client().get(url, params)
+        if response.status_code != 200:
+            raise CommandError(f"GET {url} returned {response.status_code}")
+    return selects
+
+
+def table_scans(plan):
+    """Plan lines that read a whole table instead of going through an index."""
+    scans = []
+    for line in plan.splitlines():
+        detail = line.strip(" |-`")
+        if detail.startswith("SCAN") and "USING" not in detail:
+            scans.append(detail)
+    return scans
+
+
+def explain(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return "\n".join(f"{'  ' * (row[1] > 0)}{row[-1]}" for row in cursor.fetchall())
+
+
+class Command(BaseCommand):
+    help = (
+        "Request each payment endpoint, run EXPLAIN QUERY PLAN on every query the view "
+        "executed, and report table scans."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fail-on-scan",
+            action="store_true",
+            help="Exit non-zero if any endpoint query scans a whole table.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("EXPLAIN QUERY PLAN output is only parsed for SQLite.")
+        payment = Payment.objects.values("id", "student_id", "comittee_name", "school_year", "semester").first()
+        if payment is None:
+            raise CommandError("Needs at least one payment.")
+
+        flagged = 0
+        for name, url, params in endpoint_requests(payment):
+            scans = []
+            for sql, sql_params in captured_selects(url, params):
+                plan = explain(sql, sql_params)
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"{name}: {sql} {sql_params}\n{plan}\n")
+                scans += table_scans(plan)
+            if scans:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(f"{name}: " + "; ".join(scans)))
+            else:
+                self.stdout.write(f"{name}: ok")
+
+        if flagged and options["fail_on_scan"]:
+            raise CommandError(f"{flagged} endpoint queries use a table scan.")
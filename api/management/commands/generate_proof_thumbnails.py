@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.thumbnails import generate_pending
+
+
+class Command(BaseCommand):
+    help = "Generate WebP thumbnails and previews for payment proofs that do not have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--watch",
+            action="store_true",
+            help="Keep running as a background worker, picking up new uploads.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to sleep between polls in --watch mode.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Proofs to process per poll in --watch mode.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["watch"]:
+            processed = generate_pending()
+            self.stdout.write(f"Generated derivatives for {processed} proofs.")
+            return
+
+        while True:
+            processed = generate_pending(limit=options["batch_size"])
+            if processed:
+                self.stdout.write(f"Generated derivatives for {processed} proofs.")
+            else:
+                time.sleep(options["interval"])
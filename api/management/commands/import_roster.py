@@ -0,0 +1,40 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from api.roster import DEFAULT_BATCH_SIZE, import_roster
+
+
+class Command(BaseCommand):
+    help = "Register students in bulk from a CSV roster (username, password, first_name, last_name, course, year_lvl)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file to import.")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Processes used to hash passwords (default: all cores).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only validate the file.",
+        )
+
+    def handle(self, *args, **options):
+        with open(options["path"], "rb") as source:
+            result = import_roster(
+                source,
+                batch_size=options["batch_size"],
+                workers=options["workers"] or os.cpu_count() or 1,
+                dry_run=options["dry_run"],
+            )
+
+        for error in result["errors"]:
+            self.stderr.write(f"line {error['line']} ({error['username'] or '-'}): {' '.join(error['errors'])}")
+        if options["dry_run"]:
+            self.stdout.write(f"{result['valid']} valid rows, {len(result['errors'])} errors.")
+        else:
+            self.stdout.write(f"Created {result['created']} students, {len(result['errors'])} errors.")
@@ -0,0 +1,162 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import time
+from collections import Counter
+from contextlib import closing
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection, connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+
+from api import ledger
+from api.models import Payment
+
+COMMITTEE = "loadtest"
+
+
+def request(client, kind, students, targets):
+    if kind == "read":
+        if random.random() < 0.5:
+            return client.get("/api/payments/?page_size=50")
+        return client.get(f"/api/payments/user/{random.choice(students)}/")
+    if random.random() < 0.5:
+        return client.post(
+            f"/api/submit-payment/{random.choice(students)}/",
+            {"comittee_name": COMMITTEE, "amount": 10, "cf": "5.00"},
+        )
+    return client.put(
+        f"/api/update_payment/{random.choice(targets)}/",
+        {"cf": "1.00"},
+        content_type="application/json",
+    )
+
+
+def worker(queue, students, targets, write_ratio, deadline):
+    client = Client()
+    counts = Counter()
+    connection_created.connect(lambda **kwargs: counts.update({("connections", "opened"): 1}), weak=False)
+    times = {"read": [], "write": []}
+    try:
+        while time.time() < deadline:
+            kind = "write" if random.random() < write_ratio else "read"
+            started = time.perf_counter()
+            try:
+                outcome = str(request(client, kind, students, targets).status_code)
+            except Exception as exc:  # e.g. OperationalError: database is locked
+                outcome = type(exc).__name__ + (": locked" if "locked" in str(exc) else "")
+            times[kind].append(time.perf_counter() - started)
+            counts[(kind, outcome)] += 1
+            # The test client skips this; a real server runs it at the end of
+            # every request, closing connections older than CONN_MAX_AGE
+            close_old_connections()
+    finally:
+        connection.close()
+        queue.put((counts, times))
+
+
+def project_database():
+    return os.path.abspath(settings.BASE_DIR / "db.sqlite3")
+
+
+def use_copy(path):
+    """Point every alias at a copy of the default database at `path` (made if missing)."""
+    source = str(connection.settings_dict["NAME"])
+    if not os.path.exists(path):
+        with closing(sqlite3.connect(source)) as primary, closing(sqlite3.connect(path)) as copy:
+            primary.backup(copy)
+    for alias in connections:
+        connections[alias].close()
+        connections[alias].settings_dict["NAME"] = path
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent cashier traffic (payment lists, submissions and walk-in top-ups) "
+        "through the real views and report throughput, latency and lock errors. "
+        "It writes and then deletes payments, so it refuses the project database: "
+        "pass --database to run on a copy, or point DATABASES at a scratch file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            help="SQLite file to run against; created as a copy of the default database if it does not exist.",
+        )
+        parser.add_argument("--workers", type=int, default=8, help="Worker processes.")
+        parser.add_argument("--seconds", type=float, default=10)
+        parser.add_argument("--write-ratio", type=float, default=0.3, help="Share of requests that write.")
+        parser.add_argument("--seed-payments", type=int, default=20, help="Scratch payments to top up.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Only SQLite databases are supported.")
+        if options["database"]:
+            if os.path.abspath(options["database"]) == project_database():
+                raise CommandError("--database must be a scratch file, not the project database.")
+            use_copy(options["database"])
+        elif os.path.abspath(str(connection.settings_dict["NAME"])) == project_database():
+            raise CommandError(
+                f"Refusing to write load-test payments to {project_database()}; "
+                "pass --database <scratch file> to run on a copy."
+            )
+
+        students = list(User.objects.filter(is_superuser=False).values_list("id", flat=True)[:50])
+        if not students:
+            raise CommandError("Needs at least one student.")
+        targets = [
+            Payment.objects.create(student_id=random.choice(students), comittee_name=COMMITTEE, cf=0).pk
+            for _ in range(options["seed_payments"])
+        ]
+        try:
+            self.run(students, targets, options)
+        finally:
+            Payment.objects.filter(comittee_name=COMMITTEE).delete()
+        mismatches = ledger.verify()
+        self.stdout.write("Ledger OK." if not mismatches else f"Ledger mismatches: {len(mismatches)} rows.")
+
+    def run(self, students, targets, options):
+        # Worker processes, like a pre-forked app server: each has its own
+        # connection and GIL, so the database locking is what is contended.
+        connection.close()
+        deadline = time.time() + options["seconds"]
+        context = multiprocessing.get_context("fork")
+        queue = context.Queue()
+        processes = [
+            context.Process(target=worker, args=(queue, students, targets, options["write_ratio"], deadline))
+            for _ in range(options["workers"])
+        ]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        results = Counter()
+        latencies = {"read": [], "write": []}
+        for _ in processes:
+            counts, times = queue.get()
+            results.update(counts)
+            for kind, values in times.items():
+                latencies[kind].extend(values)
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+        opened = results.pop(("connections", "opened"), 0)
+        total = sum(results.values())
+        self.stdout.write(
+            f"{options['workers']} workers, {elapsed:.1f}s: {total} requests ({total / elapsed:.0f} req/s)"
+        )
+        for kind, values in latencies.items():
+            if not values:
+                continue
+            values.sort()
+            outcomes = ", ".join(f"{outcome}={count}" for (k, outcome), count in sorted(results.items()) if k == kind)
+            self.stdout.write(
+                f"{kind:>6}: {len(values) / elapsed:.0f}/s, p50 {values[len(values) // 2] * 1000:.0f} ms, "
+                f"p95 {values[int(len(values) * 0.95)] * 1000:.0f} ms [{outcomes}]"
+            )
+        errors = sum(count for (_, outcome), count in results.items() if not outcome.startswith(("2", "409")))
+        self.stdout.write(f"Database connections opened: {opened}. Errors: {errors}")
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from api.reports import purge_report_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete finished report jobs past retention and queue their PDFs (and stray ones) "
+        "for drain_file_deletions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-age-days",
+            type=float,
+            default=None,
+            help="Age after which a finished job is purged (default: REPORT_JOB_RETENTION).",
+        )
+
+    def handle(self, *args, **options):
+        max_age = None
+        if options["max_age_days"] is not None:
+            max_age = timedelta(days=options["max_age_days"])
+        jobs, files = purge_report_jobs(max_age)
+        self.stdout.write(f"Purged {jobs} report jobs; queued {files} PDFs for deletion.")
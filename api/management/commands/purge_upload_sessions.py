@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from api.uploads import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Delete abandoned resumable upload sessions and their partial files."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-age-hours",
+            type=float,
+            default=None,
+            help="Idle time before a session is purged (default: CHUNKED_UPLOAD_SESSION_TTL).",
+        )
+
+    def handle(self, *args, **options):
+        max_age = None
+        if options["max_age_hours"] is not None:
+            max_age = timedelta(hours=options["max_age_hours"])
+        purged = purge_expired(max_age)
+        self.stdout.write(f"Purged {purged} upload sessions.")
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import ledger
+
+
+class Command(BaseCommand):
+    help = "Rebuild the committee totals ledger from the raw payments and verify it."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only compare the ledger with the payments; exit non-zero on drift.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["check"]:
+            rows = ledger.rebuild()
+            self.stdout.write(f"Rebuilt committee ledger: {rows} rows.")
+
+        mismatches = ledger.verify()
+        for key, actual, expected in mismatches:
+            self.stderr.write(f"{' / '.join(key)}: ledger={actual} payments={expected}")
+        if mismatches:
+            raise CommandError(f"Committee ledger has {len(mismatches)} mismatched rows.")
+        self.stdout.write(self.style.SUCCESS("Committee ledger matches payments."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api import search
+
+
+class Command(BaseCommand):
+    help = "Recreate the FTS5 search tables and triggers and refill them from students and payments."
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError("Full-text search requires SQLite FTS5.")
+        with transaction.atomic(), connection.cursor() as cursor:
+            search.uninstall(cursor)
+            search.install(cursor)
+            search.rebuild(cursor)
+            cursor.execute("SELECT COUNT(*) FROM api_student_search")
+            students = cursor.fetchone()[0]
+            cursor.execute("SELECT COUNT(*) FROM api_payment_search")
+            payments = cursor.fetchone()[0]
+        self.stdout.write(f"Indexed {students} students and {payments} payments.")
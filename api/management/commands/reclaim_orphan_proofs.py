@@ -0,0 +1,47 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.blobs import referenced_names
+
+PROOF_DIR = "payment_proofs"
+
+
+class Command(BaseCommand):
+    help = "Delete files under media/payment_proofs/ that no database row references."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only list the orphaned files.",
+        )
+        parser.add_argument(
+            "--grace-minutes",
+            type=float,
+            default=60,
+            help="Skip files newer than this, which may belong to an upload still in flight.",
+        )
+
+    def handle(self, *args, **options):
+        referenced = referenced_names()
+        cutoff = time.time() - options["grace_minutes"] * 60
+        root = os.path.join(settings.MEDIA_ROOT, PROOF_DIR)
+
+        orphans = reclaimed = 0
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, "/")
+                if name in referenced or os.path.getmtime(path) > cutoff:
+                    continue
+                orphans += 1
+                reclaimed += os.path.getsize(path)
+                self.stdout.write(name)
+                if not options["dry_run"]:
+                    os.remove(path)
+
+        action = "Found" if options["dry_run"] else "Deleted"
+        self.stdout.write(f"{action} {orphans} orphaned files ({reclaimed} bytes).")
@@ -0,0 +1,40 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import replica
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database into the read replica with the online backup API."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Refresh every this many seconds instead of once. Keep it well under REPLICA_MAX_LAG.",
+        )
+
+    def handle(self, *args, **options):
+        if not replica.configured():
+            raise CommandError(f"No '{replica.ALIAS}' database is configured.")
+        while True:
+            started = time.perf_counter()
+            try:
+                replica.refresh()
+            except Exception as exc:
+                if not options["interval"]:
+                    raise CommandError(f"Replica refresh failed: {exc}") from exc
+                # e.g. a locked or full disk; the replica just ages until the
+                # next tick, and past REPLICA_MAX_LAG reads go to the primary
+                logger.exception("Replica refresh failed")
+                self.stderr.write(f"Replica refresh failed: {exc}")
+            else:
+                self.stdout.write(f"Replica refreshed in {(time.perf_counter() - started) * 1000:.0f} ms.")
+            if not options["interval"]:
+                return
+            time.sleep(max(options["interval"] - (time.perf_counter() - started), 0))
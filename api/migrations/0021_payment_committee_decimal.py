@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:34
+
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations, models
+
+COMMITTEE_FIELDS = ["cf", "lac", "pta", "qaa", "rhc"]
+
+
+def clean_amount(value):
+    """Normalize a free-text amount ("Php 1,000", " 55 ", "") to a 2dp string or None."""
+    if value is None:
+        return None
+    text = str(value).strip().lower()
+    for token in ("php.", "php", "\u20b1", ","):
+        text = text.replace(token, "")
+    text = text.strip()
+    if not text:
+        return None
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        return None
+    if not amount.is_finite():
+        return None
+    return str(amount.quantize(Decimal("0.01")))
+
+
+def clean_committee_amounts(apps, schema_editor):
+    Payment = apps.get_model('api', 'Payment')
+    payments = Payment.objects.only('id', *COMMITTEE_FIELDS)
+    for payment in payments.iterator(chunk_size=2000):
+        cleaned = {f: clean_amount(getattr(payment, f)) for f in COMMITTEE_FIELDS}
+        if any(cleaned[f] != getattr(payment, f) for f in COMMITTEE_FIELDS):
+            Payment.objects.filter(pk=payment.pk).update(**cleaned)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_payment_is_walk_in'),
+    ]
+
+    operations = [
+        migrations.RunPython(clean_committee_amounts, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='payment',
+            name='cf',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='lac',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='pta',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='qaa',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='rhc',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+    ]
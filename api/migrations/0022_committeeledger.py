@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:35
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+
+# Frozen copy of the api.ledger rules as of this migration
+COMMITTEE_FIELDS = ['cf', 'lac', 'pta', 'qaa', 'rhc']
+LEDGER_FIELDS = ['comittee_name', 'amount', 'school_year', 'semester', 'status', *COMMITTEE_FIELDS]
+
+
+def to_decimal(value):
+    if value is None:
+        return Decimal(0)
+    return Decimal(str(value)).quantize(Decimal('0.01'))
+
+
+def populate_ledger(apps, schema_editor):
+    Payment = apps.get_model('api', 'Payment')
+    CommitteeLedger = apps.get_model('api', 'CommitteeLedger')
+
+    rows = defaultdict(lambda: (Decimal(0), 0))
+    for payment in Payment.objects.values(*LEDGER_FIELDS).iterator(chunk_size=2000):
+        scope = (payment['school_year'] or '', payment['semester'] or '', payment['status'] or '')
+        keys = [('breakdown', key, to_decimal(payment[key])) for key in COMMITTEE_FIELDS if payment[key] is not None]
+        if payment['comittee_name'] is not None:
+            keys.append(('amount', payment['comittee_name'], to_decimal(payment['amount'])))
+        for kind, committee, value in keys:
+            total, count = rows[(kind, committee, *scope)]
+            rows[(kind, committee, *scope)] = (total + value, count + 1)
+
+    CommitteeLedger.objects.all().delete()
+    CommitteeLedger.objects.bulk_create(
+        [
+            CommitteeLedger(
+                kind=kind,
+                committee=committee,
+                school_year=school_year,
+                semester=semester,
+                status=status,
+                total=total,
+                count=count,
+            )
+            for (kind, committee, school_year, semester, status), (total, count) in rows.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_payment_committee_decimal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommitteeLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('breakdown', 'Fee breakdown'), ('amount', 'Payment amount')], max_length=16)),
+                ('committee', models.TextField()),
+                ('school_year', models.TextField(blank=True, default='')),
+                ('semester', models.TextField(blank=True, default='')),
+                ('status', models.TextField(blank=True, default='')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'committee', 'school_year', 'semester', 'status'), name='unique_committee_ledger_key')],
+            },
+        ),
+        migrations.RunPython(populate_ledger, migrations.RunPython.noop),
+    ]
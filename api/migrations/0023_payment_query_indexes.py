@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_committeeledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['-date_issued', '-id'], name='payment_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['student', '-date_issued', '-id'], name='payment_student_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['student', 'school_year', 'semester', 'is_walk_in'], name='payment_student_term_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['comittee_name', '-date_issued', '-id'], name='payment_committee_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'date_issued'], name='payment_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('cf__isnull', False)), fields=['-date_issued', '-id'], name='payment_cf_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('lac__isnull', False)), fields=['-date_issued', '-id'], name='payment_lac_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('pta__isnull', False)), fields=['-date_issued', '-id'], name='payment_pta_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('qaa__isnull', False)), fields=['-date_issued', '-id'], name='payment_qaa_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('rhc__isnull', False)), fields=['-date_issued', '-id'], name='payment_rhc_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentproof',
+            index=models.Index(fields=['payment', '-uploaded_at'], name='paymentproof_recent_idx'),
+        ),
+    ]
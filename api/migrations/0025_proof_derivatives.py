@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_report_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='derivatives_failed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='preview',
+            field=models.ImageField(blank=True, null=True, upload_to='payment_proofs/previews/'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='payment_proofs/thumbnails/'),
+        ),
+        migrations.AddField(
+            model_name='paymentproof',
+            name='derivatives_failed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='paymentproof',
+            name='preview',
+            field=models.ImageField(blank=True, null=True, upload_to='payment_proofs/previews/'),
+        ),
+        migrations.AddField(
+            model_name='paymentproof',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='payment_proofs/thumbnails/'),
+        ),
+    ]
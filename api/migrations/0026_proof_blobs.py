@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:41
+
+from collections import Counter
+
+import api.storage
+import django.core.validators
+from django.db import migrations, models
+
+
+def count_existing_references(apps, schema_editor):
+    ProofBlob = apps.get_model('api', 'ProofBlob')
+    counts = Counter()
+    for model_name in ('Payment', 'PaymentProof'):
+        model = apps.get_model('api', model_name)
+        names = model.objects.exclude(proof='').exclude(proof__isnull=True).values_list('proof', flat=True)
+        counts.update(names.iterator(chunk_size=2000))
+    ProofBlob.objects.bulk_create(
+        [ProofBlob(name=name, refcount=count) for name, count in counts.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_proof_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProofBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='proof',
+            field=models.ImageField(blank=True, null=True, storage=api.storage.ContentAddressedStorage(), upload_to='payment_proofs/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['jpg', 'jpeg', 'png', 'webp'])]),
+        ),
+        migrations.AlterField(
+            model_name='paymentproof',
+            name='proof',
+            field=models.ImageField(blank=True, null=True, storage=api.storage.ContentAddressedStorage(), upload_to='payment_proofs/', validators=[django.core.validators.FileExtensionValidator(['jpg', 'jpeg', 'png', 'webp'])]),
+        ),
+        migrations.RunPython(count_existing_references, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Prefix search on auth_user names (StudentDirectoryView). auth_user belongs to
+# django.contrib.auth, so the indexes are created here with vendor-specific
+# SQL matching how each backend compiles `istartswith`.
+NAME_COLUMNS = ['username', 'first_name', 'last_name']
+
+
+def create_name_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for column in NAME_COLUMNS:
+        if vendor == 'sqlite':
+            # LIKE is case-insensitive, so only a NOCASE index can serve it
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS "auth_user_{column}_nocase_idx" '
+                f'ON "auth_user" ("{column}" COLLATE NOCASE)'
+            )
+        elif vendor == 'postgresql':
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS "auth_user_{column}_upper_idx" '
+                f'ON "auth_user" (UPPER("{column}") varchar_pattern_ops)'
+            )
+
+
+def drop_name_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    suffix = {'sqlite': 'nocase', 'postgresql': 'upper'}.get(vendor)
+    if suffix is None:
+        return
+    for column in NAME_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "auth_user_{column}_{suffix}_idx"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0028_file_deletions'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['course', 'year_lvl'], name='profile_course_year_idx'),
+        ),
+        migrations.RunPython(create_name_indexes, drop_name_indexes),
+    ]
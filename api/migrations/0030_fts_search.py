@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:45
+
+from django.db import migrations
+
+# Frozen copy of the api.search schema as of this migration
+
+SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS api_student_search USING fts5(
+        username, full_name, course,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS api_payment_search USING fts5(
+        username, full_name, course, committee, feedback, payment,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+]
+
+# Names of the triggers api.search installs
+TRIGGERS = [
+    "api_payment_search_ai",
+    "api_payment_search_au",
+    "api_payment_search_ad",
+    "api_student_search_ai",
+    "api_student_search_au",
+    "api_student_search_ad",
+    "api_profile_search_ai",
+    "api_profile_search_au",
+    "api_profile_search_ad",
+]
+
+
+def install_search_index(apps, schema_editor):
+    # Only the tables. Triggers on auth_user/api_profile that refer to
+    # api_payment would break the later migrations that remake it, so the
+    # post_migrate hook (api.search.ensure_installed) creates them and fills
+    # the index once the whole plan has run.
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for statement in SCHEMA:
+            cursor.execute(statement)
+
+
+def uninstall_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute("DROP TABLE IF EXISTS api_student_search")
+        cursor.execute("DROP TABLE IF EXISTS api_payment_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0029_student_directory_indexes'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
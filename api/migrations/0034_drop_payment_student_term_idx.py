@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:21
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0033_reportjob_claimed_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='payment',
+            name='payment_student_term_idx',
+        ),
+    ]
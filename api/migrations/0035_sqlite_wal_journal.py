@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def set_journal_mode(mode):
+    def run(apps, schema_editor):
+        # journal_mode=WAL is stored in the database file, so it is set once
+        # here rather than on every connection. It cannot be changed inside a
+        # transaction, hence atomic = False below.
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA journal_mode={mode}")
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0034_drop_payment_student_term_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_journal_mode("WAL"), set_journal_mode("DELETE")),
+    ]
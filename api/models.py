@@ -1,13 +1,26 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import FileExtensionValidator
 from django.core.validators import MinValueValidator
 
+from .sqlite import atomic_write
+from .storage import proof_storage
+
+# Per-committee fee breakdown columns on Payment.
+COMMITTEE_FIELDS = ["cf", "lac", "pta", "qaa", "rhc"]
+
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     year_lvl = models.TextField(blank=True, null=True)
     course = models.TextField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["course", "year_lvl"], name="profile_course_year_idx"),
+        ]
+
     def __str__(self):
         return f"{self.user.username}'s Profile"
 
@@ -16,11 +29,16 @@ class Payment(models.Model):
     student = models.ForeignKey(User, on_delete=models.CASCADE)
     proof = models.ImageField(
         upload_to='payment_proofs/',
+        storage=proof_storage,
         blank=True,
         null=True,
         validators=[FileExtensionValidator(
             allowed_extensions=['jpg', 'jpeg', 'png', 'webp'])]
     )
+    # WebP derivatives of `proof`, filled in by the thumbnail worker
+    thumbnail = models.ImageField(upload_to='payment_proofs/thumbnails/', blank=True, null=True)
+    preview = models.ImageField(upload_to='payment_proofs/previews/', blank=True, null=True)
+    derivatives_failed = models.BooleanField(default=False)
     comittee_name = models.TextField(blank=True, null=True)
     amount = models.FloatField(
         blank=True,
@@ -33,20 +51,157 @@ class Payment(models.Model):
     payment = models.TextField(blank=True, null=True)
     date_issued = models.DateTimeField(auto_now_add=True)
     school_year = models.TextField(blank=True, null=True)
-    cf = models.TextField(blank=True, null=True)
-    lac = models.TextField(blank=True, null=True)
-    pta = models.TextField(blank=True, null=True)
-    qaa = models.TextField(blank=True, null=True)
-    rhc = models.TextField(blank=True, null=True)
+    cf = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    lac = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    pta = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    qaa = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    rhc = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
     is_walk_in = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Bumped on every write; a top-up sent with a stale one gets a 409 (api.topups)
+    version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # PaymentListView / cursor pagination
+            models.Index(fields=["-date_issued", "-id"], name="payment_recent_idx"),
+            # UserPaymentsList and StudentPaymentsView. The term filters are
+            # applied to one student's rows, already in page order, so an
+            # index on them is never chosen (explain_payment_queries).
+            models.Index(fields=["student", "-date_issued", "-id"], name="payment_student_recent_idx"),
+            # PaymentByCommitteeNameView / CommitteeTotalAmountView
+            models.Index(fields=["comittee_name", "-date_issued", "-id"], name="payment_committee_recent_idx"),
+            # print_payments_pdf: status equality, semester/school_year are icontains
+            models.Index(fields=["status", "date_issued"], name="payment_status_date_idx"),
+        ] + [
+            # PaymentByCommitteeView: `<committee>__isnull=False`
+            models.Index(
+                fields=["-date_issued", "-id"],
+                condition=models.Q(**{f"{key}__isnull": False}),
+                name=f"payment_{key}_recent_idx",
+            )
+            for key in COMMITTEE_FIELDS
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            self.version += 1
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "version"}
+        # The committee ledger and proof reference counts are updated from
+        # pre/post_save signals; keep them in the same transaction. The
+        # pre_save signals read first, hence BEGIN IMMEDIATE.
+        with atomic_write():
+            super().save(*args, **kwargs)
 
 
 class PaymentProof(models.Model):
     payment = models.ForeignKey(Payment, on_delete=models.CASCADE, related_name="proofs")
     proof = models.ImageField(
         upload_to='payment_proofs/',
+        storage=proof_storage,
         blank=True,
         null=True,
         validators=[FileExtensionValidator(['jpg', 'jpeg', 'png', 'webp'])]
     )
-    uploaded_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    thumbnail = models.ImageField(upload_to='payment_proofs/thumbnails/', blank=True, null=True)
+    preview = models.ImageField(upload_to='payment_proofs/previews/', blank=True, null=True)
+    derivatives_failed = models.BooleanField(default=False)
+    uploaded_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["payment", "-uploaded_at"], name="paymentproof_recent_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Keep the ProofBlob reference count in the same transaction.
+        with atomic_write():
+            super().save(*args, **kwargs)
+
+
+class ProofBlob(models.Model):
+    """Reference count for a stored proof file, maintained by api.blobs."""
+
+    name = models.CharField(max_length=255, unique=True)
+    refcount = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
+
+class CommitteeLedger(models.Model):
+    """Pre-aggregated payment totals, kept in sync by api.ledger."""
+
+    BREAKDOWN = "breakdown"  # committee is one of COMMITTEE_FIELDS
+    AMOUNT = "amount"        # committee is Payment.comittee_name
+    KIND_CHOICES = [(BREAKDOWN, "Fee breakdown"), (AMOUNT, "Payment amount")]
+
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    committee = models.TextField()
+    school_year = models.TextField(blank=True, default="")
+    semester = models.TextField(blank=True, default="")
+    status = models.TextField(blank=True, default="")
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "committee", "school_year", "semester", "status"],
+                name="unique_committee_ledger_key",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.committee} {self.school_year} {self.semester} {self.status}"
+
+
+
+class ReportJob(models.Model):
+    """A payment summary PDF rendered by the `run_report_worker` command."""
+
+    PENDING = "Pending"
+    RUNNING = "Running"
+    DONE = "Done"
+    FAILED = "Failed"
+    STATUS_CHOICES = [(PENDING, PENDING), (RUNNING, RUNNING), (DONE, DONE), (FAILED, FAILED)]
+
+    semester = models.TextField(blank=True, default="")
+    school_year = models.TextField(blank=True, default="")
+    cache_key = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    file = models.FileField(upload_to="reports/", blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when a worker takes the job; a Running job whose claim is older
+    # than REPORT_JOB_CLAIM_TIMEOUT belonged to a worker that died
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="reportjob_queue_idx"),
+        ]
+
+
+
+class UploadSession(models.Model):
+    """A resumable, chunked proof upload; bytes are kept on disk by api.uploads."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    payment = models.ForeignKey(Payment, on_delete=models.CASCADE, related_name="upload_sessions")
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class FileDeletion(models.Model):
+    """A stored file to unlink once the transaction that dropped it commits."""
+
+    name = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
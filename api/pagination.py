@@ -0,0 +1,48 @@
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+from .fast_serializers import Fieldset, payment_rows, payment_values
+
+
+class PaymentCursorPagination(CursorPagination):
+    """
+    Cursor pagination ordered by (-date_issued, -id).
+
+    This is not a true keyset over both columns: DRF's cursor holds only the
+    first ordering field, so pages are fetched with `WHERE date_issued <
+    <cursor>` and payments sharing a date_issued across a page boundary are
+    skipped with an OFFSET. Deep pages still cost the same as the first one
+    as long as few payments share a timestamp; `-id` only makes the order of
+    those ties stable. Pass `?paginate=false` to get the old unpaginated list.
+    """
+
+    ordering = ("-date_issued", "-id")
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    unpaginated_query_param = "paginate"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.unpaginated_query_param) == "false":
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class StudentCursorPagination(PaymentCursorPagination):
+    """Cursor pagination over the unique (and indexed) username, so no ties."""
+
+    ordering = ("username",)
+
+
+def paginated_payment_rows(request, queryset, view=None):
+    """
+    Cursor-paginate PaymentSerializer-shaped lists, built by the values()
+    fast path with the request's ?fields=/?expand= applied.
+    """
+    fieldset = Fieldset.for_payments(request)
+    rows = payment_values(queryset, fieldset)
+    paginator = PaymentCursorPagination()
+    page = paginator.paginate_queryset(rows, request, view=view)
+    if page is not None:
+        return paginator.get_paginated_response(payment_rows(page, request, fieldset))
+    return Response(payment_rows(rows.order_by(*paginator.ordering), request, fieldset))
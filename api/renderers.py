@@ -0,0 +1,46 @@
+"""
+JSON rendering through orjson.
+
+ORJSONRenderer produces the same bytes as DRF's JSONRenderer for the
+compact (non-indented) case: datetimes ending in +00:00 are written with a
+"Z", Decimals as numbers, and anything orjson does not know natively
+(lazy strings, querysets, timedeltas, ...) goes through DRF's own encoder.
+Indented output (the browsable API, `Accept: application/json; indent=4`)
+and installs without orjson fall back to JSONRenderer.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    # orjson raises TypeError for unknown types; JSONEncoder.default does too
+    return _encoder.default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    options = 0 if orjson is None else (
+        orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        if not api_settings.COMPACT_JSON or not api_settings.UNICODE_JSON:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=_default, option=self.options)
+        # Same escaping as JSONRenderer: U+2028/2029 are valid JSON but
+        # end a line in JavaScript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,186 @@
+"""
+Read replica for report and list views.
+
+The replica is a copy of the primary SQLite file made with SQLite's online
+backup API (`manage.py refresh_replica`, run on a schedule). Views opt in
+with ReplicaReadMixin / @replica_reads; inside them PrimaryReplicaRouter
+(api/routers.py) sends reads to the "replica" alias, and everything else
+stays on the primary.
+
+Reads fall back to the primary when:
+
+- the request is not a GET/HEAD
+- the replica is missing or older than REPLICA_MAX_LAG seconds
+- the client (same address or same Authorization header) wrote something
+  (a successful POST/PUT/PATCH/DELETE, recorded by ReplicaPinMiddleware)
+  after the replica was last refreshed, so nobody reads a snapshot older
+  than their own write
+
+Pins are empty files in a directory next to the replica, one per client
+key, whose mtime is the time of the last write, like the "-refreshed"
+stamp. A cache would cull them at random once full. refresh() creates the
+directory before the first snapshot (until then reads never use the
+replica, so there is nothing to pin) and deletes pins too old to matter.
+"""
+import contextvars
+import functools
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import closing, contextmanager
+
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+
+ALIAS = "replica"
+READ_METHODS = ("GET", "HEAD")
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+_reading = contextvars.ContextVar("replica_reading", default=False)
+
+
+def configured():
+    return ALIAS in settings.DATABASES
+
+
+def path():
+    return str(settings.DATABASES[ALIAS]["NAME"])
+
+
+def _stamp_path():
+    return path() + "-refreshed"
+
+
+def _pin_dir():
+    return path() + "-pins"
+
+
+def max_lag():
+    return getattr(settings, "REPLICA_MAX_LAG", 60)
+
+
+def refreshed_at():
+    """Time of the snapshot the replica holds, or None if there is none."""
+    try:
+        return os.stat(_stamp_path()).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def refresh():
+    """Copy the primary into the replica; returns the snapshot time."""
+    source = str(settings.DATABASES["default"]["NAME"])
+    timeout = settings.DATABASES[ALIAS].get("OPTIONS", {}).get("timeout", 20)
+    # Before `started`, so writes during the first copy are pinned too
+    os.makedirs(_pin_dir(), exist_ok=True)
+    started = time.time()
+    # The backup holds a read transaction on the primary for the whole
+    # copy, so the replica is a consistent snapshot as of `started`.
+    # Replica readers see the new pages on their next query.
+    with closing(sqlite3.connect(source, timeout=timeout)) as primary, \
+            closing(sqlite3.connect(path(), timeout=timeout)) as replica:
+        primary.backup(replica)
+    with open(_stamp_path(), "a"):
+        pass
+    os.utime(_stamp_path(), (started, started))
+    prune_pins()
+    return started
+
+
+def prune_pins():
+    """
+    Delete pins older than twice REPLICA_MAX_LAG; returns how many.
+
+    By then any snapshot from before the write is too old to be used anyway.
+    """
+    cutoff = time.time() - 2 * max_lag()
+    pruned = 0
+    with os.scandir(_pin_dir()) as entries:
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    pruned += 1
+            except FileNotFoundError:
+                pass
+    return pruned
+
+
+def _client_keys(request):
+    # The address as well as the token: register/login are written without
+    # one, and the first authenticated read after them must still see it
+    keys = [request.META.get("REMOTE_ADDR", "")]
+    if request.headers.get("Authorization"):
+        keys.append(request.headers["Authorization"])
+    return [hashlib.sha1(key.encode(), usedforsecurity=False).hexdigest() for key in keys]
+
+
+def pin(request):
+    """Keep this client's reads on the primary until the replica catches up."""
+    now = time.time()
+    for key in _client_keys(request):
+        pin_path = os.path.join(_pin_dir(), key)
+        try:
+            with open(pin_path, "a"):
+                pass
+        except FileNotFoundError:
+            return  # never refreshed, so no reads use the replica yet
+        os.utime(pin_path, (now, now))
+
+
+def _pinned_at(key):
+    try:
+        return os.stat(os.path.join(_pin_dir(), key)).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def usable_for(request):
+    if not configured() or request.method not in READ_METHODS:
+        return False
+    snapshot = refreshed_at()
+    if snapshot is None or time.time() - snapshot > max_lag():
+        return False
+    writes = (_pinned_at(key) for key in _client_keys(request))
+    return all(wrote_at < snapshot for wrote_at in writes if wrote_at is not None)
+
+
+def reading():
+    """True while the current request's reads may go to the replica."""
+    return _reading.get()
+
+
+@contextmanager
+def reads_for(request):
+    token = _reading.set(usable_for(request))
+    try:
+        yield
+    finally:
+        _reading.reset(token)
+
+
+def replica_reads(view_func):
+    """Decorator for function views whose reads may use the replica."""
+
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        with reads_for(request):
+            return view_func(request, *args, **kwargs)
+
+    return wrapper
+
+
+class ReplicaReadMixin:
+    """For class-based views whose reads may use the replica."""
+
+    def dispatch(self, request, *args, **kwargs):
+        with reads_for(request):
+            return super().dispatch(request, *args, **kwargs)
+
+
+class ReplicaPinMiddleware(MiddlewareMixin):
+    def process_response(self, request, response):
+        if configured() and request.method in WRITE_METHODS and 200 <= response.status_code < 300:
+            pin(request)
+        return response
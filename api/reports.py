@@ -0,0 +1,250 @@
+import hashlib
+import json
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from .blobs import enqueue_deletion
+from .models import Payment, ReportJob
+from .sqlite import atomic_write
+
+# Fee breakdown columns in the order they are printed
+FEE_LABELS = [
+    ("pta", "PTA (Parents Teacher Association)"),
+    ("qaa", "QAA (Quality Assurance Accreditation)"),
+    ("lac", "LAC (Library Advisory Committee)"),
+    ("cf", "CF (Contingency Fund)"),
+    ("rhc", "RHC (Registrar Clinic)"),
+]
+
+REPORT_FIELDS = [
+    "id",
+    "comittee_name",
+    "status",
+    "date_issued",
+    "student__first_name",
+    "student__last_name",
+    *[key for key, _ in FEE_LABELS],
+]
+
+CHUNK_SIZE = 500
+
+# Reports under this size stay in memory; larger ones spill to a temp file
+SPOOL_MAX_SIZE = 1024 * 1024
+
+# ReportJob.file upload_to
+REPORTS_DIR = "reports"
+
+
+def term_filter(semester, school_year):
+    """The report's semester/school year match: case-insensitive substrings."""
+    return Q(semester__icontains=semester, school_year__icontains=school_year)
+
+
+def payments_report_queryset(semester, school_year):
+    return Payment.objects.filter(term_filter(semester, school_year), status='Accepted')
+
+
+def committee_subtotals(payments):
+    """Return {fee: (total, count)} for the fee columns in one aggregate query."""
+    aggregates = {}
+    for key, _ in FEE_LABELS:
+        aggregates[f"{key}_total"] = Sum(key)
+        aggregates[f"{key}_count"] = Count(key)
+    result = payments.aggregate(**aggregates)
+    return {key: (result[f"{key}_total"] or 0, result[f"{key}_count"]) for key, _ in FEE_LABELS}
+
+
+def render_payments_pdf(output, semester, school_year):
+    """Draw the payment summary for the given filters into `output`."""
+    payments = payments_report_queryset(semester, school_year)
+    subtotals = committee_subtotals(payments)
+
+    p = canvas.Canvas(output, pagesize=letter)
+    width, height = letter
+
+    y = height - 50
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(50, y, "Payment Summary")
+    y -= 40
+
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, y, f"School Year: {school_year}")
+    y -= 20
+    p.drawString(50, y, f"Semester: {semester}")
+    y -= 30
+
+    p.drawString(50, y, "Committee Subtotals")
+    y -= 20
+
+    p.setFont("Helvetica", 10)
+    for key, label in FEE_LABELS:
+        total, count = subtotals[key]
+        p.drawString(80, y, f"{label}: Php. {total:.2f} ({count} payments)")
+        y -= 15
+    y -= 15
+
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, y, "Payment Records")
+    y -= 25
+
+    # Only the drawn columns, student joined in, fetched in chunks
+    rows = payments.order_by('date_issued').values(*REPORT_FIELDS).iterator(chunk_size=CHUNK_SIZE)
+
+    p.setFont("Helvetica", 10)
+    for pay in rows:
+        if y < 150:
+            p.showPage()
+            y = height - 50
+            p.setFont("Helvetica", 10)
+
+        student = f"{pay['student__first_name']} {pay['student__last_name']}".strip()
+
+        p.drawString(50, y, f"Payment ID: {pay['id']}")
+        y -= 15
+        p.drawString(50, y, f"Student: {student}")
+        y -= 15
+        p.drawString(50, y, f"Committee: {pay['comittee_name']}")
+        y -= 20
+
+        for key, label in FEE_LABELS:
+            p.drawString(80, y, f"{label}: Php. {pay[key] or '0'}")
+            y -= 15
+        y -= 10
+
+        p.drawString(80, y, f"Status: {pay['status']}")
+        y -= 15
+        p.drawString(80, y, f"Date Issued: {pay['date_issued'].strftime('%Y-%m-%d %H:%M')}")
+        y -= 30
+
+    p.showPage()
+    p.save()
+
+
+def spooled_payments_pdf(semester, school_year):
+    """Render the report into a spooled temp file positioned for streaming."""
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    render_payments_pdf(output, semester, school_year)
+    output.seek(0)
+    return output
+
+
+def report_cache_key(semester, school_year):
+    """
+    Hash of the filters plus the scope's watermark.
+
+    The newest updated_at changes whenever a payment in scope is created or
+    edited, and the count changes when one is deleted, so a stored PDF is
+    reused exactly until its contents would differ.
+    """
+    watermark = payments_report_queryset(semester, school_year).aggregate(
+        updated=Max("updated_at"),
+        count=Count("id"),
+    )
+    payload = json.dumps(
+        {
+            "semester": semester,
+            "school_year": school_year,
+            "updated": watermark["updated"].isoformat() if watermark["updated"] else None,
+            "count": watermark["count"],
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def requeue_stale_jobs():
+    """Put Running jobs whose worker died (claim older than the timeout) back in the queue."""
+    cutoff = timezone.now() - settings.REPORT_JOB_CLAIM_TIMEOUT
+    return ReportJob.objects.filter(
+        Q(claimed_at__lt=cutoff) | Q(claimed_at__isnull=True),
+        status=ReportJob.RUNNING,
+    ).update(status=ReportJob.PENDING, claimed_at=None)
+
+
+def submit_report_job(semester, school_year):
+    """Reuse a finished or in-flight job for the same key, else queue a new one."""
+    cache_key = report_cache_key(semester, school_year)
+    # A dead worker's job goes back to Pending rather than being handed out
+    # as Running forever
+    requeue_stale_jobs()
+    existing = (
+        ReportJob.objects.filter(cache_key=cache_key)
+        .exclude(status=ReportJob.FAILED)
+        .order_by("-created_at")
+        .first()
+    )
+    if existing is not None:
+        if existing.status != ReportJob.DONE:
+            return existing
+        if existing.file and existing.file.storage.exists(existing.file.name):
+            return existing
+    return ReportJob.objects.create(semester=semester, school_year=school_year, cache_key=cache_key)
+
+
+def claim_next_job():
+    """Atomically move the oldest pending job to Running; None when the queue is empty."""
+    requeue_stale_jobs()
+    for job in ReportJob.objects.filter(status=ReportJob.PENDING).order_by("created_at")[:10]:
+        now = timezone.now()
+        claimed = ReportJob.objects.filter(pk=job.pk, status=ReportJob.PENDING).update(
+            status=ReportJob.RUNNING,
+            claimed_at=now,
+        )
+        if claimed:
+            job.status = ReportJob.RUNNING
+            job.claimed_at = now
+            return job
+    return None
+
+
+def run_report_job(job):
+    try:
+        output = spooled_payments_pdf(job.semester, job.school_year)
+        with output:
+            job.file.save(f"{job.cache_key}.pdf", File(output), save=False)
+        job.status = ReportJob.DONE
+        job.error = None
+    except Exception as exc:
+        job.status = ReportJob.FAILED
+        job.error = str(exc)
+    job.finished_at = timezone.now()
+
+    # Only the worker still holding the claim records the result: a job
+    # that ran past the timeout may have been requeued and taken by another
+    owned = ReportJob.objects.filter(pk=job.pk, status=ReportJob.RUNNING, claimed_at=job.claimed_at).update(
+        file=job.file.name or None,
+        status=job.status,
+        error=job.error,
+        finished_at=job.finished_at,
+    )
+    if not owned and job.file:
+        job.file.storage.delete(job.file.name)
+    return job
+
+
+def purge_report_jobs(max_age=None):
+    """
+    Delete finished jobs older than `max_age` (default REPORT_JOB_RETENTION)
+    and queue their PDFs, plus any unreferenced PDF that old, for deletion.
+    """
+    cutoff = timezone.now() - (max_age or settings.REPORT_JOB_RETENTION)
+    with atomic_write():
+        expired = ReportJob.objects.filter(status__in=[ReportJob.DONE, ReportJob.FAILED], finished_at__lt=cutoff)
+        names = [name for name in expired.values_list("file", flat=True) if name]
+        purged, _ = expired.delete()
+
+        live = set(ReportJob.objects.exclude(file="").exclude(file=None).values_list("file", flat=True))
+        if default_storage.exists(REPORTS_DIR):
+            for filename in default_storage.listdir(REPORTS_DIR)[1]:
+                name = f"{REPORTS_DIR}/{filename}"
+                if name not in live and name not in names and default_storage.get_modified_time(name) < cutoff:
+                    names.append(name)
+        enqueue_deletion(names)
+    return purged, len(names)
@@ -0,0 +1,121 @@
+"""
+Response cache for PaymentByCommitteeView.
+
+Entries live in the "responses" cache under versioned keys,
+
+    committee-list:<committee>:v<version>:<hash of the full URL>
+
+so invalidating a committee is a single increment of its version; old
+entries are never read again and simply expire. A version evicted by the
+cache's culling is recreated from the clock, never from a number already
+used. A payment is listed under every committee whose column is non-null,
+so a write invalidates only the committees it appears under before or
+after the change.
+"""
+import hashlib
+import random
+import time
+
+from django.core.cache import caches
+
+from .models import COMMITTEE_FIELDS
+
+CACHE_ALIAS = "responses"
+PREFIX = "committee-list"
+STATS = ("hits", "misses", "invalidations")
+# Hits and misses are counted for one lookup in this many, so stats()
+# reports them as estimates; invalidations are counted every time.
+STATS_SAMPLE = 20
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _version_key(committee):
+    return f"{PREFIX}:{committee}:version"
+
+
+def _new_version():
+    # The cache culls entries (MAX_ENTRIES), versions included. A version
+    # recreated as 1 would match responses cached under the old v1 that
+    # are still within their TTL, so a fresh one starts from the clock,
+    # past any number handed out before.
+    return time.time_ns()
+
+
+def _add(key, delta, initial):
+    cache = _cache()
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # Missing; add() keeps a concurrent first write
+        if cache.add(key, initial, timeout=None):
+            return initial
+        return cache.incr(key, delta)
+
+
+def _version(committee):
+    cache = _cache()
+    version = cache.get(_version_key(committee))
+    if version is None:
+        cache.add(_version_key(committee), _new_version(), timeout=None)
+        version = cache.get(_version_key(committee)) or _new_version()
+    return version
+
+
+def _count(name):
+    # Sampled: a counter write on every request would mean a cache file
+    # write per list request, and FileBasedCache.incr is a read then a
+    # write, not atomic. The totals are estimates, labelled so in stats().
+    if random.random() < 1 / STATS_SAMPLE:
+        _add(f"{PREFIX}:stats:{name}", STATS_SAMPLE, STATS_SAMPLE)
+
+
+def response_key(committee, url):
+    digest = hashlib.sha1(url.encode(), usedforsecurity=False).hexdigest()
+    return f"{PREFIX}:{committee}:v{_version(committee)}:{digest}"
+
+
+def lookup(committee, url):
+    """Return (key, cached data or None), counting the hit or miss."""
+    key = response_key(committee, url)
+    data = _cache().get(key)
+    _count("hits" if data is not None else "misses")
+    return key, data
+
+
+def store(key, data):
+    _cache().set(key, data)
+
+
+def committees_of(payment):
+    """Committees a payment (instance or dict) is listed under."""
+    if isinstance(payment, dict):
+        return {key for key in COMMITTEE_FIELDS if payment.get(key) is not None}
+    return {key for key in COMMITTEE_FIELDS if getattr(payment, key) is not None}
+
+
+def invalidate(committees=COMMITTEE_FIELDS):
+    for committee in committees:
+        _add(_version_key(committee), 1, _new_version())
+        _add(f"{PREFIX}:stats:invalidations", 1, 1)
+
+
+def stats():
+    """
+    Counters for the stats endpoint. Hits and misses are extrapolated from
+    one lookup in STATS_SAMPLE, hence the `estimated_` names; the hit rate
+    is an estimate too.
+    """
+    values = _cache().get_many([f"{PREFIX}:stats:{name}" for name in STATS])
+    hits, misses, invalidations = (values.get(f"{PREFIX}:stats:{name}", 0) for name in STATS)
+    lookups = hits + misses
+    return {
+        "estimated_hits": hits,
+        "estimated_misses": misses,
+        "estimated_hit_rate": round(hits / lookups, 3) if lookups else None,
+        "sampled_every": STATS_SAMPLE,
+        "invalidations": invalidations,
+        "versions": {committee: _cache().get(_version_key(committee)) for committee in COMMITTEE_FIELDS},
+    }
@@ -0,0 +1,70 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import ledger, response_cache
+from .models import Payment
+from .sqlite import atomic_write
+
+# Marks "leave this column alone" in a review decision
+UNCHANGED = object()
+
+# Statuses a review may set. Payment.status is free text, but
+# print_payments_pdf and the ledger group by the exact value.
+REVIEW_STATUSES = ["Pending", "Accepted", "Rejected"]
+
+
+def review_payments(decisions):
+    """
+    Apply [(payment_id, status, feedback)] in one transaction.
+
+    `status` or `feedback` may be UNCHANGED. Payments sharing the same
+    decision are updated with a single UPDATE, and the ledger is adjusted
+    once for the whole batch, since queryset updates skip the save signals.
+
+    Returns {payment_id: "updated" | "unchanged" | "not_found"}.
+    """
+    decisions = {payment_id: (status_, feedback) for payment_id, status_, feedback in decisions}
+    results = {}
+
+    with atomic_write():
+        rows = {
+            row["id"]: row
+            for row in Payment.objects.select_for_update()
+            .filter(pk__in=list(decisions))
+            .values("id", "feedback", *ledger.LEDGER_FIELDS)
+        }
+
+        groups = {}
+        deltas = []
+        for payment_id, (status_, feedback) in decisions.items():
+            row = rows.get(payment_id)
+            if row is None:
+                results[payment_id] = "not_found"
+                continue
+            changes = {}
+            if status_ is not UNCHANGED and status_ != row["status"]:
+                changes["status"] = status_
+            if feedback is not UNCHANGED and feedback != row["feedback"]:
+                changes["feedback"] = feedback
+            if not changes:
+                results[payment_id] = "unchanged"
+                continue
+
+            groups.setdefault(tuple(sorted(changes.items())), []).append(payment_id)
+            if "status" in changes:
+                deltas.append(ledger.diff(ledger.contributions(row), ledger.contributions({**row, **changes})))
+            results[payment_id] = "updated"
+
+        now = timezone.now()
+        for changes, ids in groups.items():
+            Payment.objects.filter(pk__in=ids).update(updated_at=now, version=F("version") + 1, **dict(changes))
+        ledger.apply(ledger.merge(*deltas))
+
+        committees = set()
+        for payment_id, result in results.items():
+            if result == "updated":
+                committees |= response_cache.committees_of(rows[payment_id])
+        transaction.on_commit(lambda: response_cache.invalidate(committees))
+
+    return results
@@ -0,0 +1,197 @@
+"""
+Bulk student registration from a CSV roster.
+
+Columns: username, password, first_name, last_name, course, year_lvl
+(username, password and course are required). Every row is validated
+before anything is written; valid rows are then hashed and inserted with
+bulk_create, `batch_size` users at a time. Bad rows are reported and
+skipped without failing the rest of the import.
+
+Hashing is the slow part. The `import_roster` command spreads it over a
+process pool; RosterImportView hashes in the request's own process and
+takes at most ROSTER_IMPORT_MAX_ROWS students per upload.
+"""
+import csv
+import io
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from .models import Profile
+
+COLUMNS = ["username", "password", "first_name", "last_name", "course", "year_lvl"]
+REQUIRED = ["username", "password", "course"]
+
+DEFAULT_BATCH_SIZE = 500
+
+# Below this many passwords a pool costs more to start than it saves
+POOL_THRESHOLD = 32
+
+username_validator = UnicodeUsernameValidator()
+
+
+class RosterTooLarge(Exception):
+    pass
+
+
+def max_request_rows():
+    return getattr(settings, "ROSTER_IMPORT_MAX_ROWS", 200)
+
+
+def read_rows(source):
+    """
+    Yield (line_number, row) from CSV text, bytes or a binary file.
+
+    Header names are case-insensitive; extra columns are ignored.
+    """
+    if isinstance(source, bytes):
+        source = source.decode("utf-8-sig")
+    if isinstance(source, str):
+        source = io.StringIO(source)
+    elif not isinstance(source, io.TextIOBase):
+        source = io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+
+    reader = csv.DictReader(source)
+    if not reader.fieldnames:
+        raise csv.Error("the file is empty.")
+    reader.fieldnames = [(name or "").strip().lower() for name in reader.fieldnames]
+    for row in reader:
+        yield reader.line_num, {column: (row.get(column) or "").strip() for column in COLUMNS}
+
+
+def row_errors(row):
+    errors = [f"{column} is required." for column in REQUIRED if not row[column]]
+    if row["username"]:
+        try:
+            username_validator(row["username"])
+        except ValidationError as exc:
+            errors += exc.messages
+    max_length = {field: User._meta.get_field(field).max_length for field in ("username", "first_name", "last_name")}
+    for field, limit in max_length.items():
+        if len(row[field]) > limit:
+            errors.append(f"{field} is longer than {limit} characters.")
+    return errors
+
+
+def validate(rows):
+    """
+    Split (line, row) pairs into valid rows and per-row errors.
+
+    Usernames are checked against each other and against the database in
+    one query rather than one per row.
+    """
+    valid, errors = [], []
+    seen = {}
+    for line, row in rows:
+        messages = row_errors(row)
+        username = row["username"]
+        if username and username in seen:
+            messages.append(f"Duplicate of line {seen[username]}.")
+        elif username:
+            seen[username] = line
+        if messages:
+            errors.append({"line": line, "username": username, "errors": messages})
+        else:
+            valid.append((line, row))
+
+    existing = set(
+        User.objects.filter(username__in=[row["username"] for _, row in valid]).values_list("username", flat=True)
+    )
+    if existing:
+        errors += [
+            {"line": line, "username": row["username"], "errors": ["A user with that username already exists."]}
+            for line, row in valid
+            if row["username"] in existing
+        ]
+        valid = [(line, row) for line, row in valid if row["username"] not in existing]
+
+    errors.sort(key=lambda error: error["line"])
+    return valid, errors
+
+
+def _setup_worker():
+    # Spawned workers (non-fork platforms) start without Django configured
+    import django
+
+    django.setup()
+
+
+def hash_passwords(passwords, workers=1):
+    """make_password() every entry, spread over `workers` processes for large lists."""
+    if len(passwords) < POOL_THRESHOLD or workers <= 1:
+        return [make_password(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker) as pool:
+        return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+
+def _create_batch(batch):
+    """Insert one batch of (line, row, hashed_password); returns (created, errors)."""
+    users = [
+        User(
+            username=row["username"],
+            password=hashed,
+            first_name=row["first_name"],
+            last_name=row["last_name"],
+        )
+        for _, row, hashed in batch
+    ]
+    try:
+        with transaction.atomic():
+            users = User.objects.bulk_create(users)
+            Profile.objects.bulk_create(
+                [
+                    Profile(user=user, course=row["course"], year_lvl=row["year_lvl"] or None)
+                    for user, (_, row, _) in zip(users, batch)
+                ]
+            )
+        return len(users), []
+    except IntegrityError:
+        pass
+
+    # Someone registered one of these usernames since validation: retry the
+    # batch row by row so only the conflicting rows fail.
+    created, errors = 0, []
+    for user, (line, row, _) in zip(users, batch):
+        user.pk = None
+        try:
+            with transaction.atomic():
+                user.save()
+                Profile.objects.create(user=user, course=row["course"], year_lvl=row["year_lvl"] or None)
+            created += 1
+        except IntegrityError as exc:
+            errors.append({"line": line, "username": row["username"], "errors": [str(exc)]})
+    return created, errors
+
+
+def import_roster(source, batch_size=DEFAULT_BATCH_SIZE, workers=1, dry_run=False, max_rows=None):
+    """
+    Validate and register every student in `source`; returns a summary dict.
+
+    Raises RosterTooLarge, before hashing anything, if more than `max_rows`
+    students would be created.
+    """
+    valid, errors = validate(read_rows(source))
+    result = {"valid": len(valid), "created": 0, "errors": errors}
+    if dry_run or not valid:
+        return result
+    if max_rows is not None and len(valid) > max_rows:
+        raise RosterTooLarge(
+            f"{len(valid)} students in one upload; the limit is {max_rows}. "
+            "Import larger rosters with `manage.py import_roster`."
+        )
+
+    hashed = hash_passwords([row["password"] for _, row in valid], workers=workers)
+    rows = [(line, row, password) for (line, row), password in zip(valid, hashed)]
+    for start in range(0, len(rows), batch_size):
+        created, batch_errors = _create_batch(rows[start:start + batch_size])
+        result["created"] += created
+        errors += batch_errors
+
+    errors.sort(key=lambda error: error["line"])
+    return result
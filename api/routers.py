@@ -0,0 +1,23 @@
+from . import replica
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes, migrations and reads outside replica-enabled views go to the
+    primary; reads inside them go to the replica (see api/replica.py).
+    """
+
+    def db_for_read(self, model, **hints):
+        if replica.reading():
+            return replica.ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != replica.ALIAS
@@ -0,0 +1,244 @@
+"""
+SQLite FTS5 search over students and payments.
+
+Two contentful FTS5 tables whose rowids are the source primary keys, kept in
+sync by triggers so queryset updates and raw SQL are covered too:
+
+- api_student_search: one row per non-superuser (username, full_name, course)
+- api_payment_search: one row per payment, with the student's username,
+  full name and course copied in next to committee, feedback and payment
+"""
+import re
+
+from django.db import connection, connections, transaction
+
+SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS api_student_search USING fts5(
+        username, full_name, course,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS api_payment_search USING fts5(
+        username, full_name, course, committee, feedback, payment,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+]
+
+# SELECT bodies shared by the triggers and the rebuild
+STUDENT_ROW = """
+    SELECT u.id, u.username, TRIM(u.first_name || ' ' || u.last_name), COALESCE(p.course, '')
+    FROM auth_user u LEFT JOIN api_profile p ON p.user_id = u.id
+    WHERE u.is_superuser = 0
+"""
+
+PAYMENT_ROW = """
+    SELECT pay.id, u.username, TRIM(u.first_name || ' ' || u.last_name), COALESCE(p.course, ''),
+           COALESCE(pay.comittee_name, ''), COALESCE(pay.feedback, ''), COALESCE(pay.payment, '')
+    FROM api_payment pay
+    JOIN auth_user u ON u.id = pay.student_id
+    LEFT JOIN api_profile p ON p.user_id = u.id
+"""
+
+INSERT_STUDENT = "INSERT INTO api_student_search (rowid, username, full_name, course)"
+INSERT_PAYMENT = (
+    "INSERT INTO api_payment_search (rowid, username, full_name, course, committee, feedback, payment)"
+)
+
+# Copy a student's name/course onto all of their payment rows
+REFRESH_STUDENT_PAYMENTS = """
+    UPDATE api_payment_search SET
+        username = (SELECT username FROM auth_user WHERE id = {user}),
+        full_name = (SELECT TRIM(first_name || ' ' || last_name) FROM auth_user WHERE id = {user}),
+        course = COALESCE((SELECT course FROM api_profile WHERE user_id = {user}), '')
+    WHERE rowid IN (SELECT id FROM api_payment WHERE student_id = {user});
+"""
+
+TRIGGERS = {
+    "api_payment_search_ai": f"""
+        AFTER INSERT ON api_payment BEGIN
+            {INSERT_PAYMENT} {PAYMENT_ROW} WHERE pay.id = NEW.id;
+        END
+    """,
+    "api_payment_search_au": f"""
+        AFTER UPDATE OF comittee_name, feedback, payment, student_id ON api_payment BEGIN
+            DELETE FROM api_payment_search WHERE rowid = OLD.id;
+            {INSERT_PAYMENT} {PAYMENT_ROW} WHERE pay.id = NEW.id;
+        END
+    """,
+    "api_payment_search_ad": """
+        AFTER DELETE ON api_payment BEGIN
+            DELETE FROM api_payment_search WHERE rowid = OLD.id;
+        END
+    """,
+    "api_student_search_ai": f"""
+        AFTER INSERT ON auth_user BEGIN
+            {INSERT_STUDENT} {STUDENT_ROW} AND u.id = NEW.id;
+        END
+    """,
+    "api_student_search_au": f"""
+        AFTER UPDATE OF username, first_name, last_name, is_superuser ON auth_user BEGIN
+            DELETE FROM api_student_search WHERE rowid = OLD.id;
+            {INSERT_STUDENT} {STUDENT_ROW} AND u.id = NEW.id;
+            {REFRESH_STUDENT_PAYMENTS.format(user="NEW.id")}
+        END
+    """,
+    "api_student_search_ad": """
+        AFTER DELETE ON auth_user BEGIN
+            DELETE FROM api_student_search WHERE rowid = OLD.id;
+        END
+    """,
+    "api_profile_search_ai": f"""
+        AFTER INSERT ON api_profile BEGIN
+            UPDATE api_student_search SET course = COALESCE(NEW.course, '') WHERE rowid = NEW.user_id;
+            {REFRESH_STUDENT_PAYMENTS.format(user="NEW.user_id")}
+        END
+    """,
+    "api_profile_search_au": f"""
+        AFTER UPDATE OF course, user_id ON api_profile BEGIN
+            UPDATE api_student_search SET course = '' WHERE rowid = OLD.user_id;
+            {REFRESH_STUDENT_PAYMENTS.format(user="OLD.user_id")}
+            UPDATE api_student_search SET course = COALESCE(NEW.course, '') WHERE rowid = NEW.user_id;
+            {REFRESH_STUDENT_PAYMENTS.format(user="NEW.user_id")}
+        END
+    """,
+    "api_profile_search_ad": f"""
+        AFTER DELETE ON api_profile BEGIN
+            UPDATE api_student_search SET course = '' WHERE rowid = OLD.user_id;
+            {REFRESH_STUDENT_PAYMENTS.format(user="OLD.user_id")}
+        END
+    """,
+}
+
+# bm25 column weights: names count most, free text least
+STUDENT_WEIGHTS = "10.0, 8.0, 2.0"
+PAYMENT_WEIGHTS = "6.0, 6.0, 1.0, 4.0, 1.0, 2.0"
+
+SEARCH_SQL = f"""
+    SELECT 'student' AS kind, rowid AS id, bm25(api_student_search, {STUDENT_WEIGHTS}) AS score
+    FROM api_student_search WHERE api_student_search MATCH %s
+    UNION ALL
+    SELECT 'payment' AS kind, rowid AS id, bm25(api_payment_search, {PAYMENT_WEIGHTS}) AS score
+    FROM api_payment_search WHERE api_payment_search MATCH %s
+    ORDER BY score
+    LIMIT %s OFFSET %s
+"""
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class SearchUnavailable(Exception):
+    pass
+
+
+def is_supported(conn=connection):
+    return conn.vendor == "sqlite"
+
+
+def create_tables(cursor):
+    for statement in SCHEMA:
+        cursor.execute(statement)
+
+
+def drop_triggers(cursor):
+    for name in TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def install(cursor):
+    """Create the FTS tables and (re)create the triggers. SQLite only."""
+    create_tables(cursor)
+    for name, body in TRIGGERS.items():
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"CREATE TRIGGER {name} {body}")
+
+
+def uninstall(cursor):
+    drop_triggers(cursor)
+    cursor.execute("DROP TABLE IF EXISTS api_student_search")
+    cursor.execute("DROP TABLE IF EXISTS api_payment_search")
+
+
+def _existing(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        return {row[0] for row in cursor.fetchall()}
+
+
+# Tables the triggers read or are defined on, by (app_label, model_name)
+TRIGGER_MODELS = {("auth", "user"), ("api", "profile"), ("api", "payment")}
+
+
+def _alters_trigger_models(plan):
+    for migration, _backwards in plan:
+        for operation in migration.operations:
+            model = getattr(operation, "model_name_lower", None) or getattr(operation, "name_lower", None)
+            if (migration.app_label, model) in TRIGGER_MODELS:
+                return True
+    return False
+
+
+def suspend_triggers(using="default", plan=None, **kwargs):
+    """
+    pre_migrate hook: drop the triggers before a plan that alters one of
+    TRIGGER_MODELS.
+
+    SQLite remakes a table to alter it, and the rename at the end fails
+    while a trigger on another table (auth_user, api_profile) still refers
+    to the old one. post_migrate puts them back and refills the index, so
+    plans that leave these tables alone keep the triggers.
+    """
+    conn = connections[using]
+    if not plan or not is_supported(conn) or not _alters_trigger_models(plan):
+        return
+    if "api_payment_search" in _existing(conn):
+        with conn.cursor() as cursor:
+            drop_triggers(cursor)
+
+
+def ensure_installed(using="default", **kwargs):
+    """
+    post_migrate hook: create the triggers (0030 only makes the tables) or
+    put back the ones suspend_triggers dropped, and refill the index, since
+    rows may have changed while they were down.
+    """
+    conn = connections[using]
+    if not is_supported(conn):
+        return
+    existing = _existing(conn)
+    if "api_payment_search" not in existing or set(TRIGGERS) <= existing:
+        # Search not migrated in yet, or nothing to repair
+        return
+    with transaction.atomic(using=using), conn.cursor() as cursor:
+        install(cursor)
+        rebuild(cursor)
+
+
+def rebuild(cursor):
+    """Refill both FTS tables from the source rows."""
+    cursor.execute("DELETE FROM api_student_search")
+    cursor.execute("DELETE FROM api_payment_search")
+    cursor.execute(f"{INSERT_STUDENT} {STUDENT_ROW}")
+    cursor.execute(f"{INSERT_PAYMENT} {PAYMENT_ROW}")
+    cursor.execute("INSERT INTO api_student_search (api_student_search) VALUES ('optimize')")
+    cursor.execute("INSERT INTO api_payment_search (api_payment_search) VALUES ('optimize')")
+
+
+def build_match(query):
+    """Turn free text into an FTS5 query: every word must match as a prefix."""
+    tokens = TOKEN_RE.findall(query)
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def search(query, limit, offset):
+    """Return [(kind, id, score)] ranked best first."""
+    if not is_supported():
+        raise SearchUnavailable("Full-text search requires SQLite FTS5.")
+    match = build_match(query)
+    if not match:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(SEARCH_SQL, [match, match, limit, offset])
+        return cursor.fetchall()
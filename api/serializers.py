@@ -1,7 +1,13 @@
+from pathlib import Path
+
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Profile, Payment, PaymentProof
+from .models import Profile, Payment, PaymentProof, ReportJob, UploadSession
 from django.db.models import Sum
+from django.urls import reverse
+from django.conf import settings
+from django.core.validators import FileExtensionValidator
+from .reviews import REVIEW_STATUSES, UNCHANGED
 
 class UserSerializer(serializers.ModelSerializer):
     profile = serializers.SerializerMethodField()
@@ -66,6 +72,7 @@ class PaymentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = '__all__'
+        read_only_fields = ['thumbnail', 'preview', 'derivatives_failed', 'version']
 
     
 
@@ -103,9 +110,11 @@ class PaymentDetailSerializer(serializers.ModelSerializer):
             'qaa',
             'rhc',
             'is_walk_in',
+            'version',
         ]
-        
-        
+        read_only_fields = ['version']
+
+
 class PaymentDeleteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Payment
@@ -131,6 +140,7 @@ class PaymentTypeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = '__all__'
+        read_only_fields = ['thumbnail', 'preview', 'derivatives_failed', 'version']
         
         
 class CommitteePaymentTotalSerializer(serializers.Serializer):
@@ -159,8 +169,8 @@ class CommitteePaymentTotalSerializer(serializers.Serializer):
 class PaymentProofSerializer(serializers.ModelSerializer):
     class Meta:
         model = PaymentProof
-        fields = ['id', 'payment', 'proof', 'uploaded_at']
-        read_only_fields = ['id', 'uploaded_at', 'payment']
+        fields = ['id', 'payment', 'proof', 'thumbnail', 'preview', 'uploaded_at']
+        read_only_fields = ['id', 'uploaded_at', 'payment', 'thumbnail', 'preview']
         
         
 
@@ -175,4 +185,78 @@ class CommitteeTotalsSerializer(serializers.Serializer):
 class RemovePaymentProofSerializer(serializers.ModelSerializer):
     class Meta:
         model = Payment
-        fields = ["id"]
\ No newline at end of file
+        fields = ["id"]
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = ["id", "semester", "school_year", "status", "error", "created_at", "finished_at", "download_url"]
+        read_only_fields = ["id", "status", "error", "created_at", "finished_at"]
+
+    def get_download_url(self, obj):
+        if obj.status != ReportJob.DONE:
+            return None
+        url = reverse("report-job-download", kwargs={"job_id": obj.id})
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ["id", "payment", "filename", "size", "received", "created_at"]
+        read_only_fields = ["id", "payment", "received", "created_at"]
+
+    def validate_filename(self, value):
+        FileExtensionValidator(['jpg', 'jpeg', 'png', 'webp'])(Path(value))
+        return value
+
+    def validate_size(self, value):
+        if value <= 0 or value > settings.CHUNKED_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"Size must be between 1 and {settings.CHUNKED_UPLOAD_MAX_SIZE} bytes."
+            )
+        return value
+
+
+class PaymentReviewItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=REVIEW_STATUSES, required=False)
+    feedback = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+
+class PaymentReviewSerializer(serializers.Serializer):
+    """
+    Either `ids` with one `status`/`feedback` for all of them, or `items`
+    with per-payment values (top-level `status`/`feedback` fill the gaps).
+    """
+    MAX_PAYMENTS = 1000
+
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+    items = PaymentReviewItemSerializer(many=True, required=False)
+    status = serializers.ChoiceField(choices=REVIEW_STATUSES, required=False)
+    feedback = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+    def validate(self, attrs):
+        items = [{"id": payment_id} for payment_id in attrs.get("ids", [])] + attrs.get("items", [])
+        if not items:
+            raise serializers.ValidationError("Provide `ids` or `items`.")
+        if len(items) > self.MAX_PAYMENTS:
+            raise serializers.ValidationError(f"At most {self.MAX_PAYMENTS} payments per request.")
+        ids = [item["id"] for item in items]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError("Each payment may only appear once.")
+
+        decisions = []
+        for item in items:
+            status_ = item.get("status", attrs.get("status", UNCHANGED))
+            feedback = item.get("feedback", attrs.get("feedback", UNCHANGED))
+            if status_ is UNCHANGED and feedback is UNCHANGED:
+                raise serializers.ValidationError(f"Payment {item['id']}: give a status or feedback.")
+            decisions.append((item["id"], status_, feedback))
+        attrs["decisions"] = decisions
+        return attrs
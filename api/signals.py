@@ -0,0 +1,106 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+
+from . import authentication, blobs, ledger, response_cache, thumbnails
+from .models import CommitteeLedger, Payment, PaymentProof, Profile
+
+
+@receiver(pre_save, sender=Payment)
+def remember_ledger_contributions(sender, instance, raw=False, **kwargs):
+    before = {}
+    if not raw and instance.pk is not None:
+        row = Payment.objects.filter(pk=instance.pk).values(*ledger.LEDGER_FIELDS).first()
+        if row is not None:
+            before = ledger.contributions(row)
+    instance._ledger_before = before
+    instance._committees_before = {key[1] for key in before if key[0] == CommitteeLedger.BREAKDOWN}
+
+
+@receiver(post_save, sender=Payment)
+def update_ledger_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    before = getattr(instance, "_ledger_before", {})
+    ledger.apply(ledger.diff(before, ledger.contributions(instance)))
+    instance._ledger_before = ledger.contributions(instance)
+
+
+@receiver(post_delete, sender=Payment)
+def update_ledger_on_delete(sender, instance, **kwargs):
+    ledger.apply(ledger.diff(ledger.contributions(instance), {}))
+
+
+@receiver(post_save, sender=Payment)
+def invalidate_committee_lists_on_save(sender, instance, raw=False, **kwargs):
+    committees = getattr(instance, "_committees_before", set()) | response_cache.committees_of(instance)
+    # After commit, so a concurrent request cannot cache the old rows under
+    # the new version.
+    transaction.on_commit(lambda: response_cache.invalidate(committees))
+
+
+@receiver(post_delete, sender=Payment)
+def invalidate_committee_lists_on_delete(sender, instance, **kwargs):
+    committees = response_cache.committees_of(instance)
+    transaction.on_commit(lambda: response_cache.invalidate(committees))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_committee_lists_on_student_change(sender, instance, raw=False, update_fields=None, **kwargs):
+    # The lists nest each payment's student and profile
+    if raw or update_fields == frozenset(["last_login"]):
+        return
+    transaction.on_commit(response_cache.invalidate)
+
+
+@receiver(pre_save, sender=Payment)
+@receiver(pre_save, sender=PaymentProof)
+def track_proof_change(sender, instance, raw=False, **kwargs):
+    """
+    Remember the stored proof name for the refcount update in post_save, and
+    drop the thumbnail/preview when `proof` is replaced or cleared.
+    """
+    instance._proof_before = ""
+    if raw or instance.pk is None:
+        return
+    fields = ["proof", *[field for field, _ in thumbnails.DERIVATIVES]]
+    old = sender.objects.filter(pk=instance.pk).values(*fields).first()
+    if old is None:
+        return
+    instance._proof_before = old["proof"] or ""
+    if instance._proof_before == (instance.proof.name or ""):
+        return
+    blobs.enqueue_deletion([old[field] for field, _ in thumbnails.DERIVATIVES])
+    for field, _ in thumbnails.DERIVATIVES:
+        setattr(instance, field, None)
+    instance.derivatives_failed = False
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=PaymentProof)
+def update_proof_refcount_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    before = getattr(instance, "_proof_before", "")
+    after = instance.proof.name or ""
+    if before != after:
+        blobs.retain(after)
+        blobs.release(before)
+    instance._proof_before = after
+
+
+@receiver(post_delete, sender=Payment)
+@receiver(post_delete, sender=PaymentProof)
+def update_proof_refcount_on_delete(sender, instance, **kwargs):
+    # Also covers cascades, e.g. PaymentProof rows removed with their Payment
+    blobs.release(instance.proof.name)
+    blobs.enqueue_deletion([getattr(instance, field).name for field, _ in thumbnails.DERIVATIVES])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_auth_state(sender, instance, **kwargs):
+    authentication.forget(instance.pk)
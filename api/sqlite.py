@@ -0,0 +1,76 @@
+"""
+SQLite write transactions and bounded retry for "database is locked".
+
+Transactions start DEFERRED (see DATABASES in backend/settings.py), so
+read-only atomic() blocks never take the write lock. A DEFERRED
+transaction that reads before it writes has to upgrade its lock, and in
+WAL mode that upgrade fails at once, without waiting out the busy
+timeout, if another writer committed in between. `atomic_write` is for
+those blocks: it opens the transaction with BEGIN IMMEDIATE, taking the
+write lock up front. Blocks whose first statement is a write do not need it.
+
+With that, a writer waits for the lock instead of failing, so
+`retry_on_locked` only matters when a write queue is longer than the busy
+timeout. It reruns the whole write a few times with a growing, jittered
+pause before letting the error through.
+"""
+import functools
+import random
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import OperationalError, connection, transaction
+
+ATTEMPTS = 3
+BACKOFF = 0.05  # seconds, doubled per attempt
+
+
+def is_locked(exc):
+    message = str(exc)
+    return "database is locked" in message or "database table is locked" in message
+
+
+@contextmanager
+def atomic_write(using=None):
+    """
+    transaction.atomic() that begins with BEGIN IMMEDIATE on SQLite.
+
+    Nested in another atomic() block it is a plain savepoint, and the outer
+    block's BEGIN decides.
+    """
+    conn = transaction.get_connection(using)
+    with ExitStack() as stack:
+        if conn.vendor == "sqlite" and not conn.in_atomic_block:
+            # Connecting resets transaction_mode from OPTIONS, so connect first
+            conn.ensure_connection()
+            previous, conn.transaction_mode = conn.transaction_mode, "IMMEDIATE"
+            try:
+                stack.enter_context(transaction.atomic(using=using))
+            finally:
+                conn.transaction_mode = previous
+        else:
+            stack.enter_context(transaction.atomic(using=using))
+        yield
+
+
+def retry_on_locked(func=None, *, attempts=ATTEMPTS, backoff=BACKOFF):
+    """
+    Decorate a write (or a view method doing one) to retry it on a lock error.
+
+    A retry inside an outer atomic() block would only repeat part of a
+    transaction, so there the error is raised straight away.
+    """
+    if func is None:
+        return functools.partial(retry_on_locked, attempts=attempts, backoff=backoff)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt in range(attempts):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as exc:
+                if not is_locked(exc) or connection.in_atomic_block or attempt == attempts - 1:
+                    raise
+            time.sleep(backoff * 2 ** attempt * (0.5 + random.random()))
+
+    return wrapper
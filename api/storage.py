@@ -0,0 +1,72 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# payment_proofs/ab/cd/<sha256>.<ext>
+CONTENT_NAME_LENGTH = 64
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores each distinct upload once, under `<upload_to>/ab/cd/<sha256><ext>`.
+
+    The upload is hashed while it is streamed to a temp file next to its final
+    location; if a blob with the same digest already exists the temp file is
+    dropped, the existing file's mtime is refreshed and its name is returned. Deleting is reference counted
+    by api.blobs, so callers should not delete these files directly.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Names are derived from the content, so an existing name is a hit,
+        # not a collision.
+        return name
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower()
+        os.makedirs(self.path(directory or "."), exist_ok=True)
+
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=self.path(directory or "."), suffix=".upload")
+        try:
+            with os.fdopen(fd, "wb") as temp:
+                if hasattr(content, "seek"):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp.write(chunk)
+
+            hexdigest = digest.hexdigest()
+            final_name = posixpath.join(directory, hexdigest[:2], hexdigest[2:4], hexdigest + extension)
+            final_path = self.path(final_name)
+
+            try:
+                # A hit: touch it, so api.blobs.drain_deletions leaves it alone
+                # even if the reference is not committed yet
+                os.utime(final_path)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temp_path, self.file_permissions_mode)
+                os.replace(temp_path, final_path)
+            else:
+                os.remove(temp_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return final_name
+
+
+def is_content_addressed(name):
+    stem = posixpath.splitext(posixpath.basename(name or ""))[0]
+    return len(stem) == CONTENT_NAME_LENGTH and all(c in "0123456789abcdef" for c in stem)
+
+
+proof_storage = ContentAddressedStorage()
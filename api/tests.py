@@ -1,3 +1,1304 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import zlib
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, migrations, models, transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import authentication, blobs, ledger, replica, reports, response_cache, roster, search, thumbnails, topups, uploads
+from .renderers import ORJSONRenderer
+from .fast_serializers import Fieldset, payment_rows, payment_values
+from .models import CommitteeLedger, FileDeletion, Payment, PaymentProof, ProofBlob, Profile, ReportJob, UploadSession
+from .serializers import PaymentSerializer
+from .sqlite import atomic_write
+from .storage import proof_storage
+from .views import CustomTokenObtainPairSerializer
+
+# Keep the response cache out of the project's cache dir
+TEST_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "responses": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "responses"},
+}
+
+
+def normalize(data):
+    return json.loads(JSONRenderer().render(data))
+
+
+def bearer(user):
+    return {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+
+
+def make_payments():
+    """A few students and payments covering nulls, decimals, files and flags."""
+    with_profile = User.objects.create_user("2021-0001", first_name="Ana", last_name="Cruz", email="ana@example.com")
+    Profile.objects.create(user=with_profile, year_lvl="First Year", course="BSIT")
+    without_profile = User.objects.create_user("2021-0002", first_name="Ben", last_name="Reyes")
+    payments = []
+    for i in range(12):
+        payments.append(Payment.objects.create(
+            student=with_profile if i % 2 else without_profile,
+            comittee_name="CF" if i % 3 else None,
+            amount=150.5 if i % 4 else None,
+            semester="First Semester",
+            school_year="2025-2026",
+            status="Accepted" if i % 2 else "Pending",
+            feedback="" if i % 5 else None,
+            proof=f"payment_proofs/test/{i}.jpg" if i % 4 == 0 else None,
+            cf=Decimal("50.00") if i % 2 else None,
+            lac=Decimal("25.5") if i % 3 == 0 else None,
+            pta=Decimal("0.10"),
+            is_walk_in=bool(i % 5 == 0),
+        ))
+    return payments
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PaymentRowsParityTests(TestCase):
+    """payment_rows() must render exactly what PaymentSerializer renders."""
+
+    @classmethod
+    def setUpTestData(cls):
+        make_payments()
+
+    def setUp(self):
+        self.queryset = Payment.objects.select_related("student", "student__profile").order_by("-date_issued", "-id")
+
+    def request(self, **params):
+        return Request(RequestFactory().get("/api/payments/", params))
+
+    def serializer_rows(self, request):
+        return normalize(PaymentSerializer(self.queryset, many=True, context={"request": request}).data)
+
+    def test_full_shape_matches_serializer(self):
+        request = self.request()
+        expected = self.serializer_rows(request)
+        actual = normalize(payment_rows(payment_values(self.queryset), request))
+        # Key order is part of the contract too
+        self.assertEqual([list(row) for row in actual], [list(row) for row in expected])
+        self.assertEqual(actual, expected)
+
+    def test_sparse_fieldsets_are_projections_of_serializer(self):
+        request = self.request()
+        expected = self.serializer_rows(request)
+        variants = [
+            ({"fields": "id,status,amount,date_issued"},
+             lambda row: {key: row[key] for key in ("id", "amount", "status", "date_issued")}),
+            ({"fields": "id,student,cf,lac"},
+             lambda row: {"id": row["id"], "student": row["student"]["id"], "cf": row["cf"], "lac": row["lac"]}),
+            ({"fields": "id,status", "expand": "student"},
+             lambda row: {
+                 "id": row["id"],
+                 "student": {key: value for key, value in row["student"].items() if key != "profile"},
+                 "status": row["status"],
+             }),
+            ({"fields": "id,student.first_name,student.last_name"},
+             lambda row: {
+                 "id": row["id"],
+                 "student": {key: row["student"][key] for key in ("first_name", "last_name")},
+             }),
+            ({"fields": "id,proof", "expand": "profile"},
+             lambda row: {"id": row["id"], "student": row["student"], "proof": row["proof"]}),
+        ]
+        for params, project in variants:
+            with self.subTest(**params):
+                sparse = self.request(**params)
+                fieldset = Fieldset.for_payments(sparse)
+                actual = normalize(payment_rows(payment_values(self.queryset, fieldset), request, fieldset))
+                self.assertEqual(actual, [project(row) for row in expected])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PaymentFieldsetApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.payments = make_payments()
+
+    def test_fields_limit_keys(self):
+        response = self.client.get("/api/payments/", {"fields": "id,status", "page_size": 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([list(row) for row in response.json()["results"]], [["id", "status"]] * 3)
+
+    def test_student_without_expand_is_an_id_and_not_joined(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/payments/", {"fields": "id,student", "page_size": 3})
+        row = response.json()["results"][0]
+        self.assertIsInstance(row["student"], int)
+        payment_sql = [query["sql"] for query in queries if "api_payment" in query["sql"]]
+        self.assertTrue(payment_sql)
+        self.assertFalse(any("auth_user" in sql for sql in payment_sql))
+
+    def test_cursor_pagination_without_ordering_fields(self):
+        first = self.client.get("/api/payments/", {"fields": "id", "page_size": 5}).json()
+        second = self.client.get(first["next"]).json()
+        ids = [row["id"] for row in first["results"] + second["results"]]
+        expected = list(Payment.objects.order_by("-date_issued", "-id").values_list("id", flat=True)[:10])
+        self.assertEqual(ids, expected)
+
+    def test_unknown_field_or_expansion_is_400(self):
+        response = self.client.get("/api/payments/", {"fields": "id,bogus", "expand": "nope"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("fields", response.json())
+        self.assertIn("expand", response.json())
+
+    def test_other_payment_lists_accept_fields(self):
+        student = self.payments[1].student_id
+        for url in [f"/api/payments/user/{student}/", f"/api/payment_filter/{student}/", "/api/payment-type/CF/"]:
+            with self.subTest(url=url):
+                response = self.client.get(url, {"fields": "id,cf"})
+                self.assertEqual(response.status_code, 200)
+                data = response.json()
+                rows = data["results"] if isinstance(data, dict) else data
+                self.assertTrue(rows)
+                self.assertTrue(all(list(row) == ["id", "cf"] for row in rows))
+
+    def test_students_list_fields_and_profile(self):
+        rows = self.client.get("/api/students/", {"fields": "id,profile"}).json()
+        by_id = {row["id"]: row for row in rows}
+        ana = User.objects.get(username="2021-0001")
+        ben = User.objects.get(username="2021-0002")
+        self.assertEqual(by_id[ana.id]["profile"]["course"], "BSIT")
+        self.assertIsNone(by_id[ben.id]["profile"])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class StudentDirectoryApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_superuser("admin", password="x")
+        rows = [
+            ("2021-0001", "Ana", "Cruz", "BSIT", "3"),
+            ("2021-0002", "Ben", "Reyes", "BSIT", "2"),
+            ("2021-0003", "Carla", "Anders", "BSCS", "3"),
+            ("2022-0004", "Dan", "Santos", "BSIT", "3"),
+            ("2022-0005", "Ana", "Lim", "BSCS", "1"),
+        ]
+        for username, first_name, last_name, course, year_lvl in rows:
+            user = User.objects.create_user(username, first_name=first_name, last_name=last_name)
+            Profile.objects.create(user=user, course=course, year_lvl=year_lvl)
+
+    def usernames(self, **params):
+        response = self.client.get("/api/students/directory/", params)
+        self.assertEqual(response.status_code, 200)
+        return [row["username"] for row in response.json()["results"]]
+
+    def test_filters_by_course_and_year_level(self):
+        self.assertEqual(self.usernames(course="BSIT"), ["2021-0001", "2021-0002", "2022-0004"])
+        self.assertEqual(self.usernames(course="BSIT", year_lvl="3"), ["2021-0001", "2022-0004"])
+
+    def test_search_matches_name_and_username_prefixes(self):
+        self.assertEqual(self.usernames(search="ana"), ["2021-0001", "2022-0005"])
+        self.assertEqual(self.usernames(search="and"), ["2021-0003"])
+        self.assertEqual(self.usernames(search="2022-"), ["2022-0004", "2022-0005"])
+        # prefix only: "ruz" is inside "Cruz" but starts nothing
+        self.assertEqual(self.usernames(search="ruz"), [])
+
+    def test_pages_by_username_and_skips_superusers(self):
+        first = self.client.get("/api/students/directory/", {"page_size": 2}).json()
+        self.assertEqual(first["results"][0]["profile"]["course"], "BSIT")
+        usernames = [row["username"] for row in first["results"]]
+        page = first
+        while page["next"]:
+            page = self.client.get(page["next"]).json()
+            usernames += [row["username"] for row in page["results"]]
+        self.assertEqual(usernames, ["2021-0001", "2021-0002", "2021-0003", "2022-0004", "2022-0005"])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class LedgerSyncTests(TestCase):
+    """Every write path keeps CommitteeLedger equal to a rebuild from the payments."""
+
+    def setUp(self):
+        self.student = User.objects.create_user("2021-0012")
+        for i in range(3):
+            Payment.objects.create(
+                student=self.student, comittee_name="SSG", amount=100 + i, cf=Decimal("5.00"),
+                semester="First Semester", school_year="2025-2026",
+            )
+        self.payment = Payment.objects.filter(student=self.student).first()
+
+    def assertLedgerInSync(self):
+        self.assertTrue(CommitteeLedger.objects.exists())
+        self.assertEqual(ledger.verify(), [])
+
+    def test_submit(self):
+        response = self.client.post(
+            f"/api/submit-payment/{self.student.id}/",
+            {"comittee_name": "LAC", "amount": 50, "lac": "12.50", "semester": "First Semester"},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertLedgerInSync()
+
+    def test_patch(self):
+        response = self.client.patch(
+            f"/api/payments/{self.payment.id}/edit/",
+            {"status": "Accepted", "amount": "120", "comittee_name": "LAC"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertLedgerInSync()
+
+    def test_top_up(self):
+        response = self.client.put(
+            f"/api/update_payment/{self.payment.id}/", {"cf": "2.25", "rhc": "1"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertLedgerInSync()
+
+    def test_bulk_review(self):
+        admin = User.objects.create_user("admin", is_staff=True)
+        ids = list(Payment.objects.values_list("id", flat=True))
+        response = self.client.post(
+            "/api/payments/review/",
+            {"items": [{"id": ids[0], "status": "Rejected"}], "ids": ids[1:], "status": "Accepted"},
+            content_type="application/json",
+            headers=bearer(admin),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["updated"], 3)
+        self.assertLedgerInSync()
+
+    def test_delete(self):
+        response = self.client.delete(f"/api/payments/delete/{self.payment.id}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertLedgerInSync()
+
+    def test_user_cascade(self):
+        other = User.objects.create_user("2021-0013")
+        Payment.objects.create(student=other, comittee_name="SSG", amount=7, cf=Decimal("1.00"))
+        other.delete()
+        self.assertLedgerInSync()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user("2021-0014")
+        self.profile = Profile.objects.create(user=self.student, course="BSIT")
+        self.payment = Payment.objects.create(student=self.student, comittee_name="SSG", amount=10)
+        PaymentProof.objects.create(payment=self.payment, proof="payment_proofs/a.jpg")
+        self.urls = [
+            f"/api/payments/{self.payment.id}/",
+            f"/api/profiles/{self.student.id}/",
+            f"/api/payment/{self.payment.id}/proofs/",
+        ]
+
+    def test_matching_etag_gets_304(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn("no-cache", response.headers["Cache-Control"])
+                again = self.client.get(url, headers={"If-None-Match": response.headers["ETag"]})
+                self.assertEqual(again.status_code, 304)
+                self.assertEqual(again.content, b"")
+                self.assertEqual(again.headers["ETag"], response.headers["ETag"])
+
+    def test_last_modified_on_payment_detail(self):
+        url = self.urls[0]
+        response = self.client.get(url)
+        last_modified = response.headers["Last-Modified"]
+        self.assertEqual(self.client.get(url, headers={"If-Modified-Since": last_modified}).status_code, 304)
+
+    def test_etag_changes_after_a_write(self):
+        etags = {url: self.client.get(url).headers["ETag"] for url in self.urls}
+        self.client.put(f"/api/update_payment/{self.payment.id}/", {"cf": "1"}, content_type="application/json")
+        self.profile.course = "BSCS"
+        self.profile.save()
+        PaymentProof.objects.create(payment=self.payment, proof="payment_proofs/b.jpg")
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, headers={"If-None-Match": etag})
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response.headers["ETag"], etag)
+
+    def test_missing_object_is_still_404(self):
+        self.assertEqual(self.client.get("/api/payments/999999/").status_code, 404)
+
+
+class ORJSONRendererTests(TestCase):
+    def test_same_bytes_as_drf(self):
+        from datetime import date, datetime, time as clock, timezone as tz
+        from uuid import UUID
+        from zoneinfo import ZoneInfo
+
+        from django.utils.translation import gettext_lazy
+
+        data = {
+            "decimals": [Decimal("10.50"), Decimal("0.01"), Decimal("9999999999.99")],
+            "utc": datetime(2025, 6, 1, 8, 30, 15, 123456, tzinfo=tz.utc),
+            "manila": datetime(2025, 6, 1, 16, 30, tzinfo=ZoneInfo("Asia/Manila")),
+            "naive": datetime(2025, 6, 1, 8, 30),
+            "date": date(2025, 6, 1),
+            "time": clock(8, 30, 15),
+            "uuid": UUID("12345678-1234-5678-1234-567812345678"),
+            "lazy": gettext_lazy("This field is required."),
+            "text": "Ñiño \u2028 line \u2029 para",
+            "nested": [{"id": 1, "ok": True, "none": None}],
+            1: "int key",
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indented_output_falls_back_to_drf(self):
+        data = {"amount": Decimal("1.50")}
+        accepted = "application/json; indent=2"
+        self.assertEqual(ORJSONRenderer().render(data, accepted), JSONRenderer().render(data, accepted))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PaymentReviewApiTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user("admin", is_staff=True)
+        student = User.objects.create_user("2021-0015")
+        self.ids = [Payment.objects.create(student=student, comittee_name="SSG", amount=5).id for _ in range(3)]
+
+    def review(self, data, user=None):
+        return self.client.post(
+            "/api/payments/review/", data, content_type="application/json", headers=bearer(user or self.admin)
+        )
+
+    def test_rejects_unknown_status(self):
+        for data in (
+            {"ids": self.ids, "status": "Acepted"},
+            {"items": [{"id": self.ids[0], "status": "approved"}]},
+        ):
+            with self.subTest(data=data):
+                response = self.review(data)
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(Payment.objects.values_list("status", flat=True)), {"Pending"})
+
+    def test_per_id_results(self):
+        Payment.objects.filter(pk=self.ids[1]).update(status="Accepted")
+        response = self.review({"ids": [*self.ids, 999999], "status": "Accepted"})
+        self.assertEqual(response.status_code, 200)
+        results = {row["id"]: row["result"] for row in response.json()["results"]}
+        self.assertEqual(results, {
+            self.ids[0]: "updated", self.ids[1]: "unchanged", self.ids[2]: "updated", 999999: "not_found",
+        })
+        self.assertEqual(response.json()["updated"], 2)
+
+    def test_feedback_only_and_duplicates(self):
+        response = self.review({"items": [{"id": self.ids[0], "feedback": "Blurry receipt"}]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Payment.objects.get(pk=self.ids[0]).feedback, "Blurry receipt")
+        self.assertEqual(self.review({"ids": [self.ids[0], self.ids[0]], "status": "Accepted"}).status_code, 400)
+
+    def test_admins_only(self):
+        student = User.objects.get(username="2021-0015")
+        self.assertEqual(self.review({"ids": self.ids, "status": "Accepted"}, user=student).status_code, 403)
+
+
+@override_settings(CACHES=TEST_CACHES, PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class RosterImportApiTests(TestCase):
+    HEADER = "username,password,first_name,last_name,course,year_lvl\n"
+
+    def setUp(self):
+        self.admin = User.objects.create_user("admin", is_staff=True)
+
+    def upload(self, content, user=None, **params):
+        query = "?dry_run=1" if params.get("dry_run") else ""
+        return self.client.post(
+            f"/api/register/roster/{query}",
+            {"file": SimpleUploadedFile("roster.csv", content.encode())},
+            headers=bearer(user or self.admin),
+        )
+
+    def test_bad_and_duplicate_rows_are_reported_and_skipped(self):
+        User.objects.create_user("2021-0099")
+        response = self.upload(self.HEADER + "\n".join([
+            "2021-0100,pw,Ana,Cruz,BSIT,1",
+            "2021-0101,pw,Ben,Reyes,,2",
+            "bad name!,pw,Cy,Lim,BSIT,1",
+            "2021-0100,pw,Ana,Cruz,BSIT,1",
+            "2021-0099,pw,Dee,Tan,BSCS,3",
+        ]))
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body["valid"], body["created"]), (1, 1))
+        self.assertEqual([error["line"] for error in body["errors"]], [3, 4, 5, 6])
+        self.assertEqual(body["errors"][0]["errors"], ["course is required."])
+        self.assertEqual(body["errors"][2]["errors"], ["Duplicate of line 2."])
+        self.assertEqual(User.objects.get(username="2021-0100").profile.course, "BSIT")
+        self.assertTrue(User.objects.get(username="2021-0100").check_password("pw"))
+
+    def test_empty_file(self):
+        response = self.upload("")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("empty", response.json()["detail"])
+        header_only = self.upload(self.HEADER)
+        self.assertEqual(header_only.status_code, 200)
+        self.assertEqual(header_only.json()["created"], 0)
+
+    def test_dry_run_writes_nothing(self):
+        response = self.upload(self.HEADER + "2021-0102,pw,,,BSIT,\n", dry_run=True)
+        self.assertEqual((response.status_code, response.json()["valid"]), (200, 1))
+        self.assertFalse(User.objects.filter(username="2021-0102").exists())
+
+    def test_hashes_in_process(self):
+        rows = "".join(f"2021-2{i:03},pw,,,BSIT,\n" for i in range(roster.POOL_THRESHOLD + 5))
+        with mock.patch.object(roster, "ProcessPoolExecutor", side_effect=AssertionError("forked a pool")):
+            response = self.upload(self.HEADER + rows)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["created"], roster.POOL_THRESHOLD + 5)
+
+    @override_settings(ROSTER_IMPORT_MAX_ROWS=1)
+    def test_large_rosters_are_left_to_the_command(self):
+        response = self.upload(self.HEADER + "2021-0103,pw,,,BSIT,\n2021-0104,pw,,,BSIT,\n")
+        self.assertEqual(response.status_code, 413)
+        self.assertIn("import_roster", response.json()["detail"])
+        self.assertFalse(User.objects.filter(username__in=["2021-0103", "2021-0104"]).exists())
+
+    def test_admins_only(self):
+        student = User.objects.create_user("2021-0105")
+        self.assertEqual(self.upload(self.HEADER, user=student).status_code, 403)
+
+
+class TempMediaMixin:
+    """Point MEDIA_ROOT (and the upload dir) at a throwaway directory."""
+
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media, CHUNKED_UPLOAD_DIR=f"{self.media}/upload_sessions")
+        media.enable()
+        self.addCleanup(media.disable)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ReportJobTests(TempMediaMixin, TestCase):
+    def test_resubmit_gets_running_job_within_timeout(self):
+        job = reports.submit_report_job("", "2025-2026")
+        self.assertEqual(reports.claim_next_job().pk, job.pk)
+        self.assertEqual(reports.submit_report_job("", "2025-2026").pk, job.pk)
+        self.assertIsNone(reports.claim_next_job())
+
+    def test_stale_claim_is_requeued(self):
+        job = reports.submit_report_job("", "2025-2026")
+        reports.claim_next_job()
+        ReportJob.objects.filter(pk=job.pk).update(claimed_at=timezone.now() - timedelta(hours=1))
+
+        resubmitted = reports.submit_report_job("", "2025-2026")
+        self.assertEqual(resubmitted.pk, job.pk)
+        self.assertEqual(resubmitted.status, ReportJob.PENDING)
+        self.assertEqual(reports.claim_next_job().pk, job.pk)
+
+    def test_worker_that_lost_its_claim_does_not_record_a_result(self):
+        reports.submit_report_job("", "2025-2026")
+        late = reports.claim_next_job()
+        ReportJob.objects.filter(pk=late.pk).update(claimed_at=timezone.now() - timedelta(hours=1))
+        current = reports.claim_next_job()
+
+        reports.run_report_job(late)
+        self.assertEqual(ReportJob.objects.get(pk=late.pk).status, ReportJob.RUNNING)
+        reports.run_report_job(current)
+        job = ReportJob.objects.get(pk=current.pk)
+        self.assertEqual(job.status, ReportJob.DONE)
+        self.assertTrue(job.file.storage.exists(job.file.name))
+
+    def test_purge_removes_old_jobs_and_their_pdfs(self):
+        reports.submit_report_job("", "2025-2026")
+        job = reports.run_report_job(reports.claim_next_job())
+        name = ReportJob.objects.get(pk=job.pk).file.name
+        self.assertEqual(reports.purge_report_jobs(), (0, 0))
+
+        ReportJob.objects.filter(pk=job.pk).update(finished_at=timezone.now() - timedelta(days=30))
+        self.assertEqual(reports.purge_report_jobs(), (1, 1))
+        self.assertFalse(ReportJob.objects.filter(pk=job.pk).exists())
+        self.assertTrue(FileDeletion.objects.filter(name=name).exists())
+        blobs.drain_deletions()
+        self.assertFalse(job.file.storage.exists(name))
+
+
+def pdf_text(data):
+    """The drawing operators of every page stream (ReportLab writes them ASCII85 + Flate encoded)."""
+    streams = re.findall(rb"stream\r?\n(.*?)~>\s*endstream", data, re.S)
+    text = b"".join(zlib.decompress(base64.a85decode(stream)) for stream in streams).decode("latin-1")
+    return text.replace("\\(", "(").replace("\\)", ")")
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PaymentsPdfTests(TestCase):
+    def setUp(self):
+        student = User.objects.create_user("2021-0017", first_name="Ana", last_name="Cruz")
+        for i in range(30):
+            Payment.objects.create(
+                student=student, comittee_name="SSG", semester="First Semester", school_year="2025-2026",
+                status="Accepted" if i % 3 else "Pending", cf=Decimal("10.25"), lac=Decimal("1.00") if i % 2 else None,
+            )
+
+    def test_streams_a_pdf_with_committee_subtotals(self):
+        response = self.client.get("/api/payments/print/", {"semester": "first", "school_year": "2025"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Content-Type"], "application/pdf")
+        data = b"".join(response.streaming_content)
+        self.assertTrue(data.startswith(b"%PDF"))
+        text = pdf_text(data)
+        # 20 accepted payments, 10 of them with LAC
+        self.assertIn("CF (Contingency Fund): Php. 205.00 (20 payments)", text)
+        self.assertIn("LAC (Library Advisory Committee): Php. 10.00 (10 payments)", text)
+        self.assertEqual(text.count("Payment ID:"), 20)
+        self.assertGreater(data.count(b"/Type /Page\n"), 1)
+
+    def test_subtotals_are_one_query(self):
+        payments = reports.payments_report_queryset("First", "2025")
+        with self.assertNumQueries(1):
+            subtotals = reports.committee_subtotals(payments)
+        self.assertEqual(subtotals["cf"], (Decimal("205.00"), 20))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ReportJobApiTests(TempMediaMixin, TestCase):
+    def submit(self):
+        return self.client.post("/api/reports/", {"semester": "First", "school_year": "2025"})
+
+    def run_worker(self):
+        call_command("run_report_worker", "--once", stdout=io.StringIO())
+
+    def test_submit_run_and_download(self):
+        response = self.submit()
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["id"]
+        self.assertEqual(self.submit().json()["id"], job_id)
+        self.assertIsNone(self.client.get(f"/api/reports/{job_id}/").json()["download_url"])
+        self.assertEqual(self.client.get(f"/api/reports/{job_id}/download/").status_code, 404)
+
+        self.run_worker()
+        detail = self.client.get(f"/api/reports/{job_id}/").json()
+        self.assertEqual(detail["status"], ReportJob.DONE)
+        download = self.client.get(detail["download_url"])
+        self.assertEqual(download.status_code, 200)
+        self.assertTrue(b"".join(download.streaming_content).startswith(b"%PDF"))
+        # The finished PDF is reused
+        resubmitted = self.submit()
+        self.assertEqual((resubmitted.status_code, resubmitted.json()["id"]), (200, job_id))
+
+    def test_job_of_a_dead_worker_is_requeued(self):
+        job_id = self.submit().json()["id"]
+        self.assertEqual(reports.claim_next_job().pk, job_id)
+        ReportJob.objects.filter(pk=job_id).update(claimed_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(self.client.get(f"/api/reports/{job_id}/").json()["status"], ReportJob.RUNNING)
+        self.assertEqual(self.submit().json()["status"], ReportJob.PENDING)
+        self.run_worker()
+        self.assertEqual(self.client.get(f"/api/reports/{job_id}/").json()["status"], ReportJob.DONE)
+
+    def test_purged_jobs_are_gone(self):
+        job_id = self.submit().json()["id"]
+        self.run_worker()
+        name = ReportJob.objects.get(pk=job_id).file.name
+        ReportJob.objects.filter(pk=job_id).update(finished_at=timezone.now() - timedelta(days=30))
+
+        call_command("purge_report_jobs", stdout=io.StringIO())
+        call_command("drain_file_deletions", stdout=io.StringIO())
+        self.assertEqual(self.client.get(f"/api/reports/{job_id}/").status_code, 404)
+        self.assertEqual(self.client.get(f"/api/reports/{job_id}/download/").status_code, 404)
+        self.assertFalse(os.path.exists(os.path.join(self.media, name)))
+        self.assertEqual(self.submit().status_code, 202)
+
+
+class StatelessJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        # simplejwt's reload on setting_changed rebinds its module global,
+        # which modules that imported api_settings never see
+        revoke = mock.patch.object(authentication.api_settings, "CHECK_REVOKE_TOKEN", True)
+        revoke.start()
+        self.addCleanup(revoke.stop)
+        authentication.clear()
+        self.addCleanup(authentication.clear)
+        self.user = User.objects.create_user("admin", password="secret", is_staff=True)
+        self.backend = authentication.StatelessJWTAuthentication()
+
+    def authenticate(self):
+        token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+        return lambda: self.backend.get_user(self.backend.get_validated_token(str(token)))
+
+    def assertRejected(self, authenticate, code):
+        with self.assertRaises(AuthenticationFailed) as raised:
+            authenticate()
+        self.assertEqual(raised.exception.detail["code"], code)
+
+    def test_claims_user_without_queries_when_warm(self):
+        authenticate = self.authenticate()
+        self.assertTrue(authenticate().is_staff)
+        with self.assertNumQueries(0):
+            user = authenticate()
+        self.assertEqual((user.id, user.is_staff, user.is_superuser), (str(self.user.id), True, False))
+
+    def test_demoted_staff_token_is_rejected(self):
+        authenticate = self.authenticate()
+        self.user.is_staff = False
+        self.user.save()
+        self.assertRejected(authenticate, "permissions_changed")
+
+    def test_promoted_user_must_log_in_again(self):
+        authenticate = self.authenticate()
+        self.user.is_superuser = True
+        self.user.save()
+        self.assertRejected(authenticate, "permissions_changed")
+
+    def test_inactive_and_password_changes_are_rejected(self):
+        authenticate = self.authenticate()
+        self.user.set_password("changed")
+        self.user.save()
+        self.assertRejected(authenticate, "password_changed")
+        self.user.is_active = False
+        self.user.save()
+        self.assertRejected(authenticate, "user_inactive")
+
+
+def png_bytes(size=(64, 64)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "white").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ChunkedUploadTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        student = User.objects.create_user("2021-0003")
+        self.payment = Payment.objects.create(student=student, comittee_name="CF")
+        self.data = png_bytes()
+
+    def read_part(self, session):
+        with open(uploads.session_path(session.id), "rb") as part:
+            return part.read()
+
+    def test_losing_writer_leaves_the_part_file_alone(self):
+        session = uploads.start_session(self.payment, "proof.png", len(self.data))
+        stale = UploadSession.objects.get(pk=session.pk)
+        half = len(self.data) // 2
+
+        uploads.write_chunk(session, 0, io.BytesIO(self.data[:half]), half)
+        # A second PUT at the same offset read the session before the first committed
+        with self.assertRaises(uploads.OffsetMismatch) as raised:
+            uploads.write_chunk(stale, 0, io.BytesIO(b"x" * half), half)
+        self.assertEqual(raised.exception.expected, half)
+        self.assertEqual(self.read_part(session), self.data[:half])
+        self.assertEqual(os.listdir(os.path.dirname(uploads.session_path(session.id))), [f"{session.id}.part"])
+
+        uploads.write_chunk(session, half, io.BytesIO(self.data[half:]), len(self.data) - half)
+        proof = uploads.finalize_session(session)
+        with proof.proof.open("rb") as stored:
+            self.assertEqual(stored.read(), self.data)
+
+    def test_short_body_only_advances_by_what_arrived(self):
+        session = uploads.start_session(self.payment, "proof.png", len(self.data))
+        self.assertEqual(uploads.write_chunk(session, 0, io.BytesIO(self.data[:10]), 100), 10)
+        self.assertEqual(UploadSession.objects.get(pk=session.pk).received, 10)
+
+    def test_decompression_bomb_is_rejected(self):
+        session = uploads.start_session(self.payment, "proof.png", len(self.data))
+        uploads.write_chunk(session, 0, io.BytesIO(self.data), len(self.data))
+        with mock.patch.object(Image, "MAX_IMAGE_PIXELS", 100), self.assertRaises(ValidationError):
+            uploads.finalize_session(session)
+        self.assertFalse(PaymentProof.objects.exists())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ChunkedUploadApiTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        student = User.objects.create_user("2021-0003")
+        self.payment = Payment.objects.create(student=student, comittee_name="CF")
+        self.data = png_bytes()
+        response = self.client.post(
+            f"/api/payments/{self.payment.id}/uploads/", {"filename": "proof.png", "size": len(self.data)}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.url = f"/api/uploads/{response.json()['id']}/"
+
+    def put(self, offset, body):
+        return self.client.put(
+            self.url, body, content_type="application/octet-stream", headers={"Upload-Offset": str(offset)}
+        )
+
+    def test_upload_in_chunks_and_finalize(self):
+        half = len(self.data) // 2
+        self.assertEqual(self.put(0, self.data[:half]).json()["received"], half)
+        self.assertEqual(self.client.get(self.url).json()["received"], half)
+        self.assertEqual(self.put(half, self.data[half:]).json()["received"], len(self.data))
+
+        response = self.client.post(f"{self.url}finalize/")
+        self.assertEqual(response.status_code, 201)
+        with PaymentProof.objects.get(payment=self.payment).proof.open("rb") as stored:
+            self.assertEqual(stored.read(), self.data)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_wrong_offset_is_409_with_the_resume_offset(self):
+        self.put(0, self.data[:10])
+        response = self.put(5, self.data[5:20])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["received"], 10)
+        self.assertEqual(self.client.get(self.url).json()["received"], 10)
+
+    def test_chunk_past_the_declared_size_is_rejected(self):
+        response = self.put(0, self.data + b"overrun")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(self.url).json()["received"], 0)
+
+    def test_missing_offset_is_400(self):
+        response = self.client.put(self.url, self.data, content_type="application/octet-stream")
+        self.assertEqual(response.status_code, 400)
+
+    def test_finalize_before_the_upload_is_complete(self):
+        self.put(0, self.data[:10])
+        response = self.client.post(f"{self.url}finalize/")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(f"10 of {len(self.data)} bytes", response.json()["error"][0])
+        self.assertFalse(PaymentProof.objects.exists())
+        self.assertEqual(self.client.get(self.url).json()["received"], 10)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        response_cache._cache().clear()
+
+    def test_invalidate_changes_the_key(self):
+        url = "/api/payment-type/cf/?page=1"
+        before = response_cache.response_key("cf", url)
+        response_cache.invalidate(["cf"])
+        self.assertNotEqual(response_cache.response_key("cf", url), before)
+        self.assertEqual(response_cache.response_key("lac", url), response_cache.response_key("lac", url))
+
+    def test_culled_version_is_never_reused(self):
+        url = "/api/payment-type/cf/"
+        key, _ = response_cache.lookup("cf", url)
+        response_cache.store(key, ["stale"])
+        response_cache.invalidate(["cf"])
+        # The cache culls the version key along with other entries
+        response_cache._cache().delete(response_cache._version_key("cf"))
+        for _ in range(3):
+            new_key, data = response_cache.lookup("cf", url)
+            self.assertNotEqual(new_key, key)
+            self.assertIsNone(data)
+
+    def test_stats_are_sampled(self):
+        with mock.patch.object(response_cache.random, "random", return_value=0.0):
+            response_cache.lookup("cf", "/a/")
+        with mock.patch.object(response_cache.random, "random", return_value=0.99):
+            response_cache.lookup("cf", "/a/")
+        response_cache.invalidate(["cf"])
+        stats = response_cache.stats()
+        self.assertEqual(stats["estimated_misses"], response_cache.STATS_SAMPLE)
+        self.assertEqual(stats["estimated_hits"], 0)
+        self.assertEqual(stats["sampled_every"], response_cache.STATS_SAMPLE)
+        self.assertEqual(stats["invalidations"], 1)
+
+    def test_stats_endpoint_labels_the_sampled_counters(self):
+        admin = User.objects.create_superuser("admin", password="x")
+        self.assertEqual(self.client.get("/api/committee-cache/stats/").status_code, 401)
+        response = self.client.get("/api/committee-cache/stats/", headers=bearer(admin))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(response.json()),
+            {"estimated_hits", "estimated_misses", "estimated_hit_rate", "sampled_every", "invalidations", "versions"},
+        )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SearchTests(TestCase):
+    """The test database is built by the migrations, so this also covers 0030/0031 and the hooks."""
+
+    def hits(self, query):
+        return {(kind, pk) for kind, pk, _ in search.search(query, 20, 0)}
+
+    def test_triggers_installed_after_migrate(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+            self.assertLessEqual(set(search.TRIGGERS), {row[0] for row in cursor.fetchall()})
+
+    def triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+            return set(search.TRIGGERS) & {row[0] for row in cursor.fetchall()}
+
+    def plan(self, operation):
+        migration = migrations.Migration("9999_test", "api")
+        migration.operations = [operation]
+        return [(migration, False)]
+
+    def test_only_plans_altering_indexed_tables_suspend_triggers(self):
+        unrelated = self.plan(migrations.AddField("reportjob", "note", models.TextField(default="")))
+        search.suspend_triggers(plan=unrelated)
+        self.assertEqual(self.triggers(), set(search.TRIGGERS))
+
+        search.suspend_triggers(plan=self.plan(migrations.AddField("payment", "note", models.TextField(default=""))))
+        self.assertEqual(self.triggers(), set())
+        search.ensure_installed()
+        self.assertEqual(self.triggers(), set(search.TRIGGERS))
+
+    def test_index_follows_writes(self):
+        student = User.objects.create_user("2021-0004", first_name="Carla", last_name="Dizon")
+        payment = Payment.objects.create(student=student, comittee_name="Athletics")
+        self.assertEqual(self.hits("carl"), {("student", student.id), ("payment", payment.id)})
+
+        Profile.objects.create(user=student, course="BSCS")
+        student.last_name = "Santos"
+        student.save()
+        self.assertEqual(self.hits("santos bscs"), {("student", student.id), ("payment", payment.id)})
+        self.assertEqual(self.hits("dizon"), set())
+
+        payment.delete()
+        self.assertEqual(self.hits("athletics"), set())
+
+    def test_search_view(self):
+        student = User.objects.create_user("2021-0005", first_name="Dana")
+        response = self.client.get("/api/search/", {"q": "dan"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["id"] for row in response.json()["results"]], [student.id])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TopUpApiTests(TestCase):
+    def setUp(self):
+        student = User.objects.create_user("2021-0006")
+        self.payment = Payment.objects.create(student=student, comittee_name="CF", cf=Decimal("10.00"))
+
+    def put(self, data, **headers):
+        return self.client.put(
+            f"/api/update_payment/{self.payment.id}/", data, content_type="application/json", headers=headers
+        )
+
+    def test_top_up_adds_and_bumps_version(self):
+        response = self.put({"cf": "2.50", "lac": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.payment.refresh_from_db()
+        self.assertEqual((self.payment.cf, self.payment.lac), (Decimal("12.50"), Decimal("1.00")))
+        self.assertEqual(response.json()["version"], self.payment.version)
+
+    def test_top_up_without_version_applies_over_other_writes(self):
+        self.payment.status = "Approved"
+        self.payment.save()
+        self.assertEqual(self.put({"cf": "1"}).status_code, 200)
+        self.assertEqual(self.put({"cf": "1"}).status_code, 200)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.cf, Decimal("12.00"))
+        self.assertEqual(ledger.verify(), [])
+
+    def test_bench_refuses_the_project_database(self):
+        with self.assertRaisesMessage(CommandError, "scratch file"):
+            call_command("bench_concurrent_topups", "--database", str(settings.BASE_DIR / "db.sqlite3"))
+
+    def test_version_from_body_or_header(self):
+        version = self.payment.version
+        self.assertEqual(self.put({"cf": "1", "version": version + 1}).status_code, 409)
+        self.assertEqual(self.put({"cf": "1"}, **{"X-Payment-Version": str(version + 1)}).status_code, 409)
+        self.assertEqual(self.put({"cf": "1"}, **{"X-Payment-Version": str(version)}).status_code, 200)
+        self.assertEqual(self.put({"cf": "1", "version": "abc"}).status_code, 400)
+
+    def test_etag_in_if_match_is_not_read_as_a_version(self):
+        etag = self.client.get(f"/api/payments/{self.payment.id}/").headers["ETag"]
+        self.assertEqual(self.put({"cf": "1"}, **{"If-Match": etag}).status_code, 200)
+
+    def test_amounts_must_fit_the_column(self):
+        for data in ({"cf": "0.001"}, {"cf": "12345678901"}, {"cf": "NaN"}, {"cf": "abc"}):
+            with self.subTest(data=data):
+                response = self.put(data)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("cf", response.json())
+
+        Payment.objects.filter(pk=self.payment.pk).update(cf=Decimal("9999999999.00"))
+        response = self.put({"cf": "1", "lac": "1"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()), ["cf"])
+        self.payment.refresh_from_db()
+        self.assertEqual((self.payment.cf, self.payment.lac), (Decimal("9999999999.00"), None))
+
+
+@override_settings(CACHES=TEST_CACHES, RESPONSE_COMPRESSION_MIN_SIZE=200)
+class CompressionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_payments()
+        User.objects.create_user("cashier", password="secret")
+
+    def get(self, **extra):
+        return self.client.get("/api/payments/", {"paginate": "false"}, **extra)
+
+    def test_gzip_is_padded_with_a_random_filename(self):
+        identity = self.get()
+        sizes = set()
+        for _ in range(5):
+            response = self.get(HTTP_ACCEPT_ENCODING="gzip")
+            self.assertEqual(response["Content-Encoding"], "gzip")
+            self.assertTrue(response.content[3] & gzip.FNAME)
+            self.assertEqual(gzip.decompress(response.content), identity.content)
+            sizes.add(len(response.content))
+        self.assertGreater(len(sizes), 1)
+
+    def test_identity_and_unsupported_encodings_pass_through(self):
+        for accept in ("", "identity", "br", "gzip;q=0"):
+            with self.subTest(accept=accept):
+                response = self.get(HTTP_ACCEPT_ENCODING=accept)
+                self.assertFalse(response.has_header("Content-Encoding"))
+                self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_streamed_export_is_compressed(self):
+        response = self.client.get("/api/payments/export/csv/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        plain = self.client.get("/api/payments/export/csv/")
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), b"".join(plain.streaming_content))
+
+    @override_settings(RESPONSE_COMPRESSION_MIN_SIZE=1)
+    def test_token_endpoints_are_not_compressed(self):
+        login = self.client.post(
+            "/api/login/", {"username": "cashier", "password": "secret"}, HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertEqual(login.status_code, 200)
+        self.assertFalse(login.has_header("Content-Encoding"))
+        refresh = self.client.post(
+            "/api/token/refresh/", {"refresh": login.json()["refresh"]}, HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertEqual(refresh.status_code, 200)
+        self.assertFalse(refresh.has_header("Content-Encoding"))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RemovePaymentProofsTests(TestCase):
+    def setUp(self):
+        student = User.objects.create_user("2021-0007")
+        self.payment = Payment.objects.create(student=student, comittee_name="CF", proof="payment_proofs/shared.jpg")
+        self.other = Payment.objects.create(student=student, comittee_name="CF")
+        for name in ("payment_proofs/shared.jpg", "payment_proofs/own.jpg"):
+            PaymentProof.objects.create(payment=self.payment, proof=name)
+        PaymentProof.objects.create(payment=self.other, proof="payment_proofs/shared.jpg")
+
+    def refcounts(self):
+        return dict(ProofBlob.objects.values_list("name", "refcount"))
+
+    def test_releases_each_reference_once(self):
+        self.assertEqual(self.refcounts(), {"payment_proofs/shared.jpg": 3, "payment_proofs/own.jpg": 1})
+        response = self.client.delete(f"/api/payments/{self.payment.id}/remove-proof/")
+        self.assertEqual(response.status_code, 200)
+
+        self.assertFalse(PaymentProof.objects.filter(payment=self.payment).exists())
+        self.assertEqual(PaymentProof.objects.filter(payment=self.other).count(), 1)
+        self.payment.refresh_from_db()
+        self.assertFalse(self.payment.proof)
+        self.assertEqual(self.refcounts(), {"payment_proofs/shared.jpg": 1})
+        self.assertEqual(list(FileDeletion.objects.values_list("name", flat=True)), ["payment_proofs/own.jpg"])
+
+    def test_deleting_the_payment_keeps_refcounts_consistent(self):
+        response = self.client.delete(f"/api/payments/delete/{self.payment.id}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.refcounts(), {"payment_proofs/shared.jpg": 1})
+        self.assertEqual(dict(blobs.count_references()), self.refcounts())
+
+    def test_releasing_more_than_the_stored_count_frees_the_blob(self):
+        ProofBlob.objects.filter(name="payment_proofs/shared.jpg").update(refcount=1)
+        blobs.release_many({"payment_proofs/shared.jpg": 3, "payment_proofs/own.jpg": 1})
+        self.assertEqual(self.refcounts(), {})
+        self.assertEqual(
+            sorted(FileDeletion.objects.values_list("name", flat=True)),
+            ["payment_proofs/own.jpg", "payment_proofs/shared.jpg"],
+        )
+
+    def test_no_payments_is_a_no_op(self):
+        self.assertEqual(blobs.remove_payment_proofs([]), 0)
+        self.assertEqual(PaymentProof.objects.count(), 3)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ExportTests(TestCase):
+    def setUp(self):
+        student = User.objects.create_user("2021-0011", first_name="@SUM(1+1)")
+        self.formula = Payment.objects.create(
+            student=student, semester="First Semester", school_year="2025-2026",
+            status="Accepted", feedback="=cmd|' /C calc'!A0", payment="-2+3",
+        )
+        self.pending = Payment.objects.create(
+            student=student, semester="Second Semester", school_year="2025-2026", status="Pending"
+        )
+        self.undated = Payment.objects.create(student=student)
+
+    def csv_rows(self, **params):
+        response = self.client.get("/api/payments/export/csv/", params)
+        self.assertEqual(response.status_code, 200)
+        return list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+
+    def test_formula_cells_are_quoted(self):
+        row = next(row for row in self.csv_rows() if row["Payment ID"] == str(self.formula.id))
+        self.assertEqual(row["Feedback"], "'=cmd|' /C calc'!A0")
+        self.assertEqual(row["First Name"], "'@SUM(1+1)")
+        self.assertEqual(row["Payment"], "'-2+3")
+
+    def test_xlsx_cells_are_text(self):
+        from openpyxl import load_workbook
+
+        response = self.client.get("/api/payments/export/xlsx/", {"status": "Accepted"})
+        self.assertEqual(response.status_code, 200)
+        sheet = load_workbook(io.BytesIO(b"".join(response.streaming_content))).active
+        header, row = [[cell for cell in row] for row in sheet.iter_rows(max_row=2)]
+        feedback = row[[cell.value for cell in header].index("Feedback")]
+        self.assertEqual((feedback.value, feedback.data_type), ("'=cmd|' /C calc'!A0", "s"))
+
+    def ids(self, **params):
+        return {int(row["Payment ID"]) for row in self.csv_rows(**params)}
+
+    def test_filters_match_the_pdf_report(self):
+        ids = self.ids
+        self.assertEqual(ids(), {self.formula.id, self.pending.id, self.undated.id})
+        # Substring, case-insensitive, as in reports.payments_report_queryset
+        self.assertEqual(ids(semester="first", school_year="2025"), {self.formula.id})
+        self.assertEqual(ids(school_year="2025", status="Pending"), {self.pending.id})
+        self.assertEqual(
+            set(reports.payments_report_queryset("first", "2025").values_list("id", flat=True)),
+            ids(semester="first", school_year="2025", status="Accepted"),
+        )
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get("/api/payments/export/pdf/").status_code, 400)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BulkProofUploadTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.payment = Payment.objects.create(student=User.objects.create_user("2021-0016"))
+        self.url = f"/api/payments/{self.payment.id}/upload-proof/"
+
+    def image(self, name, content=None):
+        return SimpleUploadedFile(name, content if content is not None else png_bytes(), content_type="image/png")
+
+    def test_one_invalid_image_rejects_the_whole_upload(self):
+        response = self.client.post(self.url, {"proofs": [
+            self.image("a.png"),
+            self.image("broken.png", png_bytes()[:60]),
+            self.image("c.png", png_bytes((32, 32))),
+        ]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()), ["broken.png"])
+        self.assertFalse(PaymentProof.objects.exists())
+        self.assertFalse(os.path.exists(os.path.join(self.media, "payment_proofs")))
+
+    def test_wrong_extension_is_rejected(self):
+        response = self.client.post(self.url, {"proofs": [self.image("a.gif")]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("a.gif", response.json())
+
+    def test_stores_each_distinct_file_once(self):
+        files = [self.image("a.png"), self.image("copy.png"), self.image("b.png", png_bytes((16, 16)))]
+        response = self.client.post(self.url, {"proofs": files})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()), 3)
+        names = list(PaymentProof.objects.filter(payment=self.payment).values_list("proof", flat=True))
+        self.assertEqual(len(set(names)), 2)
+        self.assertEqual(sorted(ProofBlob.objects.values_list("refcount", flat=True)), [1, 2])
+
+    def test_single_proof_field_and_no_files(self):
+        response = self.client.post(self.url, {"proof": self.image("a.png")})
+        self.assertEqual(response.status_code, 201)
+        self.assertIn("proof", response.json())
+        self.assertEqual(self.client.post(self.url, {}).status_code, 400)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ThumbnailTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        payment = Payment.objects.create(student=User.objects.create_user("2021-0010"))
+        self.proof = PaymentProof.objects.create(
+            payment=payment, proof=proof_storage.save("payment_proofs/a.png", ContentFile(png_bytes((400, 300))))
+        )
+
+    def test_generates_webp_derivatives(self):
+        self.assertEqual(thumbnails.generate_pending(), 1)
+        self.proof.refresh_from_db()
+        with Image.open(self.proof.thumbnail.path) as image:
+            self.assertEqual((image.format, image.size), ("WEBP", (240, 180)))
+        self.assertFalse(thumbnails.pending(PaymentProof).exists())
+
+    def test_proof_replaced_while_rendering_keeps_its_own_derivatives(self):
+        stale = PaymentProof.objects.get(pk=self.proof.pk)
+        replacement = proof_storage.save("payment_proofs/b.png", ContentFile(png_bytes((50, 50))))
+        PaymentProof.objects.filter(pk=self.proof.pk).update(proof=replacement)
+
+        thumbnails.generate_derivatives(stale)
+        self.proof.refresh_from_db()
+        self.assertFalse(self.proof.thumbnail)
+        self.assertFalse(self.proof.preview)
+        self.assertFalse(os.listdir(os.path.join(self.media, "payment_proofs", "thumbnails")))
+        self.assertFalse(os.listdir(os.path.join(self.media, "payment_proofs", "previews")))
+
+
+class DrainDeletionsTests(TempMediaMixin, TestCase):
+    def store(self, content=b"proof"):
+        return proof_storage.save("payment_proofs/proof.png", ContentFile(content))
+
+    def age(self, name, seconds):
+        when = time.time() - seconds
+        os.utime(proof_storage.path(name), (when, when))
+
+    def test_reusing_a_stored_file_touches_it(self):
+        name = self.store()
+        self.age(name, 3600)
+        self.assertEqual(self.store(), name)
+        self.assertLess(time.time() - os.path.getmtime(proof_storage.path(name)), 60)
+
+    def test_keeps_a_file_handed_out_again_before_its_reference_commits(self):
+        name = self.store()
+        self.age(name, 3600)
+        blobs.enqueue_deletion([name])
+        # Re-upload of the same content, its ProofBlob row not written yet
+        self.store()
+        blobs.drain_deletions()
+        self.assertTrue(proof_storage.exists(name))
+        self.assertFalse(FileDeletion.objects.exists())
+
+    def test_unlinks_unreferenced_files(self):
+        name = self.store()
+        self.age(name, blobs.REUSE_GRACE + 1)
+        blobs.enqueue_deletion([name])
+        blobs.drain_deletions()
+        self.assertFalse(proof_storage.exists(name))
+        self.assertEqual(os.listdir(os.path.dirname(proof_storage.path(name))), [])
+
+    def test_keeps_files_with_a_live_blob(self):
+        name = self.store()
+        self.age(name, blobs.REUSE_GRACE + 1)
+        blobs.enqueue_deletion([name])
+        blobs.retain(name)
+        blobs.drain_deletions()
+        self.assertTrue(proof_storage.exists(name))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AtomicWriteTests(TransactionTestCase):
+    def begins(self, block):
+        with CaptureQueriesContext(connection) as queries:
+            block()
+        return [query["sql"] for query in queries if query["sql"].startswith("BEGIN")]
+
+    def test_reads_stay_deferred(self):
+        def read():
+            with transaction.atomic():
+                list(Payment.objects.all())
+
+        self.assertEqual(self.begins(read), ["BEGIN"])
+
+    def test_read_then_write_begins_immediate(self):
+        student = User.objects.create_user("2021-0008")
+
+        def write():
+            with atomic_write():
+                with atomic_write():
+                    Payment.objects.create(student=student, comittee_name="CF", cf=Decimal("1.00"))
+
+        self.assertEqual(self.begins(write), ["BEGIN IMMEDIATE"])
+        # Payment.save opens its own when it is the outermost block
+        self.assertEqual(self.begins(lambda: Payment.objects.create(student=student)), ["BEGIN IMMEDIATE"])
+        self.assertIsNone(connection.transaction_mode)
+
+    def test_top_up_reads_and_writes_in_one_immediate_transaction(self):
+        payment = Payment.objects.create(student=User.objects.create_user("2021-0009"), cf=Decimal("1.00"))
+        self.assertEqual(self.begins(lambda: topups.top_up(payment.pk, {"cf": Decimal("2.00")})), ["BEGIN IMMEDIATE"])
+        payment.refresh_from_db()
+        self.assertEqual((payment.cf, payment.version), (Decimal("3.00"), 1))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ExplainPaymentQueriesTests(TempMediaMixin, TestCase):
+    def test_endpoint_queries_use_indexes(self):
+        make_payments()
+        out = io.StringIO()
+        call_command("explain_payment_queries", "--fail-on-scan", stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertIn("StudentPaymentsView (filtered): ok", lines)
+        self.assertIn("PaymentListView (sparse): ok", lines)
+
+
+class LoadTestPaymentsTests(TestCase):
+    def test_refuses_the_project_database(self):
+        with self.assertRaisesMessage(CommandError, "scratch file"):
+            call_command("load_test_payments", "--database", str(settings.BASE_DIR / "db.sqlite3"))
+        self.assertFalse(Payment.objects.exists())
+
+
+class ReplicaPinTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        patcher = mock.patch.object(replica, "path", return_value=os.path.join(tmp, "replica.sqlite3"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.request = RequestFactory().get("/api/payments/", REMOTE_ADDR="10.0.0.7")
+
+    def stamp(self, when):
+        os.makedirs(replica._pin_dir(), exist_ok=True)
+        with open(replica._stamp_path(), "a"):
+            pass
+        os.utime(replica._stamp_path(), (when, when))
+
+    def test_pin_is_a_no_op_before_the_first_refresh(self):
+        replica.pin(self.request)
+        self.assertFalse(os.path.exists(replica._pin_dir()))
+
+    def test_write_after_snapshot_keeps_reads_on_primary(self):
+        self.stamp(time.time() - 5)
+        self.assertTrue(replica.usable_for(self.request))
+        replica.pin(self.request)
+        self.assertFalse(replica.usable_for(self.request))
+        other = RequestFactory().get("/api/payments/", REMOTE_ADDR="10.0.0.8")
+        self.assertTrue(replica.usable_for(other))
+        self.stamp(time.time() + 1)
+        self.assertTrue(replica.usable_for(self.request))
+
+    def test_pins_outlive_many_clients(self):
+        self.stamp(time.time() - 5)
+        replica.pin(self.request)
+        for n in range(3000):
+            replica.pin(RequestFactory().post("/", HTTP_AUTHORIZATION=f"Bearer {n}"))
+        self.assertFalse(replica.usable_for(self.request))
+
+    def test_prune_drops_only_old_pins(self):
+        self.stamp(time.time())
+        replica.pin(self.request)
+        old = os.path.join(replica._pin_dir(), "old")
+        open(old, "a").close()
+        os.utime(old, (time.time() - 3 * replica.max_lag(),) * 2)
+        self.assertEqual(replica.prune_pins(), 1)
+        self.assertFalse(os.path.exists(old))
+        self.assertEqual(len(os.listdir(replica._pin_dir())), 1)
+
+
+class RefreshReplicaCommandTests(TestCase):
+    def test_interval_loop_survives_a_failed_refresh(self):
+        stderr = io.StringIO()
+        with mock.patch.object(replica, "refresh", side_effect=[OSError("disk full"), 0.0, KeyboardInterrupt]) as refresh, \
+                mock.patch("time.sleep"), self.assertLogs("api.management.commands.refresh_replica", "ERROR"):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command("refresh_replica", "--interval", "1", stdout=io.StringIO(), stderr=stderr)
+        self.assertEqual(refresh.call_count, 3)
+        self.assertIn("disk full", stderr.getvalue())
+
+    def test_single_refresh_failure_is_a_command_error(self):
+        with mock.patch.object(replica, "refresh", side_effect=OSError("disk full")):
+            with self.assertRaisesMessage(CommandError, "disk full"):
+                call_command("refresh_replica", stdout=io.StringIO())
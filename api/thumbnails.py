@@ -0,0 +1,103 @@
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+from PIL import Image, ImageOps
+
+from . import response_cache
+from .models import Payment, PaymentProof
+
+logger = logging.getLogger(__name__)
+
+# (field, bounding box) for each WebP derivative of a proof image
+DERIVATIVES = [
+    ("thumbnail", (240, 240)),
+    ("preview", (1024, 1024)),
+]
+
+WEBP_QUALITY = 80
+
+# Models whose `proof` gets derivatives
+PROOF_MODELS = [Payment, PaymentProof]
+
+
+def render_webp(source, size):
+    """Downscale an image file to fit inside `size` and encode it as WebP."""
+    with Image.open(source) as image:
+        # Let the JPEG decoder skip most of the pixels it would throw away anyway
+        image.draft("RGB", size)
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        image.thumbnail(size, Image.Resampling.LANCZOS)
+
+        buffer = BytesIO()
+        image.save(buffer, format="WEBP", quality=WEBP_QUALITY, method=4)
+    return ContentFile(buffer.getvalue())
+
+
+def generate_derivatives(instance):
+    """Render and attach the thumbnail and preview of `instance.proof`."""
+    # Content-addressed names are 64 hex chars; keep derivative names short
+    # enough for the field's max_length.
+    stem = os.path.splitext(os.path.basename(instance.proof.name))[0][:40]
+    try:
+        for field, size in DERIVATIVES:
+            instance.proof.open("rb")
+            try:
+                content = render_webp(instance.proof, size)
+            finally:
+                instance.proof.close()
+            getattr(instance, field).save(f"{stem}_{field}.webp", content, save=False)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.exception("Could not generate derivatives for %s %s", type(instance).__name__, instance.pk)
+        delete_derivatives(instance)
+        instance.derivatives_failed = True
+
+    # Queryset update: skip Payment.save() side effects (ledger, updated_at).
+    # Only if the proof was not replaced while rendering, or the old image's
+    # derivatives would be attached to the new one.
+    updated = type(instance).objects.filter(pk=instance.pk, proof=instance.proof.name).update(
+        derivatives_failed=instance.derivatives_failed,
+        **{field: getattr(instance, field).name for field, _ in DERIVATIVES},
+    )
+    if not updated:
+        delete_derivatives(instance)
+        return
+    if isinstance(instance, Payment):
+        # The committee lists show the thumbnail URLs
+        committees = response_cache.committees_of(instance)
+        transaction.on_commit(lambda: response_cache.invalidate(committees))
+
+
+def delete_derivatives(instance):
+    for field, _ in DERIVATIVES:
+        derivative = getattr(instance, field)
+        if derivative:
+            derivative.delete(save=False)
+        setattr(instance, field, None)
+
+
+def pending(model):
+    """Rows with a proof whose derivatives have not been generated yet."""
+    return (
+        model.objects.filter(Q(thumbnail="") | Q(thumbnail__isnull=True), derivatives_failed=False)
+        .exclude(proof="")
+        .exclude(proof__isnull=True)
+    )
+
+
+def generate_pending(limit=None):
+    """Generate derivatives for every pending proof; returns how many were processed."""
+    processed = 0
+    for model in PROOF_MODELS:
+        queryset = pending(model).order_by("pk")
+        if limit is not None:
+            queryset = queryset[: max(limit - processed, 0)]
+        for instance in queryset.iterator(chunk_size=100):
+            generate_derivatives(instance)
+            processed += 1
+    return processed
@@ -0,0 +1,79 @@
+"""
+Walk-in top-ups of the committee fee columns.
+
+A top-up is applied as `col = COALESCE(col, 0) + amount` in one UPDATE,
+inside a BEGIN IMMEDIATE transaction (api.sqlite.atomic_write) together
+with the read of the old values and the ledger delta. No other writer can
+change the row in between, so concurrent cashiers neither overwrite each
+other's amounts nor get turned away.
+
+With `expected_version` (the client's `version`), a top-up on a payment
+that has changed since the client read it fails with VersionConflict.
+"""
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import ledger, response_cache
+from .models import COMMITTEE_FIELDS, Payment
+from .sqlite import atomic_write
+
+
+class VersionConflict(Exception):
+    def __init__(self, current):
+        super().__init__(f"Payment was modified (current version {current}).")
+        self.current = current
+
+
+def _increments(amounts):
+    return {
+        key: Coalesce(F(key), Value(Decimal(0))) + Value(amount)
+        for key, amount in amounts.items()
+    }
+
+
+def _check_totals(after, amounts):
+    # The UPDATE adds in SQL, past the model field's max_digits check
+    errors = {}
+    for key in amounts:
+        try:
+            Payment._meta.get_field(key).run_validators(after[key])
+        except ValidationError as exc:
+            errors[key] = exc.messages
+    if errors:
+        raise ValidationError(errors)
+
+
+def top_up(payment_id, amounts, expected_version=None):
+    """
+    Add {committee_field: Decimal} to a payment; returns the new version.
+
+    Raises Payment.DoesNotExist, VersionConflict, or ValidationError when a
+    resulting amount does not fit its column.
+    """
+    amounts = {key: amount for key, amount in amounts.items() if key in COMMITTEE_FIELDS and amount}
+    with atomic_write():
+        row = Payment.objects.filter(pk=payment_id).values("version", *ledger.LEDGER_FIELDS).first()
+        if row is None:
+            raise Payment.DoesNotExist
+        if expected_version is not None and row["version"] != expected_version:
+            raise VersionConflict(row["version"])
+        if not amounts:
+            return row["version"]
+        after = {**row, **{key: (row[key] or Decimal(0)) + amount for key, amount in amounts.items()}}
+        _check_totals(after, amounts)
+
+        Payment.objects.filter(pk=payment_id).update(
+            version=F("version") + 1,
+            updated_at=timezone.now(),
+            **_increments(amounts),
+        )
+        # Queryset updates skip the ledger signals
+        ledger.apply(ledger.diff(ledger.contributions(row), ledger.contributions(after)))
+        committees = response_cache.committees_of(after)
+        transaction.on_commit(lambda: response_cache.invalidate(committees))
+        return row["version"] + 1
@@ -0,0 +1,189 @@
+import os
+import shutil
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import FileExtensionValidator
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from . import blobs
+from .models import PaymentProof, UploadSession
+from .sqlite import atomic_write
+from .storage import proof_storage
+
+COPY_BUFFER_SIZE = 64 * 1024
+
+# Upper bound on threads used to validate and store one bulk upload
+BULK_UPLOAD_WORKERS = 8
+
+
+class OffsetMismatch(Exception):
+    def __init__(self, expected):
+        super().__init__(f"Expected offset {expected}")
+        self.expected = expected
+
+
+def session_path(session_id):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f"{session_id}.part")
+
+
+def start_session(payment, filename, size):
+    session = UploadSession.objects.create(payment=payment, filename=filename, size=size)
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    open(session_path(session.id), "wb").close()
+    return session
+
+
+def write_chunk(session, offset, stream, length):
+    """
+    Copy `length` bytes from `stream` to the session file at `offset`.
+
+    The request body is copied in small blocks into a file of its own, so a
+    chunk is never held in memory. The offset is then claimed with a
+    conditional UPDATE, and only the request that wins it appends to the
+    session file, inside that transaction: a concurrent PUT at the same
+    offset never touches the file. Returns the new offset.
+    """
+    if offset != session.received:
+        raise OffsetMismatch(session.received)
+    if offset + length > session.size:
+        raise ValidationError("Chunk extends past the declared upload size.")
+
+    chunk_path = f"{session_path(session.id)}.{uuid.uuid4().hex}.chunk"
+    try:
+        written = 0
+        with open(chunk_path, "wb") as chunk:
+            while written < length:
+                block = stream.read(min(COPY_BUFFER_SIZE, length - written))
+                if not block:
+                    break
+                chunk.write(block)
+                written += len(block)
+
+        new_offset = offset + written
+        with transaction.atomic():
+            # Only one writer may advance a given offset; the row stays
+            # locked until the append below is committed
+            updated = UploadSession.objects.filter(pk=session.pk, received=offset).update(
+                received=new_offset,
+                updated_at=timezone.now(),
+            )
+            if not updated:
+                session.refresh_from_db(fields=["received"])
+                raise OffsetMismatch(session.received)
+            with open(chunk_path, "rb") as chunk, open(session_path(session.id), "r+b") as target:
+                target.seek(offset)
+                shutil.copyfileobj(chunk, target, COPY_BUFFER_SIZE)
+                # Anything past the acknowledged offset is from an
+                # interrupted request and is overwritten by the retry.
+                target.truncate(new_offset)
+    finally:
+        if os.path.exists(chunk_path):
+            os.remove(chunk_path)
+
+    session.received = new_offset
+    return new_offset
+
+
+def finalize_session(session):
+    """Validate the assembled file and attach it to the payment as a PaymentProof."""
+    if session.received != session.size:
+        raise ValidationError(f"Upload incomplete: {session.received} of {session.size} bytes received.")
+
+    path = session_path(session.id)
+    try:
+        with Image.open(path) as image:
+            image.verify()
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise ValidationError("Upload is not a valid image.")
+
+    with open(path, "rb") as source, atomic_write():
+        proof = PaymentProof(payment=session.payment)
+        proof.proof.save(session.filename, File(source), save=False)
+        proof.save()
+        session.delete()
+
+    os.remove(path)
+    return proof
+
+
+def discard_session(session):
+    path = session_path(session.id)
+    session.delete()
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def purge_expired(max_age=None):
+    """Delete sessions idle for longer than `max_age` and any stray part files."""
+    max_age = max_age or settings.CHUNKED_UPLOAD_SESSION_TTL
+    cutoff = timezone.now() - max_age
+    purged = 0
+    for session in UploadSession.objects.filter(updated_at__lt=cutoff).iterator():
+        discard_session(session)
+        purged += 1
+
+    if os.path.isdir(settings.CHUNKED_UPLOAD_DIR):
+        live = {f"{pk}.part" for pk in UploadSession.objects.values_list("pk", flat=True)}
+        for name in os.listdir(settings.CHUNKED_UPLOAD_DIR):
+            path = os.path.join(settings.CHUNKED_UPLOAD_DIR, name)
+            if name not in live and os.path.getmtime(path) < cutoff.timestamp():
+                os.remove(path)
+                purged += 1
+    return purged
+
+
+def validate_proof_image(upload):
+    """Return a list of error messages for one uploaded proof (empty when valid)."""
+    try:
+        FileExtensionValidator(['jpg', 'jpeg', 'png', 'webp'])(upload)
+    except ValidationError as exc:
+        return exc.messages
+    try:
+        upload.seek(0)
+        with Image.open(upload) as image:
+            # Decode the pixels, not just the header, to catch truncated files
+            image.load()
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        return ["Upload a valid image."]
+    finally:
+        upload.seek(0)
+    return []
+
+
+def store_proof_file(upload):
+    field = PaymentProof._meta.get_field("proof")
+    return proof_storage.save(field.generate_filename(None, upload.name), upload)
+
+
+def bulk_attach_proofs(payment, files):
+    """
+    Validate and store every file in a thread pool, then insert all
+    PaymentProof rows with one bulk_create in a single transaction.
+
+    Nothing is written unless every file is valid.
+    """
+    workers = min(BULK_UPLOAD_WORKERS, len(files))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        errors = list(pool.map(validate_proof_image, files))
+        if any(errors):
+            raise ValidationError(
+                {upload.name: messages for upload, messages in zip(files, errors) if messages}
+            )
+        names = list(pool.map(store_proof_file, files))
+
+    # bulk_create skips the save signals, so the blob references are
+    # counted here, once per distinct file.
+    with transaction.atomic():
+        proofs = PaymentProof.objects.bulk_create(
+            [PaymentProof(payment=payment, proof=name) for name in names]
+        )
+        for name, count in Counter(names).items():
+            blobs.retain(name, count)
+    return proofs
@@ -6,17 +6,20 @@ urlpatterns = [
     path('login/', views.CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path("register/", views.RegisterView.as_view(), name="register"),
+    path("register/roster/", views.RosterImportView.as_view(), name="roster-import"),
 
     path("profiles/<int:user_id>/", views.ProfileDetailView.as_view(), name="profile-detail"),
 
     path('payments/', views.PaymentListView.as_view(), name='payment-list'),
     path('payments/<int:id>/edit/', views.PaymentEditView.as_view(), name='payment-edit'),
+    path('payments/review/', views.PaymentReviewView.as_view(), name='payment-review'),
     path('payments/<int:id>/', views.PaymentDetailView.as_view(), name='payment-detail'),
     path('payments/delete/<int:payment_id>/', views.PaymentDeleteView.as_view(), name='payment-delete'),
     path('payments/user/<int:user_id>/', views.UserPaymentsList.as_view(), name='user-payments'),
     path('submit-payment/<int:user_id>/', views.PaymentSubmitView.as_view(), name='submit-payment'),
     path('students/', views.NonSuperUserListView.as_view(), name='students'),
-    path('payment-type/<str:comittee_name>/', views.PaymentByCommitteeView.as_view(), name='payment-by-committee'),
+    path('students/directory/', views.StudentDirectoryView.as_view(), name='student-directory'),
+    path('payment-type/<str:comittee_name>/', views.PaymentByCommitteeNameView.as_view(), name='payment-by-committee'),
     path('total-amount/<str:comittee_name>/', views.CommitteeTotalAmountView.as_view()),
     
     path('payment_filter/<int:student_id>/', views.StudentPaymentsView.as_view(), name='payment_filter'),
@@ -24,9 +27,18 @@ urlpatterns = [
     path('update_payment/<int:payment_id>/', views.UpdatePaymentView.as_view(), name='update_payment'),
     path('payment/<int:payment_id>/proofs/', views.PaymentProofByPaymentIdView.as_view(), name='payment-proofs'),
     path('payments/<int:paymentId>/upload-proof/', views.UploadPaymentProofView.as_view(), name='upload-payment-proof'),
+    path('payments/<int:payment_id>/uploads/', views.UploadSessionStartView.as_view(), name='upload-session-start'),
+    path('uploads/<uuid:session_id>/', views.UploadSessionView.as_view(), name='upload-session'),
+    path('uploads/<uuid:session_id>/finalize/', views.UploadSessionFinalizeView.as_view(), name='upload-session-finalize'),
     
+    path('search/', views.SearchView.as_view(), name='search'),
     path('committee-totals/', views.CommitteeTotalsView.as_view(), name='committee-totals'),
+    path('committee-cache/stats/', views.CommitteeCacheStatsView.as_view(), name='committee-cache-stats'),
     path('payments/print/', views.print_payments_pdf),
+    path('payments/export/<str:file_format>/', views.export_payments, name='payment-export'),
+    path('reports/', views.ReportJobSubmitView.as_view(), name='report-job-submit'),
+    path('reports/<int:job_id>/', views.ReportJobDetailView.as_view(), name='report-job-detail'),
+    path('reports/<int:job_id>/download/', views.ReportJobDownloadView.as_view(), name='report-job-download'),
 
     path("payments/<int:payment_id>/remove-proof/", views.RemovePaymentProofView.as_view()),
     path("payments/<str:committee>/", views.PaymentByCommitteeView.as_view()),
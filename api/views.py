@@ -1,23 +1,46 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from django.contrib.auth.models import User
 from rest_framework import status, generics
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.shortcuts import get_object_or_404
 from rest_framework.parsers import MultiPartParser, FormParser
-from .serializers import RemovePaymentProofSerializer, UserSerializer, CommitteeTotalsSerializer, PaymentProofSerializer, CommitteePaymentTotalSerializer, PaymentTypeSerializer, PaymentSubmitSerializer,PaymentEditSerializer, RegisterSerializer, ProfileSerializer, PaymentSerializer, PaymentDetailSerializer, PaymentDeleteSerializer
-from .models import Profile, Payment, PaymentProof
+from .serializers import RemovePaymentProofSerializer, UserSerializer, CommitteeTotalsSerializer, PaymentProofSerializer, CommitteePaymentTotalSerializer, PaymentSubmitSerializer,PaymentEditSerializer, RegisterSerializer, ProfileSerializer, PaymentSerializer, PaymentDetailSerializer, PaymentDeleteSerializer, ReportJobSerializer, UploadSessionSerializer, PaymentReviewSerializer
+from .reports import spooled_payments_pdf, submit_report_job
+from .exports import export_queryset, spooled_xlsx, stream_csv
+from .reviews import review_payments
+from .roster import RosterTooLarge, import_roster, max_request_rows
+from . import blobs, response_cache, search, topups, uploads
+from .pagination import PaymentCursorPagination, StudentCursorPagination, paginated_payment_rows
+from .conditional import ConditionalGetMixin
+from .sqlite import retry_on_locked
+from .replica import ReplicaReadMixin, replica_reads
+from .fast_serializers import Fieldset, payment_rows, payment_values, user_rows, user_values
+from .models import Profile, Payment, PaymentProof, CommitteeLedger, ReportJob, UploadSession, COMMITTEE_FIELDS
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.generics import UpdateAPIView, GenericAPIView
 from rest_framework.generics import ListAPIView
 from rest_framework.exceptions import NotFound
-from django.db.models import Sum
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from django.http import HttpResponse
+from django.db.models import Count, Max, Q, Sum
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
+from django.core.exceptions import ValidationError as DjangoValidationError
+import csv
+
+
+# Cheap validators for payment lists (ConditionalGetMixin): thumbnails are
+# written without touching updated_at, so they are counted separately.
+LIST_WATERMARK = {
+    "count": Count("id"),
+    "updated": Max("updated_at"),
+    "versions": Sum("version"),
+    "derivatives": Count("id", filter=Q(thumbnail__gt="")),
+}
+STUDENT_FIELDS = ["username", "email", "first_name", "last_name", "profile__id", "profile__year_lvl", "profile__course"]
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
@@ -45,7 +68,28 @@ class RegisterView(generics.CreateAPIView):
     serializer_class = RegisterSerializer
 
 
-class ProfileDetailView(generics.RetrieveAPIView):
+class RosterImportView(APIView):
+    """Admin-only bulk registration from a CSV roster upload (field `file`)."""
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"detail": "Upload the roster CSV as `file`."}, status=status.HTTP_400_BAD_REQUEST)
+        dry_run = request.query_params.get('dry_run', '').lower() in ('1', 'true', 'yes')
+        try:
+            # Hashed in this process: no pool forked inside a web worker
+            result = import_roster(upload, dry_run=dry_run, max_rows=max_request_rows())
+        except (UnicodeDecodeError, csv.Error) as exc:
+            return Response({"detail": f"Could not read CSV: {exc}"}, status=status.HTTP_400_BAD_REQUEST)
+        except RosterTooLarge as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        code = status.HTTP_200_OK if dry_run or not result["created"] else status.HTTP_201_CREATED
+        return Response(result, status=code)
+
+
+class ProfileDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     serializer_class = ProfileSerializer
     queryset = Profile.objects.all()
     lookup_field = "user_id"  # use user_id instead of profile id
@@ -53,6 +97,15 @@ class ProfileDetailView(generics.RetrieveAPIView):
     def get_queryset(self):
         return Profile.objects.select_related("user")
 
+    def get_validators(self):
+        # Profiles have no timestamp; the row is small enough to hash
+        row = (
+            Profile.objects.filter(user_id=self.kwargs["user_id"])
+            .values_list("id", "user__username", "user__email", "year_lvl", "course")
+            .first()
+        )
+        return None if row is None else (row, None)
+
 
 
 class DeletePaymentView(APIView):
@@ -62,9 +115,27 @@ class DeletePaymentView(APIView):
         return Response({"detail": "Payment deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
 
     
-class PaymentListView(generics.ListAPIView):
-    queryset = Payment.objects.select_related('student', 'student__profile').order_by('-date_issued')
+class PaymentRowsListMixin:
+    """
+    Read-only fast path for PaymentSerializer lists: the same output, built
+    from one .values() query with ?fields=/?expand= applied (see
+    api/fast_serializers.py).
+    """
+
+    def list(self, request, *args, **kwargs):
+        fieldset = Fieldset.for_payments(request)
+        rows = payment_values(self.filter_queryset(self.get_queryset()), fieldset)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(payment_rows(page, request, fieldset))
+        return Response(payment_rows(rows, request, fieldset))
+
+
+class PaymentListView(ReplicaReadMixin, PaymentRowsListMixin, generics.ListAPIView):
+    queryset = Payment.objects.select_related('student', 'student__profile').order_by('-date_issued', '-id')
     serializer_class = PaymentSerializer
+    pagination_class = PaymentCursorPagination
+
     
     
 class PaymentEditView(generics.RetrieveUpdateAPIView):
@@ -72,10 +143,28 @@ class PaymentEditView(generics.RetrieveUpdateAPIView):
     serializer_class = PaymentEditSerializer
     lookup_field = "id"
     
-class PaymentDetailView(generics.RetrieveAPIView):
+class PaymentReviewView(APIView):
+    """Accept/reject many payments in one request (see PaymentReviewSerializer)."""
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        serializer = PaymentReviewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = review_payments(serializer.validated_data["decisions"])
+        return Response({
+            "updated": sum(1 for result in results.values() if result == "updated"),
+            "results": [{"id": payment_id, "result": result} for payment_id, result in results.items()],
+        })
+
+
+class PaymentDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     queryset = Payment.objects.all()
     serializer_class = PaymentDetailSerializer
     lookup_field = "id"
+
+    def get_validators(self):
+        row = Payment.objects.filter(id=self.kwargs["id"]).values_list("version", "updated_at", "proof").first()
+        return None if row is None else (row, row[1])
     
     
 class PaymentDeleteView(generics.DestroyAPIView):
@@ -86,20 +175,38 @@ class PaymentDeleteView(generics.DestroyAPIView):
 
     def delete(self, request, *args, **kwargs):
         payment = self.get_object()
-        payment.delete()
+        with transaction.atomic():
+            blobs.remove_payment_proofs([payment.id], clear_payment_proof=False)
+            payment.delete()
         return Response({"message": "Payment deleted successfully"}, status=status.HTTP_204_NO_CONTENT)
 
 
-class UserPaymentsList(generics.ListAPIView):
+class UserPaymentsList(ReplicaReadMixin, ConditionalGetMixin, PaymentRowsListMixin, generics.ListAPIView):
     serializer_class = PaymentSerializer
+    pagination_class = PaymentCursorPagination
 
     def get_queryset(self):
         user_id = self.kwargs['user_id']
-        return Payment.objects.filter(student_id=user_id).order_by('-date_issued')
+        return (
+            Payment.objects.filter(student_id=user_id)
+            .select_related('student', 'student__profile')
+            .order_by('-date_issued', '-id')
+        )
+
+    def get_validators(self):
+        # One aggregate: every row shares the same student, so Max() over
+        # the joined columns is simply that student's nested data.
+        watermark = Payment.objects.filter(student_id=self.kwargs['user_id']).aggregate(
+            **LIST_WATERMARK,
+            **{field: Max(f"student__{field}") for field in STUDENT_FIELDS},
+        )
+        # A delete does not move max(updated_at), so lists only get an ETag
+        return tuple(sorted(watermark.items())), None
     
 
 
 class PaymentSubmitView(APIView):
+    @retry_on_locked
     def post(self, request, user_id):
         try:
             user = User.objects.get(pk=user_id)
@@ -113,28 +220,31 @@ class PaymentSubmitView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 
-class PaymentByCommitteeView(APIView):
+class PaymentByCommitteeNameView(ReplicaReadMixin, APIView):
     def get(self, request, comittee_name):
         payments = Payment.objects.filter(comittee_name=comittee_name)
-        serializer = PaymentTypeSerializer(payments, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return paginated_payment_rows(request, payments, view=self)
     
 
 
-class CommitteeTotalAmountView(APIView):
+class CommitteeTotalAmountView(ReplicaReadMixin, APIView):
     def get(self, request, comittee_name):
-        payments = Payment.objects.filter(comittee_name=comittee_name)
-        total = sum([p.amount or 0 for p in payments])
-        count = payments.count()
+        totals = CommitteeLedger.objects.filter(
+            kind=CommitteeLedger.AMOUNT,
+            committee=comittee_name,
+        ).aggregate(
+            total_amount=Sum("total"),
+            count=Sum("count"),
+        )
         data = {
             "comittee_name": comittee_name,
-            "total_amount": total,
-            "count": count
+            "total_amount": float(totals["total_amount"] or 0),
+            "count": totals["count"] or 0
         }
         return Response(data)
     
     
-class StudentPaymentsView(APIView):
+class StudentPaymentsView(ReplicaReadMixin, APIView):
     def get(self, request, student_id):
         school_year = request.GET.get('school_year')
         semester = request.GET.get('semester')
@@ -152,204 +262,317 @@ class StudentPaymentsView(APIView):
         if is_walk_in in ["true", "false"]:
             payments = payments.filter(is_walk_in=(is_walk_in == "true"))
 
-        payments = payments.order_by("-date_issued")
-
-        serializer = PaymentTypeSerializer(payments, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return paginated_payment_rows(request, payments, view=self)
 
 
 
     
 class UpdatePaymentView(APIView):
+    """
+    Walk-in top-up: adds the given amounts to the committee columns.
+
+    Send the payment's `version` (body or X-Payment-Version header) to get
+    a 409 rather than applying on top of a change you have not seen.
+    """
+    @retry_on_locked
     def put(self, request, payment_id):
+        amounts = {}
+        for key in COMMITTEE_FIELDS:
+            try:
+                top_up = Decimal(str(request.data.get(key) or 0))
+                # Same max_digits/decimal_places checks as the serializers
+                Payment._meta.get_field(key).run_validators(top_up)
+            except InvalidOperation:
+                return Response({key: ["A valid number is required."]}, status=status.HTTP_400_BAD_REQUEST)
+            except DjangoValidationError as exc:
+                return Response({key: exc.messages}, status=status.HTTP_400_BAD_REQUEST)
+            amounts[key] = top_up
+
+        # Not If-Match: the ETags handed out by the GET views are hashes,
+        # not versions
+        expected = request.data.get('version', request.headers.get('X-Payment-Version'))
+        if expected is not None:
+            try:
+                expected = int(expected)
+            except (TypeError, ValueError):
+                return Response({"version": ["A valid integer is required."]}, status=status.HTTP_400_BAD_REQUEST)
+
         try:
-            payment = Payment.objects.get(id=payment_id)
+            topups.top_up(payment_id, amounts, expected_version=expected)
         except Payment.DoesNotExist:
             return Response({"message": "Payment not found"}, status=status.HTTP_404_NOT_FOUND)
+        except topups.VersionConflict as exc:
+            return Response({"message": str(exc), "version": exc.current}, status=status.HTTP_409_CONFLICT)
+        except DjangoValidationError as exc:
+            return Response(exc.message_dict, status=status.HTTP_400_BAD_REQUEST)
 
-        data = {
-            "cf": float(payment.cf or 0) + float(request.data.get("cf", 0)),
-            "lac": float(payment.lac or 0) + float(request.data.get("lac", 0)),
-            "pta": float(payment.pta or 0) + float(request.data.get("pta", 0)),
-            "qaa": float(payment.qaa or 0) + float(request.data.get("qaa", 0)),
-            "rhc": float(payment.rhc or 0) + float(request.data.get("rhc", 0)),
-        }
+        payment = Payment.objects.get(id=payment_id)
+        return Response(PaymentDetailSerializer(payment).data, status=status.HTTP_200_OK)
 
 
+class PaymentProofByPaymentIdView(ConditionalGetMixin, ListAPIView):
+    serializer_class = PaymentProofSerializer
+    permission_classes = [AllowAny]
 
+    def get_queryset(self):
+        payment_id = self.kwargs.get('payment_id')
+        return PaymentProof.objects.filter(payment_id=payment_id).order_by('-uploaded_at')
 
-        serializer = PaymentDetailSerializer(payment, data=data, partial=True)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-    
+    def get_validators(self):
+        watermark = PaymentProof.objects.filter(payment_id=self.kwargs.get('payment_id')).aggregate(
+            count=Count("id"),
+            updated=Max("updated_at"),
+            derivatives=Count("id", filter=Q(thumbnail__gt="")),
+        )
+        return tuple(sorted(watermark.items())), None
     
 class UploadPaymentProofView(APIView):
-    def post(self, request, payment_id):
-        try:
-            payment = Payment.objects.get(id=payment_id)
-        except Payment.DoesNotExist:
-            return Response({"error": "Payment not found."}, status=status.HTTP_404_NOT_FOUND)
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request, paymentId):
+        payment = get_object_or_404(Payment, id=paymentId)
 
-        files = request.FILES.getlist('proofs')
+        # `proofs` takes many files; `proof` is the older single-file field
+        files = request.FILES.getlist('proofs') or request.FILES.getlist('proof')
         if not files:
             return Response({"error": "No files uploaded."}, status=status.HTTP_400_BAD_REQUEST)
 
-        proofs = []
-        for file in files:
-            proof_instance = PaymentProof(payment=payment, proof=file)
-            proof_instance.save()
-            proofs.append(proof_instance)
+        try:
+            proofs = uploads.bulk_attach_proofs(payment, files)
+        except DjangoValidationError as exc:
+            return Response(exc.message_dict, status=status.HTTP_400_BAD_REQUEST)
+
+        if 'proofs' in request.FILES:
+            serializer = PaymentProofSerializer(proofs, many=True, context={"request": request})
+        else:
+            serializer = PaymentProofSerializer(proofs[0], context={"request": request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class UploadSessionStartView(APIView):
+    def post(self, request, payment_id):
+        payment = get_object_or_404(Payment, id=payment_id)
+        serializer = UploadSessionSerializer(data=request.data)
+        if serializer.is_valid():
+            session = uploads.start_session(
+                payment,
+                serializer.validated_data['filename'],
+                serializer.validated_data['size'],
+            )
+            return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class UploadSessionView(APIView):
+    """
+    GET reports the resume offset; PUT appends a chunk at the `Upload-Offset`
+    header with the raw bytes as the body; DELETE abandons the upload.
+    """
+
+    def get(self, request, session_id):
+        session = get_object_or_404(UploadSession, id=session_id)
+        return Response(UploadSessionSerializer(session).data)
+
+    def put(self, request, session_id):
+        session = get_object_or_404(UploadSession, id=session_id)
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.headers.get('Content-Length', ''))
+        except ValueError:
+            return Response(
+                {"error": "Upload-Offset and Content-Length headers are required."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            # request.stream is the unparsed body, read block by block
+            received = uploads.write_chunk(session, offset, request.stream, length)
+        except uploads.OffsetMismatch as exc:
+            return Response({"error": "Offset mismatch.", "received": exc.expected}, status=status.HTTP_409_CONFLICT)
+        except DjangoValidationError as exc:
+            return Response({"error": exc.messages}, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = PaymentProofSerializer(proofs, many=True)
+        return Response({"id": session.id, "received": received, "size": session.size})
+
+    def delete(self, request, session_id):
+        session = get_object_or_404(UploadSession, id=session_id)
+        uploads.discard_session(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadSessionFinalizeView(APIView):
+    def post(self, request, session_id):
+        session = get_object_or_404(UploadSession.objects.select_related('payment'), id=session_id)
+        try:
+            proof = uploads.finalize_session(session)
+        except DjangoValidationError as exc:
+            return Response({"error": exc.messages}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = PaymentProofSerializer(proof, context={"request": request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
-    
-    
-class PaymentProofByPaymentIdView(ListAPIView):
-    serializer_class = PaymentProofSerializer
-    permission_classes = [AllowAny]
 
-    def get_queryset(self):
-        payment_id = self.kwargs.get('payment_id')
-        return PaymentProof.objects.filter(payment_id=payment_id).order_by('-uploaded_at')
-    
-class UploadPaymentProofView(generics.CreateAPIView):
-    serializer_class = PaymentProofSerializer
-    parser_classes = [MultiPartParser, FormParser]
 
-    def get_payment(self):
-        payment_id = self.kwargs.get("paymentId")
+class SearchView(APIView):
+    def get(self, request):
+        query = request.GET.get('q', '')
         try:
-            return Payment.objects.get(id=payment_id)
-        except Payment.DoesNotExist:
-            raise NotFound("Payment not found")
-
-    def perform_create(self, serializer):
-        payment = self.get_payment()
-        serializer.save(payment=payment)
-        
-        
-class CommitteeTotalsView(APIView):
+            page = max(int(request.GET.get('page', 1)), 1)
+            page_size = min(max(int(request.GET.get('page_size', 20)), 1), 100)
+        except ValueError:
+            return Response({"error": "Invalid page or page_size"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            hits = search.search(query, page_size, (page - 1) * page_size)
+        except search.SearchUnavailable as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        student_ids = [pk for kind, pk, _ in hits if kind == 'student']
+        payment_ids = [pk for kind, pk, _ in hits if kind == 'payment']
+        students = User.objects.filter(id__in=student_ids).select_related('profile').in_bulk()
+        payments = Payment.objects.filter(id__in=payment_ids).select_related('student', 'student__profile').in_bulk()
+
+        results = []
+        for kind, pk, score in hits:
+            if kind == 'student' and pk in students:
+                results.append({"type": kind, "id": pk, "score": -score, "student": UserSerializer(students[pk]).data})
+            elif kind == 'payment' and pk in payments:
+                data = PaymentSerializer(payments[pk], context={"request": request}).data
+                results.append({"type": kind, "id": pk, "score": -score, "payment": data})
+
+        return Response({"query": query, "page": page, "page_size": page_size, "results": results})
+
+
+class CommitteeTotalsView(ReplicaReadMixin, APIView):
     def get(self, request):
-        totals = {"cf": 0, "lac": 0, "pta": 0, "qaa": 0, "rhc": 0}
-        counts = {"cf": 0, "lac": 0, "pta": 0, "qaa": 0, "rhc": 0}
-
-        payments = Payment.objects.all()
-
-        for payment in payments:
-            for key in totals.keys():
-                value = getattr(payment, key)
-                try:
-                    value_float = float(value)
-                    totals[key] += value_float
-                    counts[key] += 1
-                except (TypeError, ValueError):
-                    continue
-
-        # Return totals and counts
+        rows = CommitteeLedger.objects.filter(kind=CommitteeLedger.BREAKDOWN)
+
+        # Optional scope filters, matched against the pre-aggregated ledger keys
+        for field in ["school_year", "semester", "status"]:
+            value = request.GET.get(field)
+            if value:
+                rows = rows.filter(**{field: value})
+
+        totals = {key: 0 for key in COMMITTEE_FIELDS}
+        counts = {key: 0 for key in COMMITTEE_FIELDS}
+        for row in rows.values("committee").annotate(total_sum=Sum("total"), count_sum=Sum("count")):
+            if row["committee"] in totals:
+                totals[row["committee"]] = float(row["total_sum"])
+                counts[row["committee"]] = row["count_sum"]
+
         data = {**totals, **{f"{k}_count": counts[k] for k in counts}}
         return Response(data)
     
-class NonSuperUserListView(APIView):
+class NonSuperUserListView(ReplicaReadMixin, APIView):
     def get(self, request):
-        users = User.objects.filter(is_superuser=False)
-        serializer = UserSerializer(users, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        fieldset = Fieldset.for_users(request)
+        users = user_values(User.objects.filter(is_superuser=False), fieldset)
+        return Response(user_rows(users, fieldset), status=status.HTTP_200_OK)
+
 
+class StudentDirectoryView(ReplicaReadMixin, generics.ListAPIView):
+    serializer_class = UserSerializer
+    pagination_class = StudentCursorPagination
 
+    def get_queryset(self):
+        users = User.objects.filter(is_superuser=False).select_related("profile")
+
+        course = self.request.query_params.get("course")
+        if course:
+            users = users.filter(profile__course=course)
+
+        year_lvl = self.request.query_params.get("year_lvl")
+        if year_lvl:
+            users = users.filter(profile__year_lvl=year_lvl)
+
+        # Prefix-only search so the name indexes can be used
+        search = self.request.query_params.get("search", "").strip()
+        if search:
+            users = users.filter(
+                Q(username__istartswith=search)
+                | Q(first_name__istartswith=search)
+                | Q(last_name__istartswith=search)
+            )
+        return users
 
+
+
+@replica_reads
 def print_payments_pdf(request):
     semester = request.GET.get('semester', '')
     school_year = request.GET.get('school_year', '')
 
-    payments = Payment.objects.filter(
-        semester__icontains=semester,
-        school_year__icontains=school_year, 
-        status='Accepted'
-    ).order_by('date_issued')
-
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'inline; filename="payments.pdf"'
-
-    p = canvas.Canvas(response, pagesize=letter)
-    width, height = letter
-
-    y = height - 50
-    p.setFont("Helvetica-Bold", 16)
-    p.drawString(50, y, "Payment Summary")
-    y -= 40
-
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, y, f"School Year: {school_year}")
-    y -= 20
-    p.drawString(50, y, f"Semester: {semester}")
-    y -= 30
-
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, y, "Payment Records")
-    y -= 25
-
-    p.setFont("Helvetica", 10)
-    for pay in payments:
-        if y < 150:
-            p.showPage()
-            y = height - 50
-            p.setFont("Helvetica", 10)
-
-        p.drawString(50, y, f"Payment ID: {pay.id}")
-        y -= 15
-        p.drawString(50, y, f"Student: {pay.student.get_full_name()}")
-        y -= 15
-        p.drawString(50, y, f"Committee: {pay.comittee_name}")
-        y -= 20
-
-        p.drawString(80, y, f"PTA (Parents Teacher Association): Php. {pay.pta or '0'}")
-        y -= 15
-        p.drawString(80, y, f"QAA (Quality Assurance Accreditation): Php. {pay.qaa or '0'}")
-        y -= 15
-        p.drawString(80, y, f"LAC (Library Advisory Committee): Php. {pay.lac or '0'}")
-        y -= 15
-        p.drawString(80, y, f"CF (Contingency Fund): Php. {pay.cf or '0'}")
-        y -= 15
-        p.drawString(80, y, f"RHC (Registrar Clinic): Php. {pay.rhc or '0'}")
-        y -= 25
-
-        p.drawString(80, y, f"Status: {pay.status}")
-        y -= 15
-        p.drawString(80, y, f"Date Issued: {pay.date_issued.strftime('%Y-%m-%d %H:%M')}")
-        y -= 30
-
-    p.showPage()
-    p.save()
-    return response
+    # ReportLab writes the xref table on save, so the document is spooled
+    # (spilling to disk for large reports) and then streamed in blocks.
+    output = spooled_payments_pdf(semester, school_year)
+    return FileResponse(output, content_type='application/pdf', filename='payments.pdf')
+
+
+
+def export_payments(request, file_format):
+    payments = export_queryset(request.GET)
+
+    if file_format == 'csv':
+        response = StreamingHttpResponse(stream_csv(payments), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="payments.csv"'
+        return response
+
+    if file_format == 'xlsx':
+        try:
+            output = spooled_xlsx(payments)
+        except ImportError:
+            return JsonResponse({"error": "XLSX export requires openpyxl."}, status=501)
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename='payments.xlsx',
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+
+    return JsonResponse({"error": "Invalid export format"}, status=400)
 
 
+class ReportJobSubmitView(APIView):
+    def post(self, request):
+        job = submit_report_job(
+            request.data.get('semester', ''),
+            request.data.get('school_year', ''),
+        )
+        serializer = ReportJobSerializer(job, context={"request": request})
+        code = status.HTTP_200_OK if job.status == ReportJob.DONE else status.HTTP_202_ACCEPTED
+        return Response(serializer.data, status=code)
+
+
+class ReportJobDetailView(generics.RetrieveAPIView):
+    queryset = ReportJob.objects.all()
+    serializer_class = ReportJobSerializer
+    lookup_url_kwarg = 'job_id'
+
+
+class ReportJobDownloadView(APIView):
+    def get(self, request, job_id):
+        job = get_object_or_404(ReportJob, id=job_id, status=ReportJob.DONE)
+        if not job.file:
+            raise NotFound("Report file not found")
+        return FileResponse(job.file.open('rb'), content_type='application/pdf', filename='payments.pdf')
+
 
 class RemovePaymentProofView(APIView):
     def delete(self, request, payment_id):
         payment = get_object_or_404(Payment, id=payment_id)
 
-        if payment.proof:
-            payment.proof.delete(save=False)
-            payment.proof = None
-            payment.save()
-
-        proofs = PaymentProof.objects.filter(payment=payment)
-        for p in proofs:
-            if p.proof:
-                p.proof.delete(save=False)
-            p.delete()
+        # One DELETE/UPDATE per table; the files are unlinked by the
+        # drain_file_deletions worker after the transaction commits.
+        blobs.remove_payment_proofs([payment.id])
 
         serializer = RemovePaymentProofSerializer(payment)
         return Response(serializer.data, status=status.HTTP_200_OK)
     
     
+# Reads stay on the primary: a replica snapshot from before a write would
+# be cached under the committee's new (post-invalidation) version
 class PaymentByCommitteeView(APIView):
     def get(self, request, committee):
-        allowed = ["cf", "lac", "pta", "qaa", "rhc"]
-
-        if committee not in allowed:
+        if committee not in COMMITTEE_FIELDS:
             return Response(
                 {"error": "Invalid committee"},
                 status=status.HTTP_400_BAD_REQUEST
@@ -359,8 +582,22 @@ class PaymentByCommitteeView(APIView):
             f"{committee}__isnull": False,
             # "status": "Accepted"
         }
-        payments = Payment.objects.filter(**filter_kwargs).select_related("student")
+        key, data = response_cache.lookup(committee, request.build_absolute_uri())
+        if data is not None:
+            return Response(data, headers={"X-Cache": "HIT"})
 
-        serializer = PaymentSerializer(payments, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        payments = Payment.objects.filter(**filter_kwargs)
+
+        response = paginated_payment_rows(request, payments, view=self)
+        response_cache.store(key, response.data)
+        response["X-Cache"] = "MISS"
+        return response
+
+
+class CommitteeCacheStatsView(APIView):
+    """Estimated (sampled) hit/miss and exact invalidation counters of the committee list cache."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(response_cache.stats())
 
@@ -35,7 +35,12 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
-    ]
+    ],
+    # orjson when installed, DRF's JSONRenderer otherwise (api/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 SIMPLE_JWT = {
@@ -43,6 +48,12 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=50),
 }
 
+# To authenticate from the token claims without loading the User row on
+# every request, use 'api.authentication.StatelessJWTAuthentication' in
+# DEFAULT_AUTHENTICATION_CLASSES. Account status is cached per process for
+# this many seconds (changes made in the same process apply immediately).
+STATELESS_AUTH_CACHE_TTL = 60
+
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -57,6 +68,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -64,8 +76,15 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'api.replica.ReplicaPinMiddleware',
 ]
 
+# Responses (and streamed exports) smaller than this are sent uncompressed.
+# gzip is padded against BREACH (api/compression.py); brotli cannot be, so
+# it is only offered when this is True and the `brotli` package is installed.
+RESPONSE_COMPRESSION_MIN_SIZE = 1024
+RESPONSE_COMPRESSION_BROTLI = False
+
 ROOT_URLCONF = 'backend.urls'
 
 TEMPLATES = [
@@ -89,13 +108,52 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite tuned for concurrent requests: WAL lets reads run alongside the
+# single writer, and `timeout` is the busy timeout writers queue for. The
+# journal mode is stored in the database file, so it is set once by
+# migration api.0035 instead of here; these per-connection pragmas do not
+# write to the file.
+# Transactions stay DEFERRED so read-only atomic() blocks do not take the
+# write lock; the ones that read before writing use api.sqlite.atomic_write
+# (BEGIN IMMEDIATE). Connections are kept for CONN_MAX_AGE seconds instead
+# of being reopened per request.
+SQLITE_OPTIONS = {
+    'timeout': 20,
+    'init_command': (
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA mmap_size=134217728;'
+        'PRAGMA cache_size=-20000;'
+        'PRAGMA temp_store=MEMORY;'
+    ),
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'OPTIONS': SQLITE_OPTIONS,
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    # Snapshot of the primary for report and list reads (api/replica.py),
+    # refreshed by `manage.py refresh_replica --interval 15`. Views fall
+    # back to the primary while it is missing or older than REPLICA_MAX_LAG.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'replica.sqlite3',
+        'OPTIONS': {
+            'timeout': 20,
+            'init_command': 'PRAGMA query_only=ON;PRAGMA mmap_size=134217728;PRAGMA cache_size=-20000;',
+        },
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+DATABASE_ROUTERS = ['api.routers.PrimaryReplicaRouter']
+REPLICA_MAX_LAG = 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -138,6 +196,37 @@ STATICFILES_DIR = (os.path.join(BASE_DIR, 'static'))
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Report PDF jobs (api.reports): a Running job not finished within the
+# claim timeout is requeued, and finished jobs and their PDFs are removed
+# by `manage.py purge_report_jobs` after the retention period.
+REPORT_JOB_CLAIM_TIMEOUT = timedelta(minutes=10)
+REPORT_JOB_RETENTION = timedelta(days=7)
+
+# Resumable proof uploads (api.uploads)
+CHUNKED_UPLOAD_DIR = os.path.join(BASE_DIR, 'upload_sessions')
+CHUNKED_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+CHUNKED_UPLOAD_SESSION_TTL = timedelta(hours=24)
+
+# Students per roster upload (api.roster); the view hashes their passwords
+# in the request, so bigger rosters go through `manage.py import_roster`.
+ROSTER_IMPORT_MAX_ROWS = 200
+
+# "responses" holds rendered list data (api.response_cache); the replica's
+# read-your-writes pins are files next to replica.sqlite3, not cache
+# entries (api.replica). File based so every worker process on the host
+# sees the same invalidations.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'responses'),
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 